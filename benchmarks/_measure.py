@@ -0,0 +1,38 @@
+"""Roda um script Python (``_measure.py SAÍDA script args...``) e grava em SAÍDA o pico de memória dele, em KiB.
+
+O pico vem de VmHWM em /proc/self/status, que é zerado no exec; o
+``ru_maxrss`` do filho herdaria o do processo que o lançou.
+"""
+import atexit
+import os
+import runpy
+import sys
+
+
+def _peak_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _report(out):
+    with open(out, "w") as f:
+        f.write(str(_peak_kb()))
+
+
+if __name__ == "__main__":
+    out, script = sys.argv[1], sys.argv[2]
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    atexit.register(_report, out)
+    runpy.run_path(script, run_name="__main__")
@@ -0,0 +1,182 @@
+"""Arquivos sintéticos com XMP/IPTC, usados pelo gerador de corpus e pelo exiftool falso.
+
+``embed`` grava pessoas/tags num JPEG, PNG ou TIFF já existente, no mesmo
+formato que o exiftool usa (XMP dc:subject / Iptc4xmpExt:PersonInImage com
+padding, e IPTC 2:25 em UTF-8), de modo que ``imgmeta_native`` consiga ler e
+editar no lugar.
+"""
+import io
+import random
+import struct
+import zlib
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from PIL import Image, TiffImagePlugin
+
+FORMATS = {"jpg": "JPEG", "png": "PNG", "tif": "TIFF"}
+
+XMP_JPEG_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+PHOTOSHOP_HEADER = b"Photoshop 3.0\x00"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_XMP_KEYWORD = b"XML:com.adobe.xmp"
+XMP_PADDING = 2048
+
+
+def xmp_packet(subject, people, padding=XMP_PADDING) -> bytes:
+    def bag(name, values):
+        if not values:
+            return ""
+        items = "".join(f"<rdf:li>{escape(v)}</rdf:li>" for v in values)
+        return f"<{name}><rdf:Bag>{items}</rdf:Bag></{name}>"
+
+    xml = (
+        '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+        '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+        '<rdf:Description rdf:about=""'
+        ' xmlns:dc="http://purl.org/dc/elements/1.1/"'
+        ' xmlns:Iptc4xmpExt="http://iptc.org/std/Iptc4xmpExt/2008-02-29/">'
+        f'{bag("dc:subject", subject)}{bag("Iptc4xmpExt:PersonInImage", people)}'
+        "</rdf:Description></rdf:RDF></x:xmpmeta>\n"
+    )
+    pad = (" " * 99 + "\n") * (padding // 100)
+    return (xml + pad + '<?xpacket end="w"?>').encode("utf-8")
+
+
+def iptc_block(keywords) -> bytes:
+    # 1:90 = ESC % G declara UTF-8, como o exiftool faz com -charset iptc=utf8
+    out = b"\x1c\x01\x5a\x00\x03\x1b%G"
+    for k in keywords:
+        raw = k.encode("utf-8")
+        out += b"\x1c\x02\x19" + struct.pack(">H", len(raw)) + raw
+    return out
+
+
+def _irb(iptc: bytes) -> bytes:
+    body = iptc + (b"\x00" if len(iptc) & 1 else b"")
+    return b"8BIM" + struct.pack(">H", 0x0404) + b"\x00\x00" + struct.pack(">I", len(iptc)) + body
+
+
+def _jpeg_segment(marker: int, data: bytes) -> bytes:
+    return bytes([0xFF, marker]) + struct.pack(">H", len(data) + 2) + data
+
+
+def _embed_jpeg(data: bytes, xmp: bytes, iptc: bytes | None) -> bytes:
+    # remove XMP/APP13 anteriores e insere os novos logo depois do APP0 (ou do SOI)
+    pos = 2
+    head = [data[:2]]
+    kept = []
+    while pos + 4 <= len(data) and data[pos] == 0xFF and data[pos + 1] not in (0xDA, 0xD9):
+        marker = data[pos + 1]
+        size = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        seg = data[pos:pos + 2 + size]
+        body = seg[4:]
+        if marker == 0xE0 and not kept:
+            head.append(seg)
+        elif not ((marker == 0xE1 and body.startswith(XMP_JPEG_HEADER)) or
+                  (marker == 0xED and body.startswith(PHOTOSHOP_HEADER))):
+            kept.append(seg)
+        pos += 2 + size
+    new = [_jpeg_segment(0xE1, XMP_JPEG_HEADER + xmp)]
+    if iptc:
+        new.append(_jpeg_segment(0xED, PHOTOSHOP_HEADER + _irb(iptc)))
+    return b"".join(head + new + kept) + data[pos:]
+
+
+def _png_chunk(ctype: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data))
+
+
+def _embed_png(data: bytes, xmp: bytes) -> bytes:
+    # PNG não tem IPTC: só o iTXt do XMP, logo depois do IHDR
+    out = [data[:8]]
+    pos = 8
+    itxt = _png_chunk(b"iTXt", PNG_XMP_KEYWORD + b"\x00\x00\x00\x00\x00" + xmp)
+    while pos < len(data):
+        size, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos:pos + 12 + size]
+        pos += 12 + size
+        if ctype == b"iTXt" and chunk[8:].startswith(PNG_XMP_KEYWORD + b"\x00"):
+            continue
+        out.append(chunk)
+        if ctype == b"IHDR":
+            out.append(itxt)
+    return b"".join(out)
+
+
+def _embed_tiff(data: bytes, xmp: bytes, iptc: bytes | None) -> bytes:
+    # cópia sem os metadados do original, senão o Pillow regrava o XMP antigo
+    im = Image.open(io.BytesIO(data)).copy()
+    im.info.clear()
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    ifd[700] = xmp
+    ifd.tagtype[700] = 1  # BYTE
+    if iptc:
+        ifd[33723] = iptc
+        ifd.tagtype[33723] = 7  # UNDEFINED
+    out = io.BytesIO()
+    im.save(out, "TIFF", tiffinfo=ifd)
+    return out.getvalue()
+
+
+def embed(data: bytes, subject, people, keywords=None) -> bytes:
+    """``data`` com o XMP (e o IPTC, exceto em PNG) substituídos pelos valores dados."""
+    keywords = subject if keywords is None else keywords
+    xmp = xmp_packet(subject, people)
+    iptc = iptc_block(keywords) if keywords else None
+    if data.startswith(b"\xff\xd8"):
+        return _embed_jpeg(data, xmp, iptc)
+    if data.startswith(PNG_SIGNATURE):
+        return _embed_png(data, xmp)
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return _embed_tiff(data, xmp, iptc)
+    raise ValueError("formato não suportado")
+
+
+def base_images(formats, size, count=16, seed=0) -> dict[str, list[bytes]]:
+    """Algumas imagens-base por formato (gradientes de cores diferentes), já codificadas."""
+    rng = random.Random(seed)
+    out = {}
+    for fmt in formats:
+        out[fmt] = []
+        for _ in range(count):
+            c1 = tuple(rng.randrange(256) for _ in range(3))
+            c2 = tuple(rng.randrange(256) for _ in range(3))
+            im = Image.linear_gradient("L").resize(size).convert("RGB")
+            im = Image.composite(Image.new("RGB", size, c1), Image.new("RGB", size, c2), im.convert("L"))
+            buf = io.BytesIO()
+            im.save(buf, FORMATS[fmt], **({"quality": 85} if fmt == "jpg" else {}))
+            out[fmt].append(buf.getvalue())
+    return out
+
+
+def vocabulary(n_tags=200, n_people=50):
+    tags = [f"tag{i:03d}" for i in range(n_tags)]
+    people = [f"Pessoa {i:02d}" for i in range(n_people)]
+    return tags, people
+
+
+def generate(out_dir, n, formats=("jpg", "png", "tif"), tags_per_file=5, people_per_file=2,
+             size=(320, 240), seed=0, per_dir=1000):
+    """Cria ``n`` arquivos em ``out_dir``/dNNNN/, ``per_dir`` por pasta; devolve o manifesto."""
+    out_dir = Path(out_dir)
+    rng = random.Random(seed)
+    bases = base_images(formats, size, seed=seed)
+    tags, people = vocabulary()
+    # distribuição enviesada: poucas tags muito comuns, muitas raras (como num acervo real)
+    tag_weights = [1 / (i + 1) for i in range(len(tags))]
+    for i in range(n):
+        fmt = formats[i % len(formats)]
+        d = out_dir / f"d{i // per_dir:04d}"
+        if i % per_dir == 0:
+            d.mkdir(parents=True, exist_ok=True)
+        subject = sorted(set(rng.choices(tags, tag_weights, k=tags_per_file)))
+        ppl = sorted(set(rng.sample(people, min(people_per_file, len(people)))))
+        data = embed(rng.choice(bases[fmt]), subject, ppl)
+        (d / f"img{i:06d}.{fmt}").write_bytes(data)
+    return {
+        "files": n, "formats": list(formats), "tags_per_file": tags_per_file,
+        "people_per_file": people_per_file, "size": list(size), "seed": seed,
+        "common_tag": tags[0], "rare_tag": tags[-1], "person": people[0],
+    }
@@ -0,0 +1,186 @@
+"""Substituto do exiftool para os benchmarks.
+
+Entende o que o imgmeta usa: ``-stay_open True -@ -`` com ``-common_args``,
+``-echo4``/``-executeN``, leitura com ``-json`` (valores binários com ``-b``
+viram ``base64:``) e escrita com ``-TAG=``, ``-TAG+=`` e ``-TAG-=`` em
+XMP-dc:Subject, IPTC:Keywords e XMP-Iptc4xmpExt:PersonInImage. Os valores são
+lidos com ``imgmeta_native`` e gravados de verdade no arquivo (``corpus.embed``),
+então leituras e escritas continuam coerentes entre si.
+
+A latência do exiftool de verdade é simulada com as variáveis de ambiente
+``FAKE_EXIFTOOL_LATENCY`` (segundos por comando) e
+``FAKE_EXIFTOOL_FILE_LATENCY`` (segundos por arquivo).
+"""
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path[:0] = [str(ROOT), str(ROOT.parent)]
+
+import corpus  # noqa: E402
+import imgmeta_native  # noqa: E402
+
+LATENCY = float(os.environ.get("FAKE_EXIFTOOL_LATENCY", "0"))
+FILE_LATENCY = float(os.environ.get("FAKE_EXIFTOOL_FILE_LATENCY", "0"))
+
+# nome do tag na linha de comando → campo do JSON
+FIELDS = {
+    "xmp-dc:subject": "Subject", "subject": "Subject",
+    "iptc:keywords": "Keywords", "keywords": "Keywords",
+    "xmp-iptc4xmpext:personinimage": "PersonInImage", "personinimage": "PersonInImage",
+}
+OPTIONS_WITH_VALUE = {"-charset", "-api", "-w", "-W", "-echo1", "-echo2", "-echo3", "-echo4"}
+
+
+def parse(args):
+    files, edits, want = [], [], []
+    opts = set()
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in OPTIONS_WITH_VALUE:
+            i += 2
+            continue
+        if a.startswith("-") and "=" in a:
+            name, _, value = a[1:].partition("=")
+            op = "="
+            if name[-1:] in "+-":
+                op, name = name[-1] + "=", name[:-1]
+            field = FIELDS.get(name.lower())
+            if field is None:
+                raise SystemExit(f"fake_exiftool: tag não suportado: {name}")
+            edits.append((field, op, value))
+        elif a.startswith("-"):
+            opts.add(a.lower())
+            if a.lower() not in ("-json", "-j", "-b", "-overwrite_original", "-ver", "-q", "-m", "-fast"):
+                want.append(a[1:].split(":")[-1])
+        else:
+            files.append(a)
+        i += 1
+    return files, edits, want, opts
+
+
+def read(path):
+    try:
+        return imgmeta_native.read_fields(path)
+    except imgmeta_native.Unsupported:
+        return {}
+
+
+def write(path, edits):
+    current = read(path)
+    values = {f: list(current.get(f, [])) for f in ("Subject", "Keywords", "PersonInImage")}
+    assigned = set()
+    for field, op, value in edits:
+        cur = values[field]
+        if op == "+=":
+            cur.append(value)
+        elif op == "-=":
+            values[field] = [v for v in cur if v != value]
+        else:
+            # como no exiftool, "-TAG=a -TAG=b" monta a lista [a, b]; "-TAG=" apaga
+            if field not in assigned:
+                values[field] = []
+                assigned.add(field)
+            if value:
+                values[field].append(value)
+    data = Path(path).read_bytes()
+    new = corpus.embed(data, values["Subject"], values["PersonInImage"], values["Keywords"])
+    tmp = f"{path}_exiftool_tmp"
+    with open(tmp, "wb") as f:
+        f.write(new)
+    os.replace(tmp, path)
+
+
+def process(args, out, err):
+    time.sleep(LATENCY)
+    files, edits, want, opts = parse(args)
+    if "-ver" in opts:
+        out.write(b"13.00\n")
+        return
+    if edits:
+        updated = failed = 0
+        for f in files:
+            time.sleep(FILE_LATENCY)
+            try:
+                write(f, edits)
+                updated += 1
+            except (OSError, ValueError) as e:
+                msg = "File not found" if isinstance(e, FileNotFoundError) else str(e)
+                err.write(f"Error: {msg} - {f}\n".encode())
+                failed += 1
+        if updated:
+            out.write(f"    {updated} image files updated\n".encode())
+        if failed:
+            out.write(f"    {failed} files weren't updated due to errors\n".encode())
+        return
+    rows = []
+    for f in files:
+        time.sleep(FILE_LATENCY)
+        if not os.path.exists(f):
+            err.write(f"Error: File not found - {f}\n".encode())
+            continue
+        row = {"SourceFile": f}
+        fields = read(f)
+        for tag in want:
+            if tag in ("ThumbnailImage", "PreviewImage"):
+                data = imgmeta_native.exif_thumbnail(f) if tag == "ThumbnailImage" else None
+                if data:
+                    row[tag] = "base64:" + base64.b64encode(data).decode()
+                continue
+            values = fields.get(tag)
+            if values:
+                row[tag] = values if len(values) > 1 else values[0]
+        rows.append(row)
+    if "-json" in opts or "-j" in opts:
+        if rows:
+            out.write(json.dumps(rows, ensure_ascii=False, indent=2).encode() + b"\n")
+    elif "-b" in opts:
+        for row in rows:
+            for tag in want:
+                if str(row.get(tag, "")).startswith("base64:"):
+                    out.write(base64.b64decode(row[tag][7:]))
+
+
+def stay_open(common):
+    out, err = sys.stdout.buffer, sys.stderr.buffer
+    cur = []
+    for raw in sys.stdin.buffer:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("-execute"):
+            n = line[len("-execute"):]
+            echo4 = None
+            if "-echo4" in cur:
+                j = cur.index("-echo4")
+                echo4 = cur[j + 1]
+            try:
+                process(cur + common, out, err)
+            except Exception as e:  # como o exiftool: erro vai para stderr e a sessão continua
+                err.write(f"Error: {e}\n".encode())
+            if echo4:
+                err.write((echo4 + "\n").encode())
+            out.write(f"{{ready{n}}}\n".encode())
+            out.flush()
+            err.flush()
+            cur = []
+        elif cur == ["-stay_open"] and line.lower() == "false":
+            return
+        else:
+            cur.append(line)
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "-stay_open" and argv[1].lower() == "true":
+        common = argv[argv.index("-common_args") + 1:] if "-common_args" in argv else []
+        stay_open(common)
+        return 0
+    process(argv, sys.stdout.buffer, sys.stderr.buffer)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
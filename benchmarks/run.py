@@ -0,0 +1,281 @@
+"""Benchmarks do imgmeta sobre um corpus sintético.
+
+Uso::
+
+    python benchmarks/run.py --sizes 1000,10000 --out resultado.json
+    python benchmarks/run.py --sizes 1000 --compare resultado.json
+
+Para cada tamanho, gera (ou reaproveita) um corpus de JPEG/PNG/TIFF com XMP/IPTC
+em ``--workdir`` e mede cada cenário num processo separado: tempo de parede,
+arquivos por segundo e pico de memória (RSS) do processo. Os comandos de
+escrita rodam numa cópia do corpus. Por padrão o exiftool é o substituto em
+``fake_exiftool.py``, com latência configurável; ``--exiftool real`` usa o do PATH.
+
+O resultado é um JSON com ``meta`` (máquina, versão, parâmetros) e
+``results`` (um objeto por cenário e tamanho); ``--compare`` mostra a razão
+de vazão em relação a um resultado anterior.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+REPO = ROOT.parent
+sys.path[:0] = [str(ROOT), str(REPO)]
+
+import corpus  # noqa: E402
+
+SCENARIOS = [
+    "walk", "list_cold", "list_warm", "list_noindex", "search", "search_query", "match",
+    "add", "add_noop", "remove", "set", "clear", "gui_thumbs",
+]
+THUMB_LIMIT = 2000  # arquivos no cenário gui_thumbs (decodificação é cara)
+
+
+# Cenários em processo (rodam no filho: python run.py --child NOME ...)
+
+def child_walk(target, manifest):
+    import imgmeta
+    return sum(1 for _ in imgmeta.iter_targets([target], recursive=True))
+
+
+def child_match(target, manifest):
+    # só CPU: filtros e consultas sobre registros já em memória
+    import random
+    import imgmeta
+    from imgmeta_query import compile_query
+    n = manifest["files"]
+    rng = random.Random(manifest["seed"])
+    tags, people = corpus.vocabulary()
+    metas = [{"file": f"f{i}", "tags": rng.sample(tags, manifest["tags_per_file"]),
+              "people": rng.sample(people, manifest["people_per_file"])} for i in range(n)]
+    hits = sum(imgmeta.matches_filters(m, [manifest["person"]], [], [manifest["common_tag"]], []) for m in metas)
+    q = compile_query(f'tag:{manifest["common_tag"]} AND NOT person:"{manifest["person"]}"')
+    hits += sum(q.matches(m) for m in metas)
+    return n
+
+
+def child_gui_thumbs(target, manifest):
+    import imgmeta
+    import gui
+    files = sorted(imgmeta.iter_targets([target], recursive=True))[:THUMB_LIMIT]
+    for f in files:
+        gui.make_thumbnail(f, (160, 160))
+    return len(files)
+
+
+CHILDREN = {"walk": child_walk, "match": child_match, "gui_thumbs": child_gui_thumbs}
+
+
+# Execução
+
+def run_measured(cmd, env, tmp: Path):
+    """(segundos, pico de RSS em KiB ou None, código de saída, stderr) de ``python cmd...``.
+
+    O pico é medido dentro do próprio processo (``_measure.py``); os filhos
+    dele, como o exiftool, ficam de fora.
+    """
+    peak = tmp / "peak"
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, str(ROOT / "_measure.py"), str(peak), *cmd],
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    seconds = time.perf_counter() - t0
+    try:
+        rss = int(peak.read_text())
+    except (OSError, ValueError):
+        rss = None
+    return seconds, rss, proc.returncode, proc.stderr.decode("utf-8", "replace")
+
+
+def fake_exiftool_dir(tmp: Path) -> Path:
+    bindir = tmp / "bin"
+    bindir.mkdir(exist_ok=True)
+    if os.name == "nt":
+        (bindir / "exiftool.bat").write_text(f'@"{sys.executable}" "{ROOT / "fake_exiftool.py"}" %*\n')
+    else:
+        launcher = bindir / "exiftool"
+        launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{ROOT / "fake_exiftool.py"}" "$@"\n')
+        launcher.chmod(0o755)
+    return bindir
+
+
+def ensure_corpus(workdir: Path, n, args) -> tuple[Path, dict]:
+    key = f"n{n}-{'_'.join(args.formats)}-t{args.tags}-p{args.people}-{args.size[0]}x{args.size[1]}-s{args.seed}"
+    target = workdir / key
+    manifest_path = target / "manifest.json"
+    if manifest_path.exists():
+        return target / "files", json.loads(manifest_path.read_text())
+    shutil.rmtree(target, ignore_errors=True)
+    print(f"gerando corpus de {n} arquivos em {target}…", file=sys.stderr)
+    manifest = corpus.generate(target / "files", n, tuple(args.formats), args.tags, args.people,
+                               tuple(args.size), args.seed)
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return target / "files", manifest
+
+
+def scenario_commands(name, files, manifest, tmp: Path):
+    """Comandos de preparação e o comando medido de um cenário (argumentos do python, sem o executável)."""
+    cli = [str(REPO / "imgmeta.py"), "-q", "-r"]
+    index = ["--index", str(tmp / "index.db")]
+    child = [str(Path(__file__).resolve()), "--child", name, str(files), str(tmp / "manifest.json")]
+    tag, person = manifest["common_tag"], manifest["person"]
+    warm = [cli + index + ["list", str(files), "--ndjson"]]
+    return {
+        "walk": ([], child),
+        "list_cold": ([], cli + index + ["list", str(files), "--ndjson"]),
+        "list_warm": (warm, cli + index + ["list", str(files), "--ndjson"]),
+        "list_noindex": ([], cli + ["--no-index", "list", str(files), "--ndjson"]),
+        "search": (warm, cli + index + ["search", str(files), "--tags", tag, "--people", person, "--mode", "all"]),
+        "search_query": (warm, cli + index + ["search", str(files), "-e",
+                                              f'tag:{tag} AND NOT person:"{person}"']),
+        "match": ([], child),
+        "add": ([], cli + index + ["add", str(files), "--tags", "bench-nova"]),
+        "add_noop": ([cli + index + ["add", str(files), "--tags", "bench-nova"]],
+                     cli + index + ["add", str(files), "--tags", "bench-nova"]),
+        "remove": ([cli + index + ["add", str(files), "--tags", "bench-nova"]],
+                   cli + index + ["remove", str(files), "--tags", "bench-nova"]),
+        "set": ([], cli + index + ["set", str(files), "--people", person, "--tags", tag]),
+        "clear": ([], cli + index + ["clear", str(files), "--people"]),
+        "gui_thumbs": ([], child),
+    }[name]
+
+
+WRITES = {"add", "add_noop", "remove", "set", "clear"}
+
+
+def run_scenario(name, files, manifest, env, jobs):
+    with tempfile.TemporaryDirectory(prefix="imgmeta-bench-") as tmp:
+        tmp = Path(tmp)
+        (tmp / "manifest.json").write_text(json.dumps(manifest))
+        if name in WRITES:
+            # escrita numa cópia, para o corpus continuar igual entre execuções
+            shutil.copytree(files, tmp / "files")
+            files = tmp / "files"
+        env = dict(env, XDG_CACHE_HOME=str(tmp / "cache"), LOCALAPPDATA=str(tmp / "cache"))
+        setup, cmd = scenario_commands(name, files, manifest, tmp)
+        if jobs > 1 and "--child" not in cmd:
+            i = cmd.index(str(files)) + 1
+            cmd = cmd[:i] + ["-j", str(jobs)] + cmd[i:]
+        for s in setup:
+            subprocess.run([sys.executable, *s], env=env, stdout=subprocess.DEVNULL, check=True)
+        seconds, rss, code, err = run_measured(cmd, env, tmp)
+    count = THUMB_LIMIT if name == "gui_thumbs" else manifest["files"]
+    count = min(count, manifest["files"])
+    result = {
+        "scenario": name, "files": count, "seconds": round(seconds, 4),
+        "files_per_sec": round(count / seconds, 1) if seconds else None,
+        "max_rss_kb": rss, "exit": code,
+    }
+    if code:
+        result["stderr"] = err[-2000:]
+    return result
+
+
+def compare(results, base_path):
+    base = {(r["scenario"], r["files"]): r for r in json.loads(Path(base_path).read_text())["results"]}
+    print(f"{'cenário':<14} {'arquivos':>9} {'antes/s':>10} {'agora/s':>10} {'razão':>7} {'RSS (KiB)':>18}")
+    for r in results:
+        b = base.get((r["scenario"], r["files"]))
+        if not b or not b.get("files_per_sec") or not r.get("files_per_sec"):
+            continue
+        ratio = r["files_per_sec"] / b["files_per_sec"]
+        rss = f"{b.get('max_rss_kb')} → {r.get('max_rss_kb')}"
+        print(f"{r['scenario']:<14} {r['files']:>9} {b['files_per_sec']:>10} {r['files_per_sec']:>10} "
+              f"{ratio:>6.2f}x {rss:>18}")
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "-C", str(REPO), "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_size(text):
+    w, _, h = text.partition("x")
+    return int(w), int(h or w)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        name, target, manifest = sys.argv[2:5]
+        CHILDREN[name](Path(target), json.loads(Path(manifest).read_text()))
+        return
+
+    p = argparse.ArgumentParser(description="Benchmarks do imgmeta sobre um corpus sintético.")
+    p.add_argument("--sizes", default="1000,10000,100000",
+                   help="Tamanhos do corpus, separados por vírgula (default: 1000,10000,100000).")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS),
+                   help=f"Cenários, separados por vírgula (default: todos: {','.join(SCENARIOS)}).")
+    p.add_argument("--formats", default="jpg,png,tif", type=lambda s: s.split(","),
+                   help="Formatos do corpus (default: jpg,png,tif).")
+    p.add_argument("--tags", type=int, default=5, help="Tags por arquivo (default: 5).")
+    p.add_argument("--people", type=int, default=2, help="Pessoas por arquivo (default: 2).")
+    p.add_argument("--size", type=parse_size, default=(320, 240), help="Dimensão das imagens, LxA (default: 320x240).")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--jobs", type=int, default=1, help="Passa -j N aos comandos do imgmeta.")
+    p.add_argument("--exiftool", choices=["fake", "real"], default="fake")
+    p.add_argument("--latency", type=float, default=0.0,
+                   help="Exiftool falso: segundos por comando (default: 0).")
+    p.add_argument("--file-latency", type=float, default=0.0,
+                   help="Exiftool falso: segundos por arquivo (default: 0).")
+    p.add_argument("--workdir", type=Path, default=ROOT / ".corpus",
+                   help="Onde os corpora gerados ficam guardados (default: benchmarks/.corpus).")
+    p.add_argument("--out", type=Path, help="Grava o resultado em JSON neste arquivo (default: stdout).")
+    p.add_argument("--compare", type=Path, metavar="JSON", help="Compara com um resultado anterior.")
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [s for s in args.scenarios.split(",") if s]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        p.error(f"cenário(s) desconhecido(s): {', '.join(sorted(unknown))}")
+
+    env = dict(os.environ)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="imgmeta-bench-bin-") as bintmp:
+        if args.exiftool == "fake":
+            env["PATH"] = str(fake_exiftool_dir(Path(bintmp))) + os.pathsep + env.get("PATH", "")
+            env["FAKE_EXIFTOOL_LATENCY"] = str(args.latency)
+            env["FAKE_EXIFTOOL_FILE_LATENCY"] = str(args.file_latency)
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        for n in sizes:
+            files, manifest = ensure_corpus(args.workdir, n, args)
+            for name in names:
+                r = run_scenario(name, files, manifest, env, args.jobs)
+                print(f"{name:<14} {n:>8}: {r['seconds']:.2f}s, {r['files_per_sec']} arq/s, "
+                      f"RSS {r['max_rss_kb']} KiB" + (f" (saída {r['exit']})" if r["exit"] else ""),
+                      file=sys.stderr)
+                results.append(r)
+
+    report = {
+        "meta": {
+            "revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "exiftool": args.exiftool,
+            "latency": args.latency, "file_latency": args.file_latency, "jobs": args.jobs,
+            "corpus": {"formats": args.formats, "tags": args.tags, "people": args.people,
+                       "size": list(args.size), "seed": args.seed},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
+import hashlib
+import io
+import itertools
+import os
+import queue
 import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
@@ -13,13 +21,286 @@ except Exception:
 
 # Pillow para geração de miniaturas
 try:
-    from PIL import Image, ImageTk  # type: ignore
+    from PIL import Image, ImageTk, features  # type: ignore
     PIL_AVAILABLE = True
+    EXIF_TRANSPOSE = {
+        2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180,
+        4: Image.Transpose.FLIP_TOP_BOTTOM, 5: Image.Transpose.TRANSPOSE,
+        6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE,
+        8: Image.Transpose.ROTATE_90,
+    }
 except Exception:
     PIL_AVAILABLE = False
 
 
 DEFAULT_EXTS = ["jpg", "jpeg", "png", "heic", "tif", "tiff"]
+THUMB_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMB_PHOTO_CACHE = 500  # PhotoImages mantidas em memória
+THUMB_OVERSCAN = 2  # linhas extras acima/abaixo da área visível
+THUMB_LABEL_HEIGHT = 22
+LOAD_SLICE_SECONDS = 0.03  # tempo máximo de cada fatia de trabalho no loop do Tk
+WORKERS = 4
+POLL_MS = 30  # intervalo com que o Tk recolhe os resultados das threads
+BULK_CHUNK = 20  # arquivos por chamada nas gravações em lote (granularidade do progresso)
+# prioridades da fila (menor sai primeiro)
+PRIO_META = 0
+PRIO_WRITE = 1
+PRIO_THUMB = 2
+EXIF_ORIENTATION = 0x0112
+
+
+class ThumbCache:
+    """Miniaturas prontas em disco, para não decodificar de novo as mesmas imagens.
+
+    O nome de cada arquivo é o hash de (caminho, tamanho, mtime, tamanho da
+    miniatura): uma imagem alterada simplesmente gera outra chave. Leituras
+    renovam o mtime da entrada, e quando o total passa de ``max_bytes`` as
+    entradas usadas há mais tempo são apagadas.
+    """
+
+    def __init__(self, root: Path | None = None, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.root = Path(root or core.default_index_path().parent / "thumbs")
+        self.max_bytes = max_bytes
+        self.suffix = ".webp" if features.check("webp") else ".jpg"
+        self._total: int | None = None  # calculado na primeira gravação
+        self._lock = threading.Lock()  # put() é chamado pelas threads de trabalho
+
+    def _entry(self, path: Path, size: tuple[int, int]) -> Path | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{size[0]}x{size[1]}"
+        h = hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()
+        return self.root / h[:2] / (h + self.suffix)
+
+    def get(self, path: Path, size: tuple[int, int]):
+        entry = self._entry(path, size)
+        if entry is None:
+            return None
+        try:
+            im = Image.open(entry)
+            im.load()
+        except Exception:
+            return None
+        try:
+            # LRU aproximado: só renova entradas não usadas há mais de um dia
+            if time.time() - entry.stat().st_mtime > 86400:
+                os.utime(entry)
+        except OSError:
+            pass
+        return im
+
+    def put(self, path: Path, size: tuple[int, int], im) -> None:
+        entry = self._entry(path, size)
+        if entry is None:
+            return
+        tmp = entry.with_name(entry.name + f".{os.getpid()}.tmp")
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            if self.suffix == ".webp":
+                if im.mode not in ("RGB", "RGBA"):
+                    im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+            elif im.mode != "RGB":
+                im = im.convert("RGB")
+            im.save(tmp, "WEBP" if self.suffix == ".webp" else "JPEG", quality=85)
+            os.replace(tmp, entry)
+            with self._lock:
+                if self._total is None:
+                    self._total = sum(f.stat().st_size for f in self.root.glob("*/*") if f.is_file())
+                else:
+                    self._total += entry.stat().st_size
+                if self._total > self.max_bytes:
+                    self.prune()
+        except Exception:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def prune(self) -> None:
+        entries = []
+        for f in self.root.glob("*/*"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        # apaga até ficar em 90% do limite, para não podar a cada gravação
+        for _, size, f in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                f.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._total = total
+
+
+def make_thumbnail(path: Path, size: tuple[int, int], cache: ThumbCache | None = None):
+    """Imagem PIL de ``path`` reduzida para caber em ``size`` (None se não der para abrir)."""
+    if not PIL_AVAILABLE:
+        return None
+    cached = cache.get(path, size) if cache else None
+    if cached is not None:
+        return cached
+    try:
+        im = open_preview(path, size)
+    except Exception:
+        # fallback para miniatura via exiftool
+        try:
+            im = Image.open(io.BytesIO(core.extract_thumbnail(path)))
+        except Exception:
+            return None
+    try:
+        im.thumbnail(size)
+        if cache:
+            cache.put(path, size, im)
+        return im
+    except Exception:
+        return None
+
+
+def open_preview(path: Path, size: tuple[int, int]):
+    """Abre ``path`` já perto de ``size``, decodificando o mínimo possível.
+
+    Em JPEG, usa a ThumbnailImage embutida quando ela é grande o bastante;
+    senão, ``draft()`` faz o decodificador reduzir a imagem (1/2, 1/4 ou
+    1/8) em vez de gerar todos os pixels. Outros formatos são abertos
+    inteiros.
+    """
+    im = Image.open(path)
+    try:
+        orientation = im.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        orientation = 1
+    box = (size[1], size[0]) if orientation in (5, 6, 7, 8) else size
+    if im.format == "JPEG":
+        thumb = _embedded_preview(path, im.size, box)
+        if thumb is not None:
+            im.close()
+            im = thumb
+        else:
+            im.draft(None, box)
+    im.load()
+    if orientation in EXIF_TRANSPOSE:
+        im = im.transpose(EXIF_TRANSPOSE[orientation])
+    return im
+
+
+def _embedded_preview(path: Path, full: tuple[int, int], box: tuple[int, int]):
+    # só serve se tiver a proporção da foto (sem tarjas) e não for menor que a miniatura final
+    data = core.embedded_thumbnail(path)
+    if not data:
+        return None
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except Exception:
+        return None
+    (fw, fh), (tw, th) = full, thumb.size
+    if abs(tw * fh - th * fw) > 0.02 * th * fw:
+        return None
+    scale = min(box[0] / fw, box[1] / fh, 1)
+    if tw < int(fw * scale) or th < int(fh * scale):
+        return None
+    return thumb
+
+
+class ThumbItem:
+    __slots__ = ("path", "selected")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.selected = False
+
+
+class Task:
+    __slots__ = ("func", "args", "on_done", "on_error", "cancelled")
+
+    def __init__(self, func, args, on_done, on_error):
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class WorkerPool:
+    """Threads de trabalho com fila de prioridade para tirar E/S do loop do Tk.
+
+    ``submit`` enfileira ``func(*args)``; o resultado (ou a exceção) volta para
+    ``on_done``/``on_error`` na thread do Tk, recolhido por ``after()``. Uma
+    tarefa cancelada antes de começar não roda, e depois de terminar não chama
+    os callbacks.
+    """
+
+    def __init__(self, master: tk.Misc, workers: int = WORKERS):
+        self.master = master
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._results: queue.SimpleQueue = queue.SimpleQueue()
+        self._seq = itertools.count()
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+        self._poll_job = master.after(POLL_MS, self._poll)
+
+    def submit(self, priority, func, *args, on_done=None, on_error=None) -> Task:
+        task = Task(func, args, on_done, on_error)
+        self._queue.put((priority, next(self._seq), task))
+        return task
+
+    def post(self, func, *args):
+        """Agenda ``func(*args)`` na thread do Tk (pode ser chamado de qualquer thread)."""
+        self._results.put((func, args))
+
+    def _work(self):
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+            if task.cancelled:
+                continue
+            try:
+                result = task.func(*task.args)
+            except Exception as e:
+                if task.on_error:
+                    self.post(self._finish, task, task.on_error, e)
+                continue
+            if task.on_done:
+                self.post(self._finish, task, task.on_done, result)
+
+    @staticmethod
+    def _finish(task, callback, value):
+        if not task.cancelled:
+            callback(value)
+
+    def _poll(self):
+        while True:
+            try:
+                func, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception:
+                self.master.report_callback_exception(*sys.exc_info())
+        self._poll_job = self.master.after(POLL_MS, self._poll)
+
+    def shutdown(self):
+        try:
+            self.master.after_cancel(self._poll_job)
+        except Exception:
+            pass
+        # prioridade em tupla, como as das tarefas: um float não se compara com elas no heap
+        for _ in self._threads:
+            self._queue.put(((float("inf"),), next(self._seq), None))
 
 
 class App(tk.Tk):
@@ -39,6 +320,11 @@ class App(tk.Tk):
             self.destroy()
             return
 
+        try:
+            core.open_cache()
+        except Exception:
+            pass  # sem cache: metadados sempre lidos pelo exiftool
+
         self.dir_var = tk.StringVar(value=str(Path.cwd()))
         self.recursive_var = tk.BooleanVar(value=False)
         self.ext_var = tk.StringVar(value=", ".join(DEFAULT_EXTS))
@@ -46,9 +332,27 @@ class App(tk.Tk):
 
         self.files: list[Path] = []
         self.current_path: Path | None = None
+        self._meta_task: Task | None = None  # leitura de metadados em andamento
+        self._bulk_cancel: threading.Event | None = None  # gravação em lote em andamento
 
+        self.pool = WorkerPool(self)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self._build_ui()
 
+    def _on_close(self):
+        if self._bulk_cancel is not None:
+            if not messagebox.askyesno("Gravação em andamento", "Cancelar a gravação e sair?"):
+                return
+            # arquivos já gravados continuam gravados; o lote em curso é interrompido abaixo
+            self._bulk_cancel.set()
+        try:
+            self.pool.shutdown()
+            # sem esperar o comando em andamento (close_exiftool esperaria até EXIFTOOL_TIMEOUT);
+            # o exiftool grava num temporário, então o arquivo interrompido fica como estava
+            core.kill_exiftool()
+        finally:
+            self.destroy()
+
     # UI
     def _build_ui(self):
         top = ttk.Frame(self, padding=8)
@@ -73,24 +377,26 @@ class App(tk.Tk):
         left_mid = ttk.Frame(left)
         left_mid.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self.use_thumbs = PIL_AVAILABLE
-        self.thumb_items: list[dict] = []  # para modo miniatura
+        self.thumb_cache = ThumbCache() if PIL_AVAILABLE else None
+        self.thumb_items: list[ThumbItem] = []  # para modo miniatura: um por arquivo, na ordem de self.files
         # parâmetros de miniatura
         self._thumb_size = (160, 160)
         self._thumb_pad = 6
         self._thumb_cols = 1
+        # grade virtual: só existem widgets para as linhas visíveis (+ THUMB_OVERSCAN)
+        self._tiles: list[dict] = []  # widgets reaproveitados
+        self._visible: dict[int, dict] = {}  # índice do arquivo -> tile
+        self._photos: OrderedDict = OrderedDict()  # path -> PhotoImage (LRU)
+        self._thumb_tasks: dict[Path, Task] = {}  # miniaturas na fila, por arquivo
+        self._visible_job = None
+        self._load_gen = 0
         if self.use_thumbs:
-            # Canvas com rolagem e um frame interno para as miniaturas
+            # Canvas com rolagem; as miniaturas são janelas posicionadas no próprio canvas
             self.thumb_canvas = tk.Canvas(left_mid, highlightthickness=0)
             self.thumb_scroll = ttk.Scrollbar(left_mid, orient="vertical", command=self.thumb_canvas.yview)
-            self.thumb_canvas.configure(yscrollcommand=self.thumb_scroll.set)
+            self.thumb_canvas.configure(yscrollcommand=self._on_thumb_scroll)
             self.thumb_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             self.thumb_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-            self.thumb_frame = ttk.Frame(self.thumb_canvas)
-            self.thumb_window_id = self.thumb_canvas.create_window((0, 0), window=self.thumb_frame, anchor="nw")
-            self.thumb_frame.bind(
-                "<Configure>",
-                lambda e: self.thumb_canvas.configure(scrollregion=self.thumb_canvas.bbox("all"))
-            )
             # suporte a rolagem com roda do mouse
             self.thumb_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
             # reflow ao redimensionar
@@ -170,7 +476,10 @@ class App(tk.Tk):
         # Status bar
         status = ttk.Frame(self)
         status.pack(fill=tk.X)
-        ttk.Label(status, textvariable=self.status_var, anchor="w").pack(fill=tk.X, padx=8, pady=6)
+        # barra de progresso e cancelar: só aparecem durante gravações em lote
+        self.progress = ttk.Progressbar(status, length=200, mode="determinate")
+        self.cancel_btn = ttk.Button(status, text="Cancelar", command=self._cancel_bulk)
+        ttk.Label(status, textvariable=self.status_var, anchor="w").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=8, pady=6)
 
         # Carregamento inicial
         self.load_files()
@@ -192,35 +501,85 @@ class App(tk.Tk):
             messagebox.showerror("Pasta inválida", "Selecione uma pasta existente.")
             return
         exts = self._exts() or DEFAULT_EXTS
-        self.files = list(core.iter_targets([base], recursive=self.recursive_var.get(), exts=exts))
-        self.files.sort()
+        # a varredura anda em fatias pelo after(), com a janela respondendo;
+        # um novo "Carregar" incrementa _load_gen e a varredura anterior para
+        self._load_gen += 1
+        self.files = []
         if self.use_thumbs:
-            self._render_thumbnails()
+            self.thumb_items = []
+            self._cancel_thumbs(self._thumb_tasks)
+            self.thumb_canvas.yview_moveto(0)
+            self._layout_thumbnails()
         else:
             self.file_list.delete(0, tk.END)
-            for p in self.files:
+        self.status_var.set("Carregando…")
+        it = core.iter_targets([base], recursive=self.recursive_var.get(), exts=exts)
+        self._load_step(self._load_gen, it, base)
+
+    def _sort_files(self):
+        """Põe ``self.files`` (e as miniaturas ou a lista) em ordem, mantendo a seleção."""
+        files = self.files
+        if all(a <= b for a, b in zip(files, files[1:])):
+            return
+        order = sorted(range(len(files)), key=files.__getitem__)
+        self.files = [files[i] for i in order]
+        if self.use_thumbs:
+            # a seleção fica no próprio ThumbItem
+            self.thumb_items = [self.thumb_items[i] for i in order]
+            return
+        labels = self.file_list.get(0, tk.END)
+        selected = set(self.file_list.curselection())
+        self.file_list.delete(0, tk.END)
+        self.file_list.insert(tk.END, *(labels[i] for i in order))
+        for new, old in enumerate(order):
+            if old in selected:
+                self.file_list.selection_set(new)
+
+    def _load_step(self, gen: int, it, base: Path):
+        if gen != self._load_gen:
+            return
+        deadline = time.monotonic() + LOAD_SLICE_SECONDS
+        done = False
+        while time.monotonic() < deadline:
+            p = next(it, None)
+            if p is None:
+                done = True
+                break
+            # no fim da lista; a ordem alfabética é feita uma vez só, no fim da varredura
+            self.files.append(p)
+            if self.use_thumbs:
+                self.thumb_items.append(ThumbItem(p))
+            else:
                 try:
                     label = str(p.relative_to(base))
                 except Exception:
                     label = str(p)
                 self.file_list.insert(tk.END, label)
+        if done:
+            self._sort_files()
+        if self.use_thumbs:
+            self._layout_thumbnails()
+        if not done:
+            self.status_var.set(f"Carregando… {len(self.files)} arquivo(s)")
+            self.after(1, self._load_step, gen, it, base)
+            return
         self.status_var.set(f"{len(self.files)} arquivo(s) carregado(s)")
         if self.files:
             if self.use_thumbs:
                 # seleciona o primeiro automaticamente
-                if self.thumb_items:
+                if not any(item.selected for item in self.thumb_items):
                     self._set_tile_selected(self.thumb_items[0], True)
                     self._update_selection_meta()
             else:
-                self.file_list.selection_clear(0, tk.END)
-                self.file_list.selection_set(0)
-                self._on_select_file()
+                if not self.file_list.curselection():
+                    self.file_list.selection_set(0)
+                    self._on_select_file()
         else:
             self._show_meta([])
 
     def _get_selected_paths(self) -> list[Path]:
         if self.use_thumbs:
-            return [it["path"] for it in self.thumb_items if it.get("selected")]
+            return [it.path for it in self.thumb_items if it.selected]
         sel = self.file_list.curselection()
         out: list[Path] = []
         for idx in sel:
@@ -237,22 +596,36 @@ class App(tk.Tk):
         self.current_path = path
         self.people_list.delete(0, tk.END)
         self.tags_list.delete(0, tk.END)
+        # leitura em segundo plano; uma seleção nova (ou vazia) cancela a anterior
+        if self._meta_task is not None:
+            self._meta_task.cancel()
+            self._meta_task = None
         if not path:
             self.path_label.config(text="(nenhum arquivo)")
             return
         # Quando múltiplos arquivos estão selecionados, mostramos apenas o primeiro na prévia
         label = str(path) if len(paths) <= 1 else f"{len(paths)} arquivo(s) selecionado(s) — mostrando: {path.name}"
-        try:
-            meta = core.read_values(path)
-        except Exception as e:
-            messagebox.showerror("Erro ao ler metadados", str(e))
-            self.path_label.config(text=label)
-            return
         self.path_label.config(text=label)
-        for v in meta.get("people", []):
-            self.people_list.insert(tk.END, v)
-        for v in meta.get("tags", []):
-            self.tags_list.insert(tk.END, v)
+
+        def done(meta):
+            self._meta_task = None
+            for v in meta.get("people", []):
+                self.people_list.insert(tk.END, v)
+            for v in meta.get("tags", []):
+                self.tags_list.insert(tk.END, v)
+
+        def failed(e):
+            self._meta_task = None
+            messagebox.showerror("Erro ao ler metadados", str(e))
+
+        self._meta_task = self.pool.submit((PRIO_META,), core.read_values, path, on_done=done, on_error=failed)
+
+    def _meta_pending(self) -> bool:
+        # enquanto a leitura não chega as listas estão vazias: gravar agora apagaria valores
+        if self._meta_task is not None:
+            self.status_var.set("Aguarde a leitura dos metadados…")
+            return True
+        return False
 
 
     # Miniaturas
@@ -263,120 +636,169 @@ class App(tk.Tk):
         delta = int(-1 * (event.delta / 120) * 30)
         self.thumb_canvas.yview_scroll(delta, "units")
 
-    def _render_thumbnails(self):
-        # limpa itens antigos
-        for child in list(self.thumb_frame.winfo_children()):
-            child.destroy()
-        self.thumb_items.clear()
-
-        # cria itens (posicionamento será feito por _layout_thumbnails)
-        for idx, p in enumerate(self.files):
-            tile = tk.Frame(self.thumb_frame, bd=2, relief=tk.RIDGE, bg="#f0f0f0")
-            # grid será ajustado depois
-            # imagem
-            img_label = tk.Label(tile, bg="#ddd")
-            img_label.pack(fill=tk.BOTH, expand=True)
-            photo = self._make_thumb_image(p, self._thumb_size)
-            if photo is not None:
-                img_label.config(image=photo)
-            else:
-                img_label.config(text="(sem preview)")
-
-            # texto
-            name_label = tk.Label(tile, text=p.name, bg="#f0f0f0")
-            name_label.pack(fill=tk.X)
-
-            item = {"path": p, "frame": tile, "img": img_label, "name": name_label, "photo": photo, "selected": False}
-            self.thumb_items.append(item)
-
-            # binds
-            def make_handler(i=item):
-                def _h(ev=None):
-                    ctrl = (ev.state & 0x0004) != 0 if ev is not None else False
-                    self._handle_tile_click(i, additive=ctrl)
-                    # focar canvas para permitir Enter
-                    try:
-                        self.thumb_canvas.focus_set()
-                    except Exception:
-                        pass
-                return _h
-            for w in (tile, img_label, name_label):
-                w.bind("<Button-1>", make_handler())
-                w.bind("<Double-Button-1>", lambda e, pp=p: self._open_path(pp))
-
-        self._layout_thumbnails()
-
-    def _set_tile_selected(self, item: dict, value: bool):
-        item["selected"] = value
-        if value:
-            item["frame"].config(bg="#98c1ff")
-            item["name"].config(bg="#98c1ff")
+    def _new_tile(self) -> dict:
+        tile = tk.Frame(self.thumb_canvas, bd=2, relief=tk.RIDGE, bg="#f0f0f0")
+        img_label = tk.Label(tile, bg="#ddd")
+        img_label.pack(fill=tk.BOTH, expand=True)
+        name_label = tk.Label(tile, bg="#f0f0f0")
+        name_label.pack(fill=tk.X)
+        window = self.thumb_canvas.create_window(0, 0, window=tile, anchor="nw", state="hidden")
+        t = {"frame": tile, "img": img_label, "name": name_label, "window": window, "index": None, "path": None}
+
+        # os handlers olham o índice atual do tile, que muda quando ele é reaproveitado
+        def _click(ev=None):
+            if t["index"] is None:
+                return
+            ctrl = (ev.state & 0x0004) != 0 if ev is not None else False
+            self._handle_tile_click(self.thumb_items[t["index"]], additive=ctrl)
+            # focar canvas para permitir Enter
+            try:
+                self.thumb_canvas.focus_set()
+            except Exception:
+                pass
+
+        def _double(ev=None):
+            if t["index"] is not None:
+                self._open_path(self.files[t["index"]])
+
+        for w in (tile, img_label, name_label):
+            w.bind("<Button-1>", _click)
+            w.bind("<Double-Button-1>", _double)
+        return t
+
+    def _bind_tile(self, t: dict, index: int):
+        item = self.thumb_items[index]
+        t["index"] = index
+        t["path"] = item.path
+        t["name"].config(text=item.path.name)
+        photo = self._photos.get(item.path)
+        if photo is not None:
+            self._photos.move_to_end(item.path)
+            t["img"].config(image=photo, text="")
         else:
-            item["frame"].config(bg="#f0f0f0")
-            item["name"].config(bg="#f0f0f0")
-
-    def _handle_tile_click(self, item: dict, additive: bool = False):
+            t["img"].config(image="", text="…")
+            self._request_thumb(item.path, index)
+        self._paint_tile(t, item.selected)
+
+    def _paint_tile(self, t: dict, selected: bool):
+        bg = "#98c1ff" if selected else "#f0f0f0"
+        t["frame"].config(bg=bg)
+        t["name"].config(bg=bg)
+
+    def _set_tile_selected(self, item: ThumbItem, value: bool):
+        item.selected = value
+        for t in self._visible.values():
+            if self.thumb_items[t["index"]] is item:
+                self._paint_tile(t, value)
+
+    def _handle_tile_click(self, item: ThumbItem, additive: bool = False):
         if not additive:
             # limpa seleção atual
             for it in self.thumb_items:
                 self._set_tile_selected(it, False)
         # alterna item
-        self._set_tile_selected(item, not item.get("selected"))
+        self._set_tile_selected(item, not item.selected)
         self._update_selection_meta()
 
     def _update_selection_meta(self):
-        paths = [it["path"] for it in self.thumb_items if it.get("selected")]
+        paths = [it.path for it in self.thumb_items if it.selected]
         self._show_meta(paths)
 
+    def _on_thumb_scroll(self, first, last):
+        self.thumb_scroll.set(first, last)
+        # agrupa os eventos de rolagem numa única atualização
+        if self._visible_job is None:
+            self._visible_job = self.after_idle(self._update_visible)
+
+    def _update_visible(self):
+        self._visible_job = None
+        n = len(self.thumb_items)
+        height = max(1, self.thumb_canvas.winfo_height())
+        cols = self._thumb_cols
+        col_w, row_h = self._tile_box()
+        top = int(self.thumb_canvas.canvasy(0))
+        first_row = max(0, top // row_h - THUMB_OVERSCAN)
+        last_row = (top + height) // row_h + THUMB_OVERSCAN
+        wanted = range(first_row * cols, min(n, (last_row + 1) * cols))
+        # devolve ao pool os tiles que saíram da área visível
+        for index in [i for i in self._visible if i not in wanted]:
+            t = self._visible.pop(index)
+            t["index"] = t["path"] = None
+            self.thumb_canvas.itemconfigure(t["window"], state="hidden")
+        free = [t for t in self._tiles if t["index"] is None]
+        pad = self._thumb_pad
+        for index in wanted:
+            t = self._visible.get(index)
+            if t is None:
+                if not free:
+                    free.append(self._new_tile())
+                    self._tiles.append(free[-1])
+                t = self._visible[index] = free.pop()
+            # arquivos inseridos no meio da lista deslocam os índices: confere o caminho
+            if t["index"] != index or t["path"] is not self.thumb_items[index].path:
+                self._bind_tile(t, index)
+            r, c = divmod(index, cols)
+            self.thumb_canvas.coords(t["window"], c * col_w + pad, r * row_h + pad)
+            self.thumb_canvas.itemconfigure(
+                t["window"], width=col_w - 2 * pad, height=row_h - 2 * pad, state="normal"
+            )
+        # miniaturas pedidas para tiles que já saíram da tela não são mais geradas
+        shown = {t["path"] for t in self._visible.values()}
+        self._cancel_thumbs([p for p in self._thumb_tasks if p not in shown])
+
+    def _request_thumb(self, path: Path, index: int):
+        if path in self._thumb_tasks:
+            return
+
+        def done(im):
+            self._thumb_tasks.pop(path, None)
+            photo = None
+            if im is not None:
+                try:
+                    photo = ImageTk.PhotoImage(im)
+                except Exception:
+                    pass
+            if photo is not None:
+                self._photos[path] = photo
+                while len(self._photos) > THUMB_PHOTO_CACHE:
+                    self._photos.popitem(last=False)
+            for t in self._visible.values():
+                if t["path"] is path:
+                    t["img"].config(image=photo or "", text="" if photo else "(sem preview)")
+
+        # visíveis primeiro, na ordem da grade
+        self._thumb_tasks[path] = self.pool.submit(
+            (PRIO_THUMB, index), self._load_thumb, path, self._thumb_size,
+            on_done=done, on_error=lambda e: done(None),
+        )
+
+    def _cancel_thumbs(self, paths):
+        for p in list(paths):
+            task = self._thumb_tasks.pop(p, None)
+            if task is not None:
+                task.cancel()
+
     def _open_path(self, path: Path):
         try:
             core.open_in_viewer(path)
         except Exception as e:
             messagebox.showerror("Falha ao abrir", str(e))
 
-    def _make_thumb_image(self, path: Path, size: tuple[int, int]):
-        if not PIL_AVAILABLE:
-            return None
-        try:
-            try:
-                from PIL import ImageOps  # type: ignore
-            except Exception:
-                ImageOps = None  # type: ignore
-            # tenta abrir a própria imagem
-            im = Image.open(path)
-            if "exif" in im.info and 'getexif' in dir(im) and ImageOps is not None:
-                try:
-                    im = ImageOps.exif_transpose(im)
-                except Exception:
-                    pass
-        except Exception:
-            # fallback para miniatura via exiftool
-            try:
-                tmp = core.extract_thumbnail_to_temp(path)
-                im = Image.open(tmp)
-                try:
-                    Path(tmp).unlink(missing_ok=True)
-                except Exception:
-                    pass
-            except Exception:
-                return None
-        try:
-            im.thumbnail(size)
-            return ImageTk.PhotoImage(im)
-        except Exception:
-            return None
+    def _load_thumb(self, path: Path, size: tuple[int, int]):
+        # roda numa thread de trabalho: devolve a imagem PIL; o PhotoImage é criado na thread do Tk
+        return make_thumbnail(path, size, self.thumb_cache)
 
     def _on_thumb_canvas_configure(self, event):
-        # manter frame com a mesma largura do canvas e refazer layout
-        try:
-            self.thumb_canvas.itemconfigure(self.thumb_window_id, width=event.width)
-        except Exception:
-            pass
         self._layout_thumbnails(event.width)
 
+    def _tile_box(self) -> tuple[int, int]:
+        # largura de coluna (dividindo a largura do canvas) e altura de linha
+        pad = self._thumb_pad
+        width = max(1, self.thumb_canvas.winfo_width())
+        return width // self._thumb_cols, self._thumb_size[1] + pad * 2 + 8 + THUMB_LABEL_HEIGHT
+
     def _layout_thumbnails(self, width: int | None = None):
-        if not self.thumb_items:
-            return
+        # só recalcula colunas e a área de rolagem; os tiles são posicionados em _update_visible
         if width is None:
             try:
                 width = int(self.thumb_canvas.winfo_width())
@@ -386,20 +808,11 @@ class App(tk.Tk):
         pad = self._thumb_pad
         # estimativa de largura por coluna: tile + paddings + borda
         col_w = tile_w + pad * 2 + 8
-        cols = max(1, width // max(1, col_w))
-        if cols != self._thumb_cols:
-            self._thumb_cols = cols
-        # limpar grid atual
-        for it in self.thumb_items:
-            it["frame"].grid_forget()
-        # aplicar novo grid
-        for idx, it in enumerate(self.thumb_items):
-            r = idx // self._thumb_cols
-            c = idx % self._thumb_cols
-            it["frame"].grid(row=r, column=c, padx=pad, pady=pad, sticky="nsew")
-        # expandir colunas
-        for c in range(self._thumb_cols):
-            self.thumb_frame.grid_columnconfigure(c, weight=1)
+        self._thumb_cols = max(1, width // max(1, col_w))
+        _, row_h = self._tile_box()
+        rows = -(-len(self.thumb_items) // self._thumb_cols)
+        self.thumb_canvas.configure(scrollregion=(0, 0, width, rows * row_h))
+        self._update_visible()
 
     def _open_selection(self):
         paths = self._get_selected_paths()
@@ -455,40 +868,87 @@ class App(tk.Tk):
             return
         if not messagebox.askyesno("Confirmar", f"Limpar pessoas e tags em {len(paths)} arquivo(s)?"):
             return
-        ok = 0
-        err = 0
-        for p in paths:
-            try:
-                core.clear_values(p, clear_people=True, clear_tags=True)
-                ok += 1
-            except Exception:
-                err += 1
-        self.status_var.set(f"Limpeza concluída: {ok} ok, {err} erro(s)")
-        self.refresh_current()
+        self._run_bulk("Limpeza", paths, lambda chunk, **kw: core.clear_values_many(chunk, True, True, **kw))
 
     def save_current(self):
         paths = self._get_selected_paths()
         if not paths:
             messagebox.showinfo("Sem arquivo", "Selecione ao menos um arquivo na lista.")
             return
+        if self._meta_pending():
+            return
         people = self._listbox_values(self.people_list)
         tags = self._listbox_values(self.tags_list)
         if not messagebox.askyesno("Confirmar",
                                    f"Definir pessoas/tags em {len(paths)} arquivo(s)?\nIsto substitui os valores atuais." ):
             return
-        ok = 0
-        err = 0
-        for p in paths:
-            try:
-                core.clear_values(p, clear_people=True, clear_tags=True)
-                if people or tags:
-                    core.add_values(p, people=people, tags=tags)
-                ok += 1
-            except Exception:
-                err += 1
-        self.status_var.set(f"Salvo: {ok} ok, {err} erro(s)")
-        messagebox.showinfo("Concluído", f"Atualização concluída: {ok} ok, {err} erro(s)")
-        self.refresh_current()
+        self._run_bulk("Salvo", paths, lambda chunk, **kw: core.set_values_many(chunk, people, tags, **kw),
+                       notify=True)
+
+    def _run_bulk(self, label: str, paths: list[Path], write, notify: bool = False):
+        """Grava em segundo plano, BULK_CHUNK arquivos por vez, com progresso e botão de cancelar.
+
+        ``write(chunk, on_error=..., on_skip=...)`` gera os arquivos gravados, como
+        as funções ``*_many`` do core. O cancelamento vale a partir do lote seguinte.
+        """
+        if self._bulk_cancel is not None:
+            messagebox.showinfo("Aguarde", "Já há uma gravação em andamento.")
+            return
+        cancel = self._bulk_cancel = threading.Event()
+        errors: list[tuple[Path, str]] = []
+        skipped: list[Path] = []
+        total = len(paths)
+
+        def job():
+            ok = done = 0
+            for i in range(0, total, BULK_CHUNK):
+                if cancel.is_set():
+                    break
+                chunk = paths[i:i + BULK_CHUNK]
+                ok += sum(1 for _ in write(chunk, on_error=lambda p, msg: errors.append((p, msg)),
+                                           on_skip=skipped.append))
+                done += len(chunk)
+                self.pool.post(self._bulk_progress, label, done, total)
+            return ok, done
+
+        def finish(result):
+            ok, done = result
+            self._bulk_end()
+            msg = f"{label}: {ok} ok, {len(skipped)} sem mudança, {len(errors)} erro(s)"
+            if done < total:
+                msg += f", {total - done} cancelado(s)"
+            self.status_var.set(msg)
+            if notify:
+                messagebox.showinfo("Concluído", f"Atualização concluída: {msg.split(': ', 1)[1]}")
+            self.refresh_current()
+
+        def failed(e):
+            self._bulk_end()
+            messagebox.showerror("Erro ao gravar", str(e))
+            self.refresh_current()
+
+        self.progress.config(maximum=total, value=0)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(0, 8))
+        self.progress.pack(side=tk.RIGHT, padx=(0, 8))
+        self.status_var.set(f"{label}… 0/{total}")
+        self.pool.submit((PRIO_WRITE,), job, on_done=finish, on_error=failed)
+
+    def _bulk_progress(self, label: str, done: int, total: int):
+        self.progress.config(value=done)
+        if self._bulk_cancel is not None and not self._bulk_cancel.is_set():
+            self.status_var.set(f"{label}… {done}/{total}")
+
+    def _bulk_end(self):
+        self._bulk_cancel = None
+        self.progress.pack_forget()
+        self.cancel_btn.pack_forget()
+
+    def _cancel_bulk(self):
+        if self._bulk_cancel is not None:
+            self._bulk_cancel.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.status_var.set("Cancelando após o lote atual…")
 
     def _open_current(self, use_thumb: bool):
         path = self.current_path
@@ -507,43 +967,25 @@ class App(tk.Tk):
 
     def _apply_add_selected(self):
         paths = self._get_selected_paths()
-        if not paths:
+        if not paths or self._meta_pending():
             return
         people = self._listbox_values(self.people_list)
         tags = self._listbox_values(self.tags_list)
         if not (people or tags):
             messagebox.showinfo("Nada a adicionar", "Informe pessoas e/ou tags para adicionar.")
             return
-        ok = 0
-        err = 0
-        for p in paths:
-            try:
-                core.add_values(p, people=people, tags=tags)
-                ok += 1
-            except Exception:
-                err += 1
-        self.status_var.set(f"Adicionar: {ok} ok, {err} erro(s)")
-        self.refresh_current()
+        self._run_bulk("Adicionar", paths, lambda chunk, **kw: core.add_values_many(chunk, people, tags, **kw))
 
     def _apply_remove_selected(self):
         paths = self._get_selected_paths()
-        if not paths:
+        if not paths or self._meta_pending():
             return
         people = self._listbox_values(self.people_list)
         tags = self._listbox_values(self.tags_list)
         if not (people or tags):
             messagebox.showinfo("Nada a remover", "Informe pessoas e/ou tags para remover.")
             return
-        ok = 0
-        err = 0
-        for p in paths:
-            try:
-                core.remove_values(p, people=people, tags=tags)
-                ok += 1
-            except Exception:
-                err += 1
-        self.status_var.set(f"Remover: {ok} ok, {err} erro(s)")
-        self.refresh_current()
+        self._run_bulk("Remover", paths, lambda chunk, **kw: core.remove_values_many(chunk, people, tags, **kw))
 
 
 def main():
@@ -553,6 +995,9 @@ def main():
         app.mainloop()
     except Exception:
         pass
+    finally:
+        core.close_exiftool()
+        core.close_cache()
 
 
 if __name__ == "__main__":
@@ -1,99 +1,1323 @@
 
 import argparse
+import fnmatch
+import glob
+import re
 import subprocess
 from shutil import which
 from pathlib import Path
 import json
 import sys
 import tempfile, webbrowser, os, platform
+import base64, csv, hashlib
+import atexit, itertools, sqlite3, threading, time
+from contextlib import nullcontext
+
+import imgmeta_native
+from imgmeta_query import QueryError, compile_query, filters_query
+from imgmeta_stats import Hooks, Stats
+from imgmeta_store import MetaStore
 
 
 EXIFTOOL = "exiftool"
+EXIFTOOL_TIMEOUT = 300  # segundos sem resposta até considerar o exiftool travado
+BATCH_SIZE = 200  # arquivos por chamada ao exiftool nas operações em lote
+READ_TAGS = ["-XMP-dc:Subject", "-XMP-Iptc4xmpExt:PersonInImage", "-IPTC:Keywords"]
+NATIVE_READ = True  # lê XMP/IPTC de JPEG/PNG/TIFF sem exiftool quando possível
+INPLACE_WRITE = True  # add/remove reescrevem só o pacote XMP quando a edição cabe no padding
+DIFF_WRITE = True  # edições que não mudam os valores atuais não regravam o arquivo
+SIDECAR_READ = True  # leituras aplicam por cima os valores do sidecar XMP (foto.jpg.xmp), se existir
+# mtime a menos disso do momento em que foi visto não prova nada: num sistema de arquivos de
+# resolução grossa, outra mudança no mesmo instante não mudaria o mtime
+RACY_NS = 2_000_000_000
 
 def check_exiftool():
     if which(EXIFTOOL) is None:
         print("Erro: exiftool não encontrado. Instale em https://exiftool.org", file=sys.stderr)
         sys.exit(1)
 
-def iter_targets(paths, recursive=False, exts=None):
-    exts = {e.lower().lstrip(".") for e in (exts or [])}
+def _is_hidden(entry):
+    if entry.name.startswith("."):
+        return True
+    # no Windows, atributo "oculto" (vem da listagem, sem stat extra)
+    return os.name == "nt" and bool(getattr(entry.stat(), "st_file_attributes", 0) & 2)
+
+def _scan_dir(path, recursive, match, skip_hidden, exclude):
+    """Uma passada de ``os.scandir``: (arquivos aceitos, subpastas a visitar)."""
+    files, dirs = [], []
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return files, dirs
+    with it:
+        for entry in it:
+            if skip_hidden and _is_hidden(entry):
+                continue
+            try:
+                if entry.is_file():
+                    if match(entry.name):
+                        files.append(entry.path)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    if not any(fnmatch.fnmatch(entry.name, pat) for pat in exclude):
+                        dirs.append(entry.path)
+            except OSError:
+                pass
+    return files, dirs
+
+def _walk(root, recursive, match, threads, skip_hidden, exclude):
+    if threads <= 1 or not recursive:
+        stack = [root]
+        while stack:
+            files, dirs = _scan_dir(stack.pop(), recursive, match, skip_hidden, exclude)
+            yield from files
+            stack.extend(reversed(dirs))
+        return
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="imgmeta-walk") as pool:
+        pending = {pool.submit(_scan_dir, root, recursive, match, skip_hidden, exclude)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    files, dirs = fut.result()
+                    for d in dirs:
+                        pending.add(pool.submit(_scan_dir, d, recursive, match, skip_hidden, exclude))
+                    yield from files
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+def in_shard(rel: str, shard) -> bool:
+    """Se o caminho ``rel`` cai no shard ``(índice, total)``; sempre True sem shard.
+
+    O hash é do caminho com "/" como separador, então o resultado é o mesmo
+    em qualquer máquina e execução.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    h = hashlib.blake2b(rel.replace(os.sep, "/").encode("utf-8", "surrogateescape"), digest_size=8)
+    return int.from_bytes(h.digest(), "big") % count == index
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """``"ÍNDICE/TOTAL"`` → ``(índice, total)``, com 0 <= índice < total."""
+    try:
+        index, count = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise ValueError(f"shard inválido: {text!r} (use ÍNDICE/TOTAL, ex.: 0/4)")
+    if not 0 <= index < count:
+        raise ValueError(f"shard inválido: {text!r} (o índice vai de 0 a TOTAL-1)")
+    return index, count
+
+def iter_targets(paths, recursive=False, exts=None, threads=1, skip_hidden=False, exclude=(), shard=None):
+    """Arquivos de ``paths`` (arquivos, pastas ou padrões glob) com extensão em ``exts``.
+
+    Pastas são listadas com ``os.scandir`` (o tipo vem da própria listagem) e,
+    com ``threads`` > 1, as subpastas são varridas em paralelo; nesse caso a
+    ordem dos arquivos deixa de ser determinística. Caminhos repetidos ou já
+    cobertos por outra pasta da lista são ignorados. Links simbólicos para
+    pastas não são seguidos.
+
+    Com ``shard=(índice, total)`` só saem os arquivos desse shard (``in_shard``),
+    pelo caminho relativo à pasta listada; arquivos e padrões glob usam o
+    caminho como foi passado.
+    """
+    suffixes = {"." + e.lower().lstrip(".") for e in (exts or [])}
+
+    def match(name):
+        return not suffixes or os.path.splitext(name)[1].lower() in suffixes
+
+    def key(p):
+        return os.path.normcase(os.path.abspath(p))
+
+    # pastas contidas em outra pasta da lista (com -r) seriam varridas duas vezes
+    dirs = {key(p) for p in paths if os.path.isdir(p)}
+    def covered(k, own=None):
+        parent = os.path.dirname(k)
+        if parent in dirs and parent != own:
+            return True
+        if recursive:
+            return any(k.startswith(d.rstrip(os.sep) + os.sep) for d in dirs if d != own)
+        return False
+
+    seen = set()
     for p in paths:
-        p = Path(p)
-        if p.is_dir():
-            glob = "**/*" if recursive else "*"
-            for f in p.glob(glob):
-                if f.is_file():
-                    if not exts or f.suffix.lower().lstrip(".") in exts:
-                        yield f
-        elif p.is_file():
-            if not exts or p.suffix.lower().lstrip(".") in exts:
-                yield p
+        p = str(p)
+        if os.path.isdir(p):
+            k = key(p)
+            if k in seen or (recursive and covered(k, own=k)):
+                continue
+            seen.add(k)
+            for f in _walk(p, recursive, match, threads, skip_hidden, exclude):
+                if shard is None or in_shard(f[len(p):].lstrip("/" + os.sep), shard):
+                    yield Path(f)
+            continue
+        candidates = [p] if os.path.isfile(p) else sorted(glob.iglob(p, recursive=True))
+        for f in candidates:
+            k = key(f)
+            if shard is not None and not in_shard(os.path.normpath(f), shard):
+                continue
+            if os.path.isfile(f) and match(os.path.basename(f)) and k not in seen and not covered(k):
+                seen.add(k)
+                yield Path(f)
+
+class _PipeReader:
+    # drena um pipe numa thread própria; evita deadlock e permite timeout na leitura
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.buf = bytearray()
+        self.eof = False
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                chunk = self.pipe.read1(65536)
+            except (OSError, ValueError):
+                chunk = b""
+            with self.cond:
+                if chunk:
+                    self.buf += chunk
+                else:
+                    self.eof = True
+                self.cond.notify_all()
+            if not chunk:
+                return
+
+    def read_until(self, marker: bytes, timeout: float) -> bytes:
+        deadline = time.monotonic() + timeout
+        start = 0
+        with self.cond:
+            while True:
+                i = self.buf.find(marker, start)
+                if i >= 0:
+                    # consome o marcador e a quebra de linha que o segue (\n ou \r\n)
+                    j = i + len(marker)
+                    nl = self.buf.find(b"\n", j, j + 2)
+                    if nl >= 0 or self.eof:
+                        data = bytes(self.buf[:i])
+                        del self.buf[:nl + 1 if nl >= 0 else j]
+                        return data
+                else:
+                    start = max(0, len(self.buf) - len(marker))
+                if self.eof:
+                    raise EOFError
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+                self.cond.wait(remaining)
+
+
+class ExifTool:
+    """Processo exiftool persistente (``-stay_open True -@ -``).
+
+    Cada chamada a ``execute`` envia os argumentos pela entrada padrão e lê a
+    saída até o marcador ``{readyN}``. Se o processo morrer ou travar, ele é
+    encerrado e reiniciado na próxima chamada.
+    """
+
+    def __init__(self, executable=None, timeout=None):
+        self.executable = executable or EXIFTOOL
+        self.timeout = timeout or EXIFTOOL_TIMEOUT
+        self._proc = None
+        self._out = None
+        self._err = None
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._killed = False
+
+    @property
+    def running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        # grupo de processos próprio: Ctrl-C interrompe o Python, não uma escrita em andamento
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
         else:
-            # glob pattern
-            for f in Path().glob(str(p)):
-                if f.is_file():
-                    if not exts or f.suffix.lower().lstrip(".") in exts:
-                        yield f
+            kwargs = {"start_new_session": True}
+        if _stats is not None:
+            _stats.count("subprocesses")
+        self._proc = subprocess.Popen(
+            [self.executable, "-stay_open", "True", "-@", "-",
+             "-common_args", "-charset", "filename=utf8"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            **kwargs,
+        )
+        self._out = _PipeReader(self._proc.stdout)
+        self._err = _PipeReader(self._proc.stderr)
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=5)
+        except Exception:
+            pass
+
+    def kill(self):
+        """Mata o processo sem esperar o comando em andamento, que falha com ``RuntimeError``.
+
+        Não pega o lock (quem está em ``execute`` o segura) e a sessão não é mais reiniciada.
+        """
+        self._killed = True
+        proc = self._proc
+        if proc is not None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            proc = self._proc
+            if proc is None:
+                return
+            try:
+                proc.stdin.write(b"-stay_open\nFalse\n")
+                proc.stdin.flush()
+                proc.stdin.close()
+                # deixa terminar o comando em andamento (ex.: escrita interrompida por Ctrl-C)
+                proc.wait(timeout=self.timeout)
+                self._proc = None
+            except Exception:
+                self._kill()
+
+    def execute(self, args, timeout=None):
+        """Executa um comando (sem o nome do executável). Retorna (stdout bytes, stderr str)."""
+        n = next(self._seq)
+        marker = f"{{ready{n}}}"
+        payload = "\n".join([*map(str, args), "-echo4", marker, f"-execute{n}"]) + "\n"
+        with self._lock:
+            t0 = time.perf_counter()
+            started = False
+            for attempt in (1, 2):
+                if self._killed:
+                    raise RuntimeError("exiftool encerrado.")
+                if not self.running:
+                    self._kill()
+                    self.start()
+                    started = True
+                try:
+                    self._proc.stdin.write(payload.encode("utf-8"))
+                    self._proc.stdin.flush()
+                    break
+                except OSError:
+                    # o comando não chegou ao processo; reinicia e tenta de novo uma vez
+                    self._kill()
+                    if attempt == 2:
+                        raise RuntimeError("Falha ao comunicar com o exiftool.")
+            try:
+                out = self._out.read_until(marker.encode(), timeout or self.timeout)
+                err = self._err.read_until(marker.encode(), timeout or self.timeout)
+            except TimeoutError:
+                self._kill()
+                raise RuntimeError(f"exiftool não respondeu em {timeout or self.timeout}s (processo reiniciado).")
+            except EOFError:
+                tail = bytes(self._err.buf).decode("utf-8", "replace").strip()
+                self._kill()
+                raise RuntimeError(f"exiftool terminou inesperadamente (processo reiniciado). {tail}".strip())
+            if started and _stats is not None:
+                _stats.add("exiftool_start", time.perf_counter() - t0)
+        return out, err.decode("utf-8", "replace")
+
+
+_local = threading.local()
+_sessions: list[tuple[threading.Thread, ExifTool]] = []
+_sessions_lock = threading.Lock()
+_inflight: dict[int, list] = {}  # lotes sendo gravados, para limpeza de temporários
+
+def _remove_tmp(paths):
+    # temporário que o exiftool deixa ao lado do original quando é morto no meio de uma escrita
+    for path in paths:
+        Path(f"{path}_exiftool_tmp").unlink(missing_ok=True)
+
+def exiftool_session() -> ExifTool:
+    # uma sessão por thread: cada thread conversa com o seu próprio processo
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = ExifTool()
+        with _sessions_lock:
+            _sessions.append((threading.current_thread(), s))
+    return s
+
+def kill_exiftool():
+    """Mata os processos do exiftool de todas as threads sem esperar os comandos em andamento.
+
+    Uma escrita em curso falha com ``RuntimeError`` (e ``write_many`` apaga o
+    temporário dela); as sessões mortas não reiniciam. ``close_exiftool`` ainda
+    precisa ser chamado depois para tirá-las da lista.
+    """
+    with _sessions_lock:
+        sessions = [s for _, s in _sessions]
+    for s in sessions:
+        s.kill()
+
+def close_exiftool(finished_threads_only=False):
+    with _sessions_lock:
+        closing = [(t, s) for t, s in _sessions if not (finished_threads_only and t.is_alive())]
+        _sessions[:] = [x for x in _sessions if x not in closing]
+    for _, s in closing:
+        s.close()
+    if not finished_threads_only:
+        _local.__dict__.pop("session", None)
+        # escritas interrompidas (Ctrl-C): o exiftool terminou ou foi morto no close acima
+        for key, chunk in list(_inflight.items()):
+            _remove_tmp(chunk)
+            _inflight.pop(key, None)
+
+atexit.register(close_exiftool)
+
+_stats: Stats | None = None  # ligado por enable_stats (--stats/--stats-json)
+_hooks: list[Hooks] = []
+
+def add_hook(hook: Hooks):
+    """Registra callbacks em volta de cada comando do exiftool e de cada arquivo (ver ``Hooks``)."""
+    _hooks.append(hook)
+
+def remove_hook(hook: Hooks):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def enable_stats(stats: Stats | None = None) -> Stats:
+    """Passa a medir fases, processos e arquivos; o resultado sai de ``disable_stats``."""
+    global _stats
+    disable_stats()
+    _stats = stats or Stats()
+    add_hook(_stats)
+    return _stats
+
+def disable_stats() -> Stats | None:
+    global _stats
+    stats, _stats = _stats, None
+    if stats is not None:
+        remove_hook(stats)
+        stats.finish(_cache)
+    return stats
+
+def _phase(name):
+    return _stats.phase(name) if _stats is not None else nullcontext()
+
+def _done(op, source, paths, t0, phase=None):
+    """Fecha uma medição iniciada em ``t0``: soma o tempo na fase e avisa os hooks de cada arquivo.
+
+    O tempo é dividido igualmente entre ``paths`` (um lote do exiftool não
+    diz quanto cada arquivo levou).
+    """
+    if _stats is None and not _hooks:
+        return
+    seconds = time.perf_counter() - t0
+    if phase and _stats is not None:
+        _stats.add(phase, seconds)
+    if paths:
+        each = seconds / len(paths)
+        for h in list(_hooks):
+            for p in paths:
+                h.file_done(op, p, each, source)
+
+def _has_errors(stderr):
+    return any(line.startswith("Error") for line in stderr.splitlines())
+
+def _run_raw(cmd, check=True):
+    if not _hooks:
+        return _exec(cmd, check)
+    hooks = list(_hooks)
+    for h in hooks:
+        h.before_run(cmd)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        out, err = _exec(cmd, check)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        for h in hooks:
+            h.after_run(cmd, seconds, error)
+    if _stats is not None:
+        _stats.count("exiftool_output_bytes", len(out))
+    return out, err
+
+def _exec(cmd, check):
+    # argumentos com quebra de linha não cabem no protocolo -@ (um argumento por linha)
+    if cmd[0] != EXIFTOOL or any("\n" in str(a) for a in cmd):
+        if _stats is not None:
+            _stats.count("subprocesses")
+        r = subprocess.run(cmd, capture_output=True)
+        err = r.stderr.decode("utf-8", "replace")
+        if check and r.returncode != 0:
+            raise RuntimeError(err.strip())
+        return r.stdout, err
+    out, err = exiftool_session().execute(cmd[1:])
+    if check and _has_errors(err):
+        raise RuntimeError(err.strip())
+    return out, err
 
 def run(cmd):
-    r = subprocess.run(cmd, capture_output=True, text=True)
-    if r.returncode != 0:
-        raise RuntimeError(r.stderr.strip())
-    return r.stdout
+    out, _ = _run_raw(cmd)
+    return out.decode("utf-8", "replace")
 
-def add_values(path, people=None, tags=None):
-    cmd = [EXIFTOOL, "-overwrite_original", "-charset", "iptc=utf8"]
+def default_index_path() -> Path:
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "imgmeta" / "index.db"
+
+class MetaCache:
+    """Cache SQLite dos registros de ``read_values``.
+
+    Cada entrada guarda o (tamanho, mtime) do arquivo quando foi lida; se o
+    arquivo mudou, a entrada é ignorada e o exiftool é consultado de novo.
+    Arquivos com mtime a menos de ``RACY_NS`` do momento da gravação não
+    entram: uma regravação do mesmo tamanho no mesmo instante (a escrita no
+    lugar não muda o tamanho) não mudaria o mtime e o cache ficaria velho.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, tags TEXT, people TEXT)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def get_many(self, paths) -> dict:
+        """Devolve {índice em ``paths``: registro} para as entradas ainda válidas."""
+        keys = [self._key(p) for p in paths]
+        with self._lock:
+            rows = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                q = f"SELECT path, size, mtime_ns, tags, people FROM files WHERE path IN ({','.join('?' * len(part))})"
+                rows.update((r[0], r[1:]) for r in self._db.execute(q, part))
+        found = {}
+        for i, (p, k) in enumerate(zip(paths, keys)):
+            row = rows.get(k)
+            if row and (row[0], row[1]) == self._stat(p):
+                found[i] = {"file": str(p), "tags": json.loads(row[2]), "people": json.loads(row[3])}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(paths) - len(found)
+        return found
+
+    def get(self, path):
+        return self.get_many([path]).get(0)
+
+    def put_many(self, metas):
+        rows = []
+        racy = []
+        now = time.time_ns()
+        for m in metas:
+            sig = self._stat(m["file"])
+            if sig is None:
+                continue
+            if now - sig[1] <= RACY_NS:
+                racy.append((self._key(m["file"]),))
+                continue
+            rows.append((self._key(m["file"]), *sig,
+                         json.dumps(m["tags"], ensure_ascii=False),
+                         json.dumps(m["people"], ensure_ascii=False)))
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.executemany("DELETE FROM files WHERE path = ?", racy)
+            self._db.commit()
+
+    def forget_many(self, paths):
+        with self._lock:
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(self._key(p),) for p in paths])
+            self._db.commit()
+
+    def merge_from(self, path) -> int:
+        """Copia as entradas de outro cache; as de ``path`` substituem as daqui. Devolve quantas."""
+        with self._lock:
+            self._db.execute("ATTACH DATABASE ? AS src", (str(path),))
+            try:
+                n = self._db.execute("INSERT OR REPLACE INTO files"
+                                     " SELECT path, size, mtime_ns, tags, people FROM src.files").rowcount
+                self._db.commit()
+            finally:
+                self._db.execute("DETACH DATABASE src")
+        return n
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_cache: MetaCache | None = None
+
+def open_cache(path=None) -> MetaCache:
+    global _cache
+    close_cache()
+    _cache = MetaCache(path or default_index_path())
+    return _cache
+
+def close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+def _keyed_chunks(iterable, size, parts, key):
+    # lotes de até ``size`` itens por partição (hash da chave); gera (partição, lote)
+    buckets = [[] for _ in range(parts)]
+    for item in iterable:
+        part = hash(key(item)) % parts
+        buckets[part].append(item)
+        if len(buckets[part]) >= size:
+            yield part, buckets[part]
+            buckets[part] = []
+    for part, chunk in enumerate(buckets):
+        if chunk:
+            yield part, chunk
+
+def _path_key(path):
+    # mesma chave para "a.jpg", "./a.jpg" e o caminho absoluto
+    return os.path.normcase(os.path.abspath(path))
+
+def _src_key(name):
+    # o exiftool devolve SourceFile com "/" mesmo no Windows
+    return str(name).replace("\\", "/")
+
+def _file_errors(stderr, paths):
+    # linhas do tipo "Error: File not found - fotos/a.jpg" → {chave do arquivo: mensagem}
+    keys = {_src_key(p) for p in paths}
+    errors = {}
+    for line in stderr.splitlines():
+        if not line.startswith("Error"):
+            continue
+        msg, sep, name = line.partition(": ")[2].rpartition(" - ")
+        if sep and _src_key(name) in keys:
+            errors[_src_key(name)] = msg
+    return errors
+
+def report_error(path, msg):
+    print(f"Erro: {path}: {msg}", file=sys.stderr)
+
+def _meta_from_json(path, data):
+    def norm(v):
+        if isinstance(v, list):
+            return v
+        if isinstance(v, str):
+            return [v]
+        return []
+    return {
+        "file": str(path),
+        "tags": sorted(set(norm(data.get("Subject", [])) + norm(data.get("Keywords", [])))),
+        "people": sorted(set(norm(data.get("PersonInImage", []))))
+    }
+
+def _read_local(chunk):
+    """A parte da leitura de um lote que não usa o exiftool (cache e cabeçalho).
+
+    Devolve ({índice: registro}, registros lidos agora, arquivos que faltam).
+    """
+    t0 = time.perf_counter()
+    found = _cache.get_many(chunk) if _cache is not None else {}
+    if _cache is not None:
+        _done("read", "cache", [chunk[i] for i in found], t0, "cache")
+    fresh = []
+    misses = []
+    for i, path in enumerate(chunk):
+        if i in found:
+            continue
+        if NATIVE_READ:
+            t0 = time.perf_counter()
+            try:
+                found[i] = _meta_from_json(path, imgmeta_native.read_fields(path))
+            except imgmeta_native.Unsupported:
+                _done("read", "native", (), t0, "native")
+            else:
+                fresh.append(found[i])
+                _done("read", "native", [path], t0, "native")
+                continue
+        misses.append(path)
+    return found, fresh, misses
+
+def _read_args(misses):
+    return ["-json", *READ_TAGS, *map(str, misses)]
+
+def sidecar_path(path) -> Path:
+    """Sidecar XMP de ``path``: o nome inteiro mais .xmp (``foto.jpg`` → ``foto.jpg.xmp``).
+
+    Com a extensão no nome, ``foto.jpg`` e ``foto.tif`` (ou um par RAW+JPEG)
+    não dividem o mesmo sidecar, como aconteceria com ``foto.xmp``.
+    """
+    path = Path(path)
+    return path.with_name(path.name + ".xmp")
+
+_sidecar_dirs: dict[str, tuple[int, int, frozenset]] = {}  # pasta → (mtime, quando foi listada, nomes .xmp)
+_sidecar_dirs_lock = threading.Lock()
+
+def _sidecars_in(folder) -> frozenset:
+    """Nomes (``normcase``) dos ``.xmp`` de ``folder``, de uma listagem guardada por pasta.
+
+    A listagem só é refeita quando o mtime da pasta muda (criar, renomear ou
+    apagar um sidecar muda o mtime), então saber se um arquivo tem sidecar custa
+    um ``stat`` por pasta, e não um ``open`` por arquivo.
+    """
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return frozenset()
+    with _sidecar_dirs_lock:
+        hit = _sidecar_dirs.get(folder)
+    if hit and hit[0] == mtime and hit[1] - mtime > RACY_NS:
+        return hit[2]
+    scanned = time.time_ns()
+    try:
+        with os.scandir(folder) as it:
+            names = frozenset(os.path.normcase(e.name) for e in it if e.name.lower().endswith(".xmp"))
+    except OSError:
+        return frozenset()
+    with _sidecar_dirs_lock:
+        _sidecar_dirs[folder] = (mtime, scanned, names)
+    return names
+
+def _has_sidecar(path) -> bool:
+    path = str(path)
+    folder, name = os.path.split(path)
+    return os.path.normcase(name + ".xmp") in _sidecars_in(folder or ".")
+
+def _forget_sidecar(path):
+    # depois de criar ou apagar um sidecar: a próxima leitura lista a pasta de novo
+    with _sidecar_dirs_lock:
+        _sidecar_dirs.pop(os.path.dirname(str(path)) or ".", None)
+
+def _with_sidecar(meta):
+    # por campo, o sidecar vence: se ele tem dc:subject (mesmo vazio), as tags vêm só dele;
+    # se tem PersonInImage, as pessoas também. O que ele não tem vem do arquivo
+    if not _has_sidecar(meta["file"]):
+        return meta
+    fields = imgmeta_native.read_sidecar(sidecar_path(meta["file"]))
+    if not fields:
+        return meta
+    meta = dict(meta)
+    if "Subject" in fields:
+        meta["tags"] = sorted(set(fields["Subject"]))
+    if "PersonInImage" in fields:
+        meta["people"] = sorted(set(fields["PersonInImage"]))
+    return meta
+
+def _read_merge(chunk, local, out, err, on_error, t0, sidecar=None):
+    """Junta a resposta do exiftool (``_read_args`` sobre os que faltavam, iniciado em ``t0``) ao que
+    ``_read_local`` achou; devolve os registros na ordem de ``chunk`` e atualiza o cache.
+
+    O cache guarda só os valores do próprio arquivo; o sidecar é aplicado depois.
+    """
+    if sidecar is None:
+        sidecar = SIDECAR_READ
+    found, fresh, misses = local
+    data, errors = {}, {}
+    if misses:
+        with _phase("json"):
+            # Usa JSON do exiftool pra evitar parsing frágil; números ficam como o texto original
+            text = out.decode("utf-8", "replace").strip()
+            rows = json.loads(text, parse_int=str, parse_float=str) if text else []
+            data = {_src_key(d.get("SourceFile")): d for d in rows}
+        errors = _file_errors(err, misses)
+        _done("read", "exiftool", [p for p in misses if _src_key(p) in data], t0)
+    result = []
+    for i, path in enumerate(chunk):
+        if i in found:
+            result.append(found[i])
+            continue
+        key = _src_key(path)
+        d = data.get(key)
+        if d is None:
+            on_error(path, errors.get(key) or "sem resposta do exiftool")
+        elif "Error" in d:
+            on_error(path, d["Error"])
+        else:
+            meta = _meta_from_json(path, d)
+            fresh.append(meta)
+            result.append(meta)
+    if fresh and _cache is not None:
+        with _phase("cache"):
+            _cache.put_many(fresh)
+    if sidecar:
+        merged = []
+        for meta in result:
+            try:
+                merged.append(_with_sidecar(meta))
+            except imgmeta_native.Unsupported as e:
+                on_error(meta["file"], f"sidecar XMP ilegível ({e})")
+        result = merged
+    return result
+
+def read_values_many(paths, batch_size=BATCH_SIZE, on_error=report_error, sidecar=None):
+    """Lê pessoas/tags de vários arquivos, ``batch_size`` por chamada ao exiftool.
+
+    Gera os mesmos registros de ``read_values``, na ordem de entrada. Arquivos
+    com erro são passados a ``on_error(path, mensagem)`` e não interrompem o lote.
+    JPEG/PNG/TIFF são lidos direto do cabeçalho quando possível (``NATIVE_READ``).
+    Com ``sidecar`` (default: ``SIDECAR_READ``), os campos do sidecar XMP
+    têm precedência sobre os do arquivo (ver ``_with_sidecar``).
+    """
+    for chunk in _chunks(paths, batch_size):
+        local = _read_local(chunk)
+        out, err = b"", ""
+        t0 = time.perf_counter()
+        if local[2]:
+            out, err = _run_raw([EXIFTOOL, *_read_args(local[2])], check=False)
+        yield from _read_merge(chunk, local, out, err, on_error, t0, sidecar)
+
+def read_values(path):
+    def fail(p, msg):
+        raise RuntimeError(msg)
+    return next(read_values_many([path], on_error=fail))
+
+def _add_args(people=None, tags=None):
+    args = []
     if tags:
         for t in tags:
-            cmd += [f"-XMP-dc:Subject+={t}", f"-IPTC:Keywords+={t}"]
+            args += [f"-XMP-dc:Subject+={t}", f"-IPTC:Keywords+={t}"]
     if people:
         for p in people:
-            cmd += [f"-XMP-Iptc4xmpExt:PersonInImage+={p}"]
-    cmd += [str(path)]
-    run(cmd)
+            args += [f"-XMP-Iptc4xmpExt:PersonInImage+={p}"]
+    return args
 
-def remove_values(path, people=None, tags=None):
-    cmd = [EXIFTOOL, "-overwrite_original", "-charset", "iptc=utf8"]
+def _remove_args(people=None, tags=None):
+    args = []
     if tags:
         for t in tags:
-            cmd += [f"-XMP-dc:Subject-={t}", f"-IPTC:Keywords-={t}"]
+            args += [f"-XMP-dc:Subject-={t}", f"-IPTC:Keywords-={t}"]
     if people:
         for p in people:
-            cmd += [f"-XMP-Iptc4xmpExt:PersonInImage-={p}"]
-    cmd += [str(path)]
-    run(cmd)
+            args += [f"-XMP-Iptc4xmpExt:PersonInImage-={p}"]
+    return args
 
-def clear_values(path, clear_people=False, clear_tags=False):
-    if not (clear_people or clear_tags):
-        return
-    cmd = [EXIFTOOL, "-overwrite_original", "-charset", "iptc=utf8"]
+def _clear_args(clear_people=False, clear_tags=False):
+    args = []
     if clear_tags:
-        cmd += ["-XMP-dc:Subject=", "-IPTC:Keywords="]
+        args += ["-XMP-dc:Subject=", "-IPTC:Keywords="]
     if clear_people:
-        cmd += ["-XMP-Iptc4xmpExt:PersonInImage="]
-    cmd += [str(path)]
-    run(cmd)
+        args += ["-XMP-Iptc4xmpExt:PersonInImage="]
+    return args
 
-def read_values(path):
-    # Usa JSON do exiftool pra evitar parsing frágil
-    out = run([EXIFTOOL, "-json",
-               "-XMP-dc:Subject",
-               "-XMP-Iptc4xmpExt:PersonInImage",
-               "-IPTC:Keywords",
-               str(path)])
-    data = json.loads(out)[0]
-    def norm(v):
-        if isinstance(v, list):
-            return v
-        if isinstance(v, str):
-            return [v]
-        return []
+def _set_args(people=None, tags=None):
+    # "-TAG=v" repetido monta a lista inteira no lugar da atual; "-TAG=" sozinho apaga.
+    # None deixa o campo como está
+    args = []
+    if tags is not None:
+        tags = list(dict.fromkeys(tags))
+        args += [f"-XMP-dc:Subject={t}" for t in tags] or ["-XMP-dc:Subject="]
+        args += [f"-IPTC:Keywords={t}" for t in tags] or ["-IPTC:Keywords="]
+    if people is not None:
+        people = list(dict.fromkeys(people))
+        args += [f"-XMP-Iptc4xmpExt:PersonInImage={p}" for p in people] or ["-XMP-Iptc4xmpExt:PersonInImage="]
+    return args
+
+def _summary_count(stdout, text):
+    m = re.search(rf"(\d+) {re.escape(text)}", stdout)
+    return int(m.group(1)) if m else 0
+
+def _write_inplace(chunk, change, on_error):
+    """Tenta a edição no próprio pacote XMP; devolve {índice: ok} dos arquivos resolvidos.
+
+    Se o pacote já tem os valores novos, nada é gravado e o arquivo segue para
+    o exiftool (com ``--force``, a gravação é pedida mesmo sem mudança).
+    """
+    done = {}
+    for i, path in enumerate(chunk):
+        t0 = time.perf_counter()
+        try:
+            if imgmeta_native.update_xmp_inplace(path, change):
+                done[i] = True
+        except imgmeta_native.Unsupported:
+            pass
+        except OSError as e:
+            on_error(path, str(e))
+            done[i] = False
+        _done("write", "inplace", [path] if done.get(i) else (), t0, "native")
+    return done
+
+def _changed(chunk, apply, on_skip):
+    """Arquivos de ``chunk`` cujo registro a edição realmente altera; os demais vão para ``on_skip``."""
+    t0 = time.perf_counter()
+    # compara com os valores do próprio arquivo, que é o que será gravado
+    current = read_values_many(chunk, on_error=lambda p, msg: None, sidecar=False)
+    return _changed_from(chunk, current, apply, on_skip, t0)
+
+def _changed_from(chunk, current, apply, on_skip, t0):
+    """Como ``_changed``, com os registros atuais já lidos (leitura iniciada em ``t0``)."""
+    # arquivos que não puderam ser lidos seguem para a escrita, que reporta o erro
+    current = {m["file"]: m for m in current}
+    out = []
+    skipped = []
+    for path in chunk:
+        meta = current.get(str(path))
+        if meta is not None and apply(meta) == meta:
+            skipped.append(path)
+            if on_skip:
+                on_skip(path)
+        else:
+            out.append(path)
+    _done("write", "unchanged", skipped, t0, "diff")
+    return out
+
+def write_many(args, paths, batch_size=BATCH_SIZE, on_error=report_error, apply=None, inplace=None,
+               diff=None, on_skip=None, sidecar=False, over_sidecar=True):
+    """Aplica os mesmos argumentos de escrita a vários arquivos, ``batch_size`` por chamada.
+
+    Gera os arquivos gravados com sucesso; falhas vão para ``on_error(path, mensagem)``
+    conforme as linhas de erro e o resumo impressos pelo exiftool. ``apply(meta)``
+    reproduz a edição sobre um registro, para atualizar o cache sem reler o arquivo.
+    Com ``inplace`` (e ``INPLACE_WRITE``), arquivos cujo pacote XMP comporta a
+    edição são alterados no lugar e não passam pelo exiftool. Com ``diff``
+    (default: ``DIFF_WRITE``), os valores atuais são lidos antes (cache, leitura
+    direta ou um ``-json`` por lote) e arquivos que a edição não altera não são
+    regravados: vão para ``on_skip(path)``. Com ``sidecar``, o arquivo não é
+    tocado: a edição vai para o sidecar XMP (``write_sidecars``). Sem ele, arquivos
+    cujo sidecar esconde o campo editado passam por ``_write_over_sidecar``
+    (``over_sidecar=False`` grava só no arquivo, sem olhar o sidecar).
+    """
+    if diff is None:
+        diff = DIFF_WRITE
+    if sidecar and args:
+        yield from write_sidecars(paths, apply, batch_size, on_error, diff, on_skip, _edit_fields(args))
+        return
+    for chunk in _chunks(paths, batch_size):
+        if not args:
+            yield from chunk
+            continue
+        if over_sidecar and apply and SIDECAR_READ:
+            shadowed = _shadowed(chunk, on_error)
+            if shadowed:
+                chunk = [p for p in chunk if p not in shadowed]
+                yield from _write_over_sidecar(shadowed, apply, batch_size, on_error, diff, on_skip)
+                if not chunk:
+                    continue
+        prep = _write_prepare(chunk, apply, inplace, diff, on_skip, on_error)
+        if prep is None:
+            continue
+        rest = prep[3]
+        out, err = b"", ""
+        t0 = time.perf_counter()
+        if rest:
+            # fica em _inflight até o comando terminar: num Ctrl-C o exiftool segue gravando
+            # e close_exiftool limpa depois que ele sair
+            _inflight[id(rest)] = rest
+            try:
+                out, err = _run_raw([EXIFTOOL, *_write_args(args, rest)], check=False)
+            except RuntimeError:
+                # timeout ou saída inesperada: o processo já foi morto
+                _inflight.pop(id(rest), None)
+                _remove_tmp(rest)
+                raise
+            _inflight.pop(id(rest), None)
+        yield from _write_finish(prep, out, err, apply, on_error, t0)
+
+def _shadowed(chunk, on_error):
+    """{path: campos} dos arquivos de ``chunk`` cujo sidecar define pessoas e/ou tags."""
+    out = {}
+    for path in chunk:
+        if not _has_sidecar(path):
+            continue
+        try:
+            fields = imgmeta_native.read_sidecar(sidecar_path(path))
+        except imgmeta_native.Unsupported as e:
+            # sem saber o que o sidecar esconde, gravar no arquivo poderia não aparecer na leitura
+            on_error(path, f"sidecar XMP ilegível ({e})")
+            out[path] = None
+            continue
+        if fields:
+            out[path] = fields
+    return out
+
+def _shadow_edit(meta, new, fields):
+    """A edição ``meta`` → ``new`` (valores com o sidecar por cima) como um ``set`` no arquivo.
+
+    Campos que o sidecar define vão inteiros (ele vai perdê-los); os demais só se mudaram.
+    """
+    people = new["people"] if "PersonInImage" in fields or new["people"] != meta["people"] else None
+    tags = new["tags"] if "Subject" in fields or new["tags"] != meta["tags"] else None
+    return None if people is None else tuple(people), None if tags is None else tuple(tags)
+
+def _clear_shadow(path, on_error):
+    """Tira pessoas/tags do sidecar de um arquivo que acabou de recebê-las; True se deu certo."""
+    try:
+        imgmeta_native.clear_sidecar(sidecar_path(path))
+    except (OSError, imgmeta_native.Unsupported) as e:
+        on_error(path, f"gravado no arquivo, mas o sidecar não foi limpo ({e})")
+        return False
+    finally:
+        _forget_sidecar(path)
+    return True
+
+def _write_over_sidecar(shadowed, apply, batch_size=BATCH_SIZE, on_error=report_error, diff=True,
+                        on_skip=None):
+    """Escrita no arquivo para quem tem sidecar com pessoas/tags (``_shadowed``).
+
+    Gravado só no arquivo, o valor ficaria escondido pelo do sidecar. Então a
+    edição é aplicada sobre o que a leitura mostra (sidecar por cima), o
+    resultado vai para o arquivo como um ``set`` e pessoas/tags saem do sidecar,
+    que é apagado se ficar vazio. Gera os arquivos gravados.
+    """
+    errors = {}
+    todo = [p for p, fields in shadowed.items() if fields is not None]
+    current = read_values_many(todo, batch_size, on_error=lambda p, msg: errors.setdefault(str(p), msg),
+                               sidecar=True)
+    groups = _shadow_groups(shadowed, todo, current, errors, apply, diff, on_skip, on_error)
+    for (people, tags), group in groups.items():
+        args, set_apply, inplace = _set_edit(people, tags)
+        for path in write_many(args, group, batch_size, on_error, set_apply, inplace, diff=False,
+                               over_sidecar=False):
+            if _clear_shadow(path, on_error):
+                yield path
+
+def _shadow_groups(shadowed, todo, current, errors, apply, diff, on_skip, on_error):
+    """Os arquivos ``todo`` de ``_write_over_sidecar`` que a edição altera, agrupados pelo ``set``
+    de ``_shadow_edit``; ``current`` é a leitura com sidecar e ``errors`` as falhas dela."""
+    current = {m["file"]: m for m in current}
+    groups = {}
+    for path in todo:
+        meta = current.get(str(path))
+        if meta is None:
+            on_error(path, errors.get(str(path), "não foi possível ler os valores atuais"))
+            continue
+        new = apply(meta)
+        if diff and new == meta:
+            _done("write", "unchanged", [path], time.perf_counter(), "diff")
+            if on_skip:
+                on_skip(path)
+            continue
+        groups.setdefault(_shadow_edit(meta, new, shadowed[path]), []).append(path)
+    return groups
+
+def _edit_fields(args):
+    """Campos do sidecar (``Subject``/``PersonInImage``) que os argumentos de escrita do exiftool tocam."""
+    fields = set()
+    for a in args:
+        tag = a.lstrip("-").split("=", 1)[0].rstrip("+-")
+        if tag in ("XMP-dc:Subject", "IPTC:Keywords"):
+            fields.add("Subject")
+        elif tag == "XMP-Iptc4xmpExt:PersonInImage":
+            fields.add("PersonInImage")
+    return fields
+
+def write_sidecars(paths, apply, batch_size=BATCH_SIZE, on_error=report_error, diff=True, on_skip=None,
+                   fields=("Subject", "PersonInImage")):
+    """Aplica ``apply(registro)`` sobre os valores lidos (sidecar por cima do arquivo) e grava
+    no sidecar XMP de cada arquivo, criando-o se preciso, os ``fields`` que a edição toca.
+
+    Com ``diff``, só os que mudaram; sem ele, todos os ``fields``, mesmo iguais.
+    O original não é reescrito nem consultado pelo exiftool além da leitura.
+    Gera os arquivos cujo sidecar foi gravado.
+    """
+    for chunk in _chunks(paths, batch_size):
+        errors = {}
+        current = read_values_many(chunk, on_error=lambda p, msg: errors.setdefault(str(p), msg), sidecar=True)
+        yield from _write_sidecars_from(chunk, current, errors, apply, on_error, diff, on_skip, fields)
+
+def _write_sidecars_from(chunk, current, errors, apply, on_error=report_error, diff=True, on_skip=None,
+                         fields=("Subject", "PersonInImage")):
+    """A parte de ``write_sidecars`` depois da leitura: ``current`` são os registros lidos
+    (com sidecar) e ``errors`` as falhas dela. Só lê e grava os próprios sidecars."""
+    current = {m["file"]: m for m in current}
+    for path in chunk:
+        meta = current.get(str(path))
+        if meta is None:
+            on_error(path, errors.get(str(path), "não foi possível ler os valores atuais"))
+            continue
+        new = apply(meta)
+        changes = {}
+        if "Subject" in fields and (new["tags"] != meta["tags"] or not diff):
+            changes["Subject"] = new["tags"]
+        if "PersonInImage" in fields and (new["people"] != meta["people"] or not diff):
+            changes["PersonInImage"] = new["people"]
+        if not changes:
+            _done("write", "unchanged", [path], time.perf_counter())
+            if on_skip:
+                on_skip(path)
+            continue
+        t0 = time.perf_counter()
+        try:
+            imgmeta_native.write_sidecar(sidecar_path(path), changes)
+        except (OSError, imgmeta_native.Unsupported) as e:
+            on_error(path, f"sidecar: {e}")
+            continue
+        finally:
+            _forget_sidecar(path)
+        _done("write", "sidecar", [path], t0, "native")
+        yield path
+
+def _write_prepare(chunk, apply, inplace, diff, on_skip, on_error):
+    """A parte de uma escrita em lote que vem antes do exiftool.
+
+    Tira do lote os arquivos que a edição não altera (com ``diff``) e grava no
+    lugar os que couberem. Devolve (lote, registros do cache antes da escrita,
+    {índice: ok} dos gravados no lugar, arquivos que faltam), ou None se não
+    sobrou nada.
+    """
+    if diff and apply:
+        chunk = _changed(chunk, apply, on_skip)
+        if not chunk:
+            return None
+    with _phase("cache"):
+        before = _cache.get_many(chunk) if _cache is not None else {}
+    done = _write_inplace(chunk, inplace, on_error) if inplace and INPLACE_WRITE else {}
+    rest = [p for i, p in enumerate(chunk) if i not in done]
+    return chunk, before, done, rest
+
+def _write_args(args, rest):
+    return ["-overwrite_original", "-charset", "iptc=utf8", *args, *map(str, rest)]
+
+def _write_finish(prep, out, err, apply, on_error, t0):
+    """Confere a resposta do exiftool (``_write_args``, iniciado em ``t0``) e atualiza o cache.
+
+    Devolve os arquivos do lote gravados com sucesso, na ordem de entrada.
+    """
+    chunk, before, done, rest = prep
+    errors = _file_errors(err, rest)
+    failed = _summary_count(out.decode("utf-8", "replace"), "files weren't updated due to errors")
+    generic = None
+    if failed > len(errors) or (_has_errors(err) and not errors):
+        # erro que o exiftool não associou a um arquivo: sem como saber quais
+        # foram gravados, os arquivos sem erro próprio contam como falha
+        generic = err.strip() or "erro do exiftool"
+    written = []
+    for i, path in enumerate(chunk):
+        if i in done:
+            if done[i]:
+                written.append(i)
+            continue
+        msg = errors.get(_src_key(path), generic)
+        if msg:
+            on_error(path, msg)
+        else:
+            written.append(i)
+    if rest:
+        _done("write", "exiftool", [chunk[i] for i in written if i not in done], t0)
+    if _cache is not None:
+        with _phase("cache"):
+            # entrada válida antes da escrita: aplica a edição; senão, descarta
+            updated = [apply(before[i]) for i in written if i in before and apply]
+            _cache.put_many(updated)
+            _cache.forget_many([chunk[i] for i in written if not (i in before and apply)])
+    return [chunk[i] for i in written]
+
+def _edited(meta, people=(), tags=(), op=set.union):
     return {
-        "file": str(path),
-        "tags": sorted(set(norm(data.get("Subject", [])) + norm(data.get("Keywords", [])))),
-        "people": sorted(set(norm(data.get("PersonInImage", []))))
+        "file": meta["file"],
+        "tags": sorted(op(set(meta["tags"]), tags or ())),
+        "people": sorted(op(set(meta["people"]), people or ())),
     }
 
+def _write_one(path, many, *a, **kw):
+    def fail(p, msg):
+        raise RuntimeError(msg)
+    for _ in many([path], *a, on_error=fail, **kw):
+        pass
+
+def set_values(path, people=None, tags=None):
+    _write_one(path, set_values_many, people, tags)
+
+def add_values(path, people=None, tags=None):
+    _write_one(path, add_values_many, people, tags)
+
+def remove_values(path, people=None, tags=None):
+    _write_one(path, remove_values_many, people, tags)
+
+def clear_values(path, clear_people=False, clear_tags=False):
+    _write_one(path, clear_values_many, clear_people, clear_tags)
+
+def _add_inplace(people=None, tags=None):
+    def change(cur):
+        # exiftool também gravaria IPTC:Keywords; só dá para editar no lugar se já estiverem lá
+        if tags and not set(tags) <= set(cur.get("Keywords", [])):
+            raise imgmeta_native.Unsupported("IPTC:Keywords também mudaria")
+        subj = cur.get("Subject", [])
+        ppl = cur.get("PersonInImage", [])
+        return {
+            "Subject": subj + [t for t in dict.fromkeys(tags or []) if t not in subj],
+            "PersonInImage": ppl + [p for p in dict.fromkeys(people or []) if p not in ppl],
+        }
+    return change
+
+def _remove_inplace(people=None, tags=None):
+    def change(cur):
+        if tags and set(tags) & set(cur.get("Keywords", [])):
+            raise imgmeta_native.Unsupported("IPTC:Keywords também mudaria")
+        return {
+            "Subject": [t for t in cur.get("Subject", []) if t not in set(tags or [])],
+            "PersonInImage": [p for p in cur.get("PersonInImage", []) if p not in set(people or [])],
+        }
+    return change
+
+def _set_inplace(people=None, tags=None):
+    def change(cur):
+        fields = {}
+        if tags is not None:
+            fields["Subject"] = list(dict.fromkeys(tags))
+            if fields["Subject"] != cur.get("Keywords", []):
+                raise imgmeta_native.Unsupported("IPTC:Keywords também mudaria")
+        if people is not None:
+            fields["PersonInImage"] = list(dict.fromkeys(people))
+        return fields
+    return change
+
+def _set_edit(people=None, tags=None):
+    # cada edição = (argumentos do exiftool, apply sobre um registro, change para a escrita no lugar)
+    def apply(m):
+        return {"file": m["file"],
+                "tags": m["tags"] if tags is None else sorted(set(tags)),
+                "people": m["people"] if people is None else sorted(set(people))}
+    return _set_args(people, tags), apply, _set_inplace(people, tags)
+
+def _add_edit(people=None, tags=None):
+    return _add_args(people, tags), lambda m: _edited(m, people, tags), _add_inplace(people, tags)
+
+def _remove_edit(people=None, tags=None):
+    return (_remove_args(people, tags), lambda m: _edited(m, people, tags, set.difference),
+            _remove_inplace(people, tags))
+
+def _clear_edit(clear_people=False, clear_tags=False):
+    def apply(m):
+        return {"file": m["file"],
+                "tags": [] if clear_tags else m["tags"],
+                "people": [] if clear_people else m["people"]}
+    return _clear_args(clear_people, clear_tags), apply, None
+
+def set_values_many(paths, people=None, tags=None, **kw):
+    """Substitui pessoas e/ou tags numa única gravação por arquivo.
+
+    ``None`` mantém o campo como está; uma lista vazia apaga todos os valores.
+    """
+    args, apply, inplace = _set_edit(people, tags)
+    return write_many(args, paths, apply=apply, inplace=inplace, **kw)
+
+def add_values_many(paths, people=None, tags=None, **kw):
+    args, apply, inplace = _add_edit(people, tags)
+    return write_many(args, paths, apply=apply, inplace=inplace, **kw)
+
+def remove_values_many(paths, people=None, tags=None, **kw):
+    args, apply, inplace = _remove_edit(people, tags)
+    return write_many(args, paths, apply=apply, inplace=inplace, **kw)
+
+def clear_values_many(paths, clear_people=False, clear_tags=False, **kw):
+    args, apply, inplace = _clear_edit(clear_people, clear_tags)
+    return write_many(args, paths, apply=apply, inplace=inplace, **kw)
+
+class Progress:
+    # contador em stderr; só aparece quando a saída normal não está mostrando o andamento
+    def __init__(self, enabled=True):
+        self.enabled = enabled and sys.stderr.isatty()
+        self.count = 0
+        self.t0 = time.monotonic()
+        self._last = 0.0
+
+    def update(self, n=1):
+        self.count += n
+        now = time.monotonic()
+        if self.enabled and now - self._last >= 0.2:
+            self._last = now
+            rate = self.count / max(now - self.t0, 1e-9)
+            print(f"\r  {self.count} arquivo(s) ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+    def done(self):
+        if self.enabled and self._last:
+            print("\r\033[K", end="", file=sys.stderr, flush=True)
+
+def run_parallel(func, items, jobs=1, batch_size=BATCH_SIZE, ordered=True, progress=None, key=None):
+    """Divide ``items`` em lotes e aplica ``func(lote) -> list`` em ``jobs`` threads.
+
+    Cada thread usa a sua própria sessão do exiftool. Com ``ordered`` os resultados
+    saem na ordem de entrada; sem ele, na ordem em que os lotes terminam. Se a
+    iteração for interrompida (ex.: Ctrl-C), os lotes pendentes são cancelados e
+    os que já estão no exiftool terminam antes de retornar.
+
+    Com ``key``, itens de mesma chave nunca são processados ao mesmo tempo: os
+    lotes são montados por partição (hash da chave) e os de uma partição rodam
+    em sequência, na ordem de entrada. ``ordered`` passa a valer por lote.
+    """
+    def done(chunk, results):
+        if progress is not None:
+            progress.update(len(chunk))
+        if _stats is not None:
+            _stats.count("files", len(chunk))
+        return results
+
+    if jobs <= 1:
+        for chunk in _chunks(items, batch_size):
+            yield from done(chunk, func(chunk))
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="imgmeta")
+    pending = {}
+    order = []
+
+    def take():
+        if ordered:
+            futs = [order.pop(0)]
+        else:
+            futs, _ = wait(order, return_when=FIRST_COMPLETED)
+            for fut in futs:
+                order.remove(fut)
+        for fut in futs:
+            yield from done(pending.pop(fut), fut.result())
+
+    if key is None:
+        chunks = ((None, chunk) for chunk in _chunks(items, batch_size))
+    else:
+        chunks = _keyed_chunks(items, batch_size, jobs, key)
+    last = {}  # partição → lote anterior dela
+
+    def after(prev, chunk):
+        # o pool é FIFO: o lote anterior da partição já está rodando noutra thread
+        if prev is not None:
+            prev.exception()
+        return func(chunk)
+
+    try:
+        for part, chunk in chunks:
+            if part is None:
+                fut = pool.submit(func, chunk)
+            else:
+                fut = last[part] = pool.submit(after, last.get(part), chunk)
+            pending[fut] = chunk
+            order.append(fut)
+            # janela limitada: a lista de arquivos continua sendo lida em paralelo
+            while len(order) >= jobs * 2:
+                yield from take()
+        while order:
+            yield from take()
+    finally:
+        for fut in order:
+            fut.cancel()
+        pool.shutdown(wait=True)
+        close_exiftool(finished_threads_only=True)
+
 def matches_filters(meta, people_any, people_all, tags_any, tags_all):
     ppl = set(m.lower() for m in meta["people"])
     tgs = set(m.lower() for m in meta["tags"])
@@ -107,90 +1331,485 @@ def matches_filters(meta, people_any, people_all, tags_any, tags_all):
         return False
     return True
 
-def cmd_add(args):
+def _timed(iterable, phase):
+    # tempo gasto dentro do iterador (ex.: listagem de pastas consumida aos poucos)
+    it = iter(iterable)
+    spent = 0.0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - t0
+            yield item
+    finally:
+        if _stats is not None:
+            _stats.add(phase, spent)
+
+def _targets(args):
+    targets = iter_targets(args.paths, args.recursive, args.ext, threads=args.walk_threads,
+                           skip_hidden=args.skip_hidden, exclude=args.exclude, shard=args.shard)
+    return _timed(targets, "walk") if _stats is not None else targets
+
+def _edit(args, label, write):
+    """Roda ``write(chunk, diff=..., on_skip=...)`` sobre os alvos, em paralelo se pedido."""
     check_exiftool()
     count = 0
-    for f in iter_targets(args.paths, args.recursive, args.ext):
-        add_values(f, args.people, args.tags)
+    skipped = []  # on_skip é chamado pelas threads de run_parallel
+    progress = Progress(args.quiet or not sys.stdout.isatty())
+    targets = _targets(args)
+    edit = lambda chunk: list(write(chunk, diff=not args.force, on_skip=skipped.append, sidecar=args.sidecar))
+    for f in run_parallel(edit, targets, args.jobs, ordered=not args.unordered, progress=progress):
         if not args.quiet:
-            print(f"[add] {f}")
+            print(f"[{label}] {f}")
         count += 1
+    progress.done()
     if not args.quiet:
-        print(f"Concluído: {count} arquivo(s).")
+        print(f"Concluído: {count} arquivo(s) alterado(s), {len(skipped)} sem mudança.")
+
+def cmd_add(args):
+    _edit(args, "add", lambda chunk, **kw: add_values_many(chunk, args.people, args.tags, **kw))
 
 def cmd_remove(args):
-    check_exiftool()
-    count = 0
-    for f in iter_targets(args.paths, args.recursive, args.ext):
-        remove_values(f, args.people, args.tags)
-        if not args.quiet:
-            print(f"[remove] {f}")
-        count += 1
-    if not args.quiet:
-        print(f"Concluído: {count} arquivo(s).")
+    _edit(args, "remove", lambda chunk, **kw: remove_values_many(chunk, args.people, args.tags, **kw))
 
 def cmd_clear(args):
-    check_exiftool()
-    count = 0
-    for f in iter_targets(args.paths, args.recursive, args.ext):
-        clear_values(f, clear_people=args.people, clear_tags=args.tags)
-        if not args.quiet:
-            print(f"[clear] {f}")
-        count += 1
-    if not args.quiet:
-        print(f"Concluído: {count} arquivo(s).")
+    _edit(args, "clear", lambda chunk, **kw: clear_values_many(chunk, clear_people=args.people,
+                                                               clear_tags=args.tags, **kw))
+
+def cmd_set(args):
+    if args.people is None and args.tags is None:
+        print("Nada a definir: informe --people e/ou --tags.", file=sys.stderr)
+        sys.exit(2)
+    _edit(args, "set", lambda chunk, **kw: set_values_many(chunk, args.people, args.tags, **kw))
+
+class RecordWriter:
+    """Escreve registros à medida que chegam, em JSON (array) ou NDJSON (um por linha).
+
+    O array sai com a mesma formatação de ``json.dumps(lista, indent=2)``. A
+    saída é descarregada no primeiro registro e depois a cada ``flush_every``
+    registros ou ``flush_interval`` segundos, sem acumular nada em memória.
+    """
+
+    def __init__(self, ndjson=False, out=None, flush_every=200, flush_interval=0.5):
+        self.ndjson = ndjson
+        self.out = out or sys.stdout
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, meta):
+        if self.ndjson:
+            self.out.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        else:
+            body = json.dumps(meta, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            self.out.write(("[\n  " if self.count == 0 else ",\n  ") + body)
+        self.count += 1
+        self._pending += 1
+        now = time.monotonic()
+        if self.count == 1 or self._pending >= self.flush_every or now - self._last_flush >= self.flush_interval:
+            self.out.flush()
+            self._pending = 0
+            self._last_flush = now
+
+    def close(self):
+        if not self.ndjson:
+            self.out.write("\n]\n" if self.count else "[]\n")
+        self.out.flush()
+
+def _print_meta(meta, empty_note=True):
+    print(meta["file"])
+    if meta["people"]:
+        print("  pessoas:", ", ".join(meta["people"]))
+    if meta["tags"]:
+        print("  tags   :", ", ".join(meta["tags"]))
+    if empty_note and not meta["people"] and not meta["tags"]:
+        print("  (sem pessoas/tags)")
+
+def _read_targets(args, structured=None):
+    if structured is None:
+        structured = args.json or args.ndjson
+    progress = Progress(not structured or not sys.stdout.isatty())
+    targets = _targets(args)
+    yield from run_parallel(lambda chunk: list(read_values_many(chunk)), targets, args.jobs,
+                            ordered=not args.unordered, progress=progress)
+    progress.done()
 
 def cmd_list(args):
     check_exiftool()
-    items = []
-    for f in iter_targets(args.paths, args.recursive, args.ext):
-        meta = read_values(f)
-        items.append(meta)
-
-    # Se pediu JSON, imprime tudo em formato estruturado
-    if getattr(args, "json", False):
-        print(json.dumps(items, ensure_ascii=False, indent=2))
+    # Se pediu JSON/NDJSON, imprime cada registro assim que é lido
+    if args.json or args.ndjson:
+        writer = RecordWriter(ndjson=args.ndjson)
+        for meta in _read_targets(args):
+            writer.write(meta)
+        writer.close()
         return
 
     # Caso contrário, saída "bonita" em texto
-    for meta in items:
-        print(meta["file"])
-        if meta["people"]:
-            print("  pessoas:", ", ".join(meta["people"]))
-        if meta["tags"]:
-            print("  tags   :", ", ".join(meta["tags"]))
-        if not meta["people"] and not meta["tags"]:
-            print("  (sem pessoas/tags)")
+    for meta in _read_targets(args):
+        _print_meta(meta)
         if not args.quiet:
             print()
 
 def cmd_search(args):
     check_exiftool()
-    results = []
-    for f in iter_targets(args.paths, args.recursive, args.ext):
-        meta = read_values(f)
-        people_any = args.people if args.mode == "any" else None
-        people_all = args.people if args.mode == "all" else None
-        tags_any = args.tags if args.mode == "any" else None
-        tags_all = args.tags if args.mode == "all" else None
-        if matches_filters(meta, people_any, people_all, tags_any, tags_all):
-            results.append(meta)
-
-    # Se pediu JSON, imprime todos os resultados de forma estruturada
-    if getattr(args, "json", False):
-        print(json.dumps(results, ensure_ascii=False, indent=2))
-        return
+    try:
+        query = filters_query(args.people, args.tags, args.mode)
+        if args.query:
+            query = compile_query(args.query) & query
+    except QueryError as e:
+        raise RuntimeError(f"consulta inválida: {e}")
 
-    # Saída textual (como era antes)
-    for m in results:
-        print(m["file"])
-        if args.show_meta:
-            if m["people"]:
-                print("  pessoas:", ", ".join(m["people"]))
-            if m["tags"]:
-                print("  tags   :", ", ".join(m["tags"]))
+    # cada registro é testado e escrito assim que é lido, com memória constante; um índice
+    # montado para uma única consulta custaria mais do que testar registro a registro
+    writer = RecordWriter(ndjson=args.ndjson) if args.json or args.ndjson else None
+    count = 0
+    for meta in _read_targets(args):
+        with _phase("filter"):
+            ok = query.matches(meta)
+        if not ok:
+            continue
+        count += 1
+        if writer is not None:
+            writer.write(meta)
+        elif args.show_meta:
+            _print_meta(meta, empty_note=False)
             print()
-    print(f"Total: {len(results)} arquivo(s).")
+        else:
+            print(meta["file"])
+    if writer is not None:
+        writer.close()
+    else:
+        print(f"Total: {count} arquivo(s).")
+
+def cmd_stats(args):
+    check_exiftool()
+    # NumPy (opcional) só é importado por este comando
+    import imgmeta_counts
+
+    store = MetaStore()
+    for meta in _read_targets(args, structured=False):
+        with _phase("counts"):
+            store.add(meta)
+    with _phase("counts"):
+        summary = imgmeta_counts.summarize(store, top=args.top)
+
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        if args.json:
+            json.dump(summary, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        elif args.csv:
+            writer = csv.writer(out)
+            writer.writerow(["section", "a", "b", "files"])
+            writer.writerows(imgmeta_counts.rows(summary))
+        else:
+            print(f"Arquivos: {summary['files']}", file=out)
+            for section, title in imgmeta_counts.SECTIONS.items():
+                print(f"\n{title}:", file=out)
+                for item in summary[section]:
+                    if section in imgmeta_counts.PAIRS:
+                        label = f"{item['a']} + {item['b']}"
+                    elif "value" in item:
+                        label = item["value"]
+                    else:
+                        label = f"com {item['count']}"
+                    print(f"  {item['files']:8d}  {label}", file=out)
+                if not summary[section]:
+                    print("  (nenhum)", file=out)
+    finally:
+        if args.out:
+            out.close()
+
+MANIFEST_OPS = ("add", "remove", "set")
+MANIFEST_SEP = ";"  # separador das listas de pessoas/tags numa célula do CSV
+
+def _manifest_format(name, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(str(name))[1].lower()
+    return "csv" if ext == ".csv" else "ndjson"
+
+def _manifest_list(value, sep):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(sep) if sep else [value]
+    return [str(v).strip() for v in value if str(v).strip()]
+
+def read_manifest(f, fmt="ndjson", sep=MANIFEST_SEP, op="add"):
+    """Gera as linhas de um manifesto (CSV ou NDJSON) com ``file``, ``people``, ``tags`` e ``op``.
+
+    Cada item é {line, file, op, people, tags}; ``people``/``tags`` são None quando a
+    coluna/chave não existe (no ``set``, o campo fica como está) e lista vazia quando
+    existe vazia. ``op`` por linha é opcional (default: ``op``). Linhas inválidas
+    saem com ``error`` no lugar dos valores.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        rows = ((reader.line_num, row) for row in reader)
+    else:
+        rows = ((n, line) for n, line in enumerate(f, 1) if line.strip())
+    for line, row in rows:
+        if fmt != "csv":
+            try:
+                row = json.loads(row)
+            except ValueError as e:
+                yield {"line": line, "file": None, "error": f"JSON inválido ({e})"}
+                continue
+            if not isinstance(row, dict):
+                yield {"line": line, "file": None, "error": "esperado um objeto JSON"}
+                continue
+        file = row.get("file")
+        file = file.strip() if isinstance(file, str) else None
+        row_op = row.get("op") or op
+        row_op = row_op.strip().lower() if isinstance(row_op, str) else None
+        if not file:
+            yield {"line": line, "file": None, "error": "sem a coluna file"}
+        elif row_op not in MANIFEST_OPS:
+            yield {"line": line, "file": file, "error": f"op inválida: {row.get('op')!r} (use add, remove ou set)"}
+        else:
+            yield {"line": line, "file": file, "op": row_op,
+                   "people": _manifest_list(row.get("people"), sep if fmt == "csv" else None),
+                   "tags": _manifest_list(row.get("tags"), sep if fmt == "csv" else None)}
+
+_MANIFEST_EDITS = {"add": _add_edit, "remove": _remove_edit, "set": _set_edit}
+
+def apply_manifest(rows, diff=None, on_error=None, over_sidecar=True):
+    """Aplica um lote de linhas de ``read_manifest``; devolve [(linha, "ok" | "unchanged" | "error")].
+
+    As linhas com a mesma edição (op, pessoas, tags) vão juntas para ``write_many``,
+    numa gravação por grupo; os valores atuais são lidos uma vez para o lote
+    inteiro. Um arquivo repetido no lote é aplicado numa segunda passada, na
+    ordem das linhas. Falhas vão para ``on_error(linha, mensagem)``.
+    ``over_sidecar`` é repassado a ``write_many``; com ele, o diff compara com o
+    que a leitura mostra (sidecar por cima), e não só com o arquivo.
+    """
+    if diff is None:
+        diff = DIFF_WRITE
+    if on_error is None:
+        def on_error(row, msg):
+            print(f"Erro: linha {row['line']}: {row['file'] + ': ' if row['file'] else ''}{msg}", file=sys.stderr)
+    result = {}
+    passes = []
+    for row in rows:
+        if "error" in row:
+            on_error(row, row["error"])
+            result[id(row)] = (row, "error")
+            continue
+        # um arquivo aparece no máximo uma vez por passada, mesmo escrito de outro jeito
+        k = _path_key(row["file"])
+        for keys, p in passes:
+            if k not in keys:
+                keys.add(k)
+                p[row["file"]] = row
+                break
+        else:
+            passes.append(({k}, {row["file"]: row}))
+        result[id(row)] = (row, None)
+    for _, p in passes:
+        current = {}
+        if diff:
+            current = {m["file"]: m for m in read_values_many(list(p), on_error=lambda path, msg: None,
+                                                              sidecar=None if over_sidecar else False)}
+        groups = {}
+        for file, row in p.items():
+            people = None if row["people"] is None else tuple(row["people"])
+            tags = None if row["tags"] is None else tuple(row["tags"])
+            groups.setdefault((row["op"], people, tags), []).append(row)
+        for (op, people, tags), group in groups.items():
+            args, apply, inplace = _MANIFEST_EDITS[op](people, tags)
+            todo = {}
+            for row in group:
+                meta = current.get(row["file"])
+                if not args or (meta is not None and apply(meta) == meta):
+                    result[id(row)] = (row, "unchanged")
+                else:
+                    todo[row["file"]] = row
+            def fail(path, msg):
+                row = todo[str(path)]
+                result[id(row)] = (row, "error")
+                on_error(row, msg)
+            for path in write_many(args, list(todo), apply=apply, inplace=inplace, diff=False, on_error=fail,
+                                   over_sidecar=over_sidecar):
+                row = todo[str(path)]
+                result[id(row)] = (row, "ok")
+    return list(result.values())
+
+def embed_sidecars(paths, keep=False, diff=None, on_error=report_error):
+    """Grava no próprio arquivo (como um ``set``) as pessoas/tags do sidecar XMP de cada arquivo.
+
+    Depois, tira pessoas/tags do sidecar (``keep`` mantém) e o apaga se não
+    sobrar nenhuma outra propriedade. Arquivos sem sidecar são ignorados.
+    Gera (path, "ok" | "unchanged") dos arquivos incorporados.
+    """
+    rows = []
+    for n, path in enumerate(paths, 1):
+        if not _has_sidecar(path):
+            continue
+        try:
+            fields = imgmeta_native.read_sidecar(sidecar_path(path))
+        except imgmeta_native.Unsupported as e:
+            on_error(path, f"sidecar XMP ilegível ({e})")
+            continue
+        if fields is not None:
+            rows.append({"line": n, "file": str(path), "op": "set",
+                         "people": fields.get("PersonInImage"), "tags": fields.get("Subject")})
+    # o diff compara o arquivo com o sidecar, e a gravação não pode olhar o sidecar que está sendo incorporado
+    for row, status in apply_manifest(rows, diff, on_error=lambda row, msg: on_error(row["file"], msg),
+                                      over_sidecar=False):
+        if status == "error":
+            continue
+        if not keep:
+            try:
+                imgmeta_native.clear_sidecar(sidecar_path(row["file"]))
+            except (OSError, imgmeta_native.Unsupported) as e:
+                on_error(row["file"], f"incorporado, mas o sidecar não foi limpo ({e})")
+                continue
+            finally:
+                _forget_sidecar(row["file"])
+        yield row["file"], status
+
+def cmd_embed(args):
+    check_exiftool()
+    counts = {"ok": 0, "unchanged": 0}
+    progress = Progress(args.quiet or not sys.stdout.isatty())
+    embed = lambda chunk: list(embed_sidecars(chunk, keep=args.keep, diff=not args.force))
+    for f, status in run_parallel(embed, _targets(args), args.jobs, ordered=not args.unordered, progress=progress):
+        counts[status] += 1
+        if status == "ok" and not args.quiet:
+            print(f"[embed] {f}")
+    progress.done()
+    if not args.quiet:
+        print(f"Concluído: {counts['ok']} arquivo(s) alterado(s), {counts['unchanged']} já estavam iguais ao sidecar.")
+
+def cmd_export(args):
+    check_exiftool()
+    fmt = _manifest_format(args.out or "", args.format)
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(["file", "people", "tags"])
+            for meta in _read_targets(args, structured=True):
+                writer.writerow([meta["file"], args.sep.join(meta["people"]), args.sep.join(meta["tags"])])
+        else:
+            writer = RecordWriter(ndjson=True, out=out)
+            for meta in _read_targets(args, structured=True):
+                writer.write(meta)
+            writer.close()
+    finally:
+        if args.out:
+            out.close()
+
+def cmd_import(args):
+    check_exiftool()
+    fmt = _manifest_format(args.manifest, args.format)
+    f = sys.stdin if args.manifest == "-" else open(args.manifest, encoding="utf-8-sig", newline="")
+    counts = {"ok": 0, "unchanged": 0, "error": 0}
+    progress = Progress(args.quiet or not sys.stdout.isatty())
+    try:
+        rows = read_manifest(f, fmt, args.sep, args.op)
+        if args.shard is not None:
+            rows = (row for row in rows if in_shard(os.path.normpath(row["file"] or ""), args.shard))
+        apply = lambda chunk: apply_manifest(chunk, diff=not args.force)
+        # todas as linhas de um arquivo vão para a mesma thread, senão duas sessões do
+        # exiftool leriam e gravariam o mesmo arquivo ao mesmo tempo e uma edição se perderia
+        same_file = lambda row: _path_key(row["file"] or "")
+        for row, status in run_parallel(apply, rows, args.jobs, ordered=not args.unordered, progress=progress,
+                                        key=same_file):
+            counts[status] += 1
+            if status == "ok" and not args.quiet:
+                print(f"[{row['op']}] {row['file']}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    progress.done()
+    if not args.quiet:
+        print(f"Concluído: {counts['ok']} linha(s) aplicada(s), {counts['unchanged']} sem mudança, "
+              f"{counts['error']} com erro.")
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+def _is_sqlite(path):
+    if path == "-":
+        return False
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+def _read_records(f, name):
+    """Registros de uma saída de ``list``/``search``/``export``: array JSON ou NDJSON."""
+    for line in f:
+        if line.strip():
+            break
+    else:
+        return
+    try:
+        if line.lstrip().startswith("["):
+            items = json.loads(line + f.read())
+        else:
+            items = (json.loads(l) for l in itertools.chain([line], f) if l.strip())
+        for meta in items:
+            if not isinstance(meta, dict) or not meta.get("file"):
+                raise RuntimeError(f"{name}: registro sem file: {meta!r}")
+            yield {"file": meta["file"], "tags": meta.get("tags") or [], "people": meta.get("people") or []}
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"{name}: JSON inválido ({e})")
+
+def cmd_merge(args):
+    sqlite = [_is_sqlite(p) for p in args.inputs]
+    if any(sqlite):
+        if not all(sqlite):
+            raise RuntimeError("não dá para misturar caches SQLite com saídas JSON/NDJSON")
+        if not args.out:
+            raise RuntimeError("para juntar caches, informe o cache de saída com -o")
+        cache = MetaCache(args.out)
+        try:
+            for path in args.inputs:
+                if os.path.abspath(path) == os.path.abspath(args.out):
+                    continue
+                try:
+                    n = cache.merge_from(path)
+                except sqlite3.Error as e:
+                    raise RuntimeError(f"{path}: {e}")
+                if not args.quiet:
+                    print(f"{path}: {n} entrada(s)")
+        finally:
+            cache.close()
+        return
+
+    # registros ficam no MetaStore; a saída sai ordenada por arquivo, com um registro por arquivo
+    store = MetaStore()
+    latest = {}
+    repeated = 0
+    for path in args.inputs:
+        f = sys.stdin if path == "-" else open(path, encoding="utf-8-sig")
+        try:
+            for meta in _read_records(f, path):
+                repeated += meta["file"] in latest
+                latest[meta["file"]] = store.add(meta)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        writer = RecordWriter(ndjson=not args.json, out=out)
+        for file in sorted(latest):
+            writer.write(store[latest[file]].as_dict())
+        writer.close()
+    finally:
+        if args.out:
+            out.close()
+    if repeated and not args.quiet:
+        print(f"Aviso: {repeated} registro(s) repetido(s); ficou o último de cada arquivo.", file=sys.stderr)
 
 def open_in_viewer(path: Path):
     # tentar no navegador (funciona bem para imagens)
@@ -208,18 +1827,111 @@ def open_in_viewer(path: Path):
     else:
         subprocess.run(["xdg-open", str(path)])
 
-def extract_thumbnail_to_temp(path: Path) -> Path:
-    # extrai ThumbnailImage com exiftool (-b = binary) e salva num arquivo temporário
-    tmp = Path(tempfile.mkstemp(suffix=".jpg")[1])
-    out = subprocess.run(
-        [EXIFTOOL, "-b", "-ThumbnailImage", str(path)],
-        capture_output=True
-    )
-    if out.returncode != 0 or not out.stdout:
+def embedded_thumbnail(path: Path) -> bytes | None:
+    """ThumbnailImage lida direto do EXIF do JPEG, sem exiftool (None se não houver)."""
+    try:
+        return imgmeta_native.exif_thumbnail(path)
+    except imgmeta_native.Unsupported:
+        return None
+
+def extract_thumbnails_many(paths, tag="ThumbnailImage", batch_size=BATCH_SIZE, on_error=report_error):
+    """Gera (path, bytes) da imagem embutida ``tag`` (ThumbnailImage ou PreviewImage) de vários arquivos.
+
+    A ThumbnailImage de JPEGs sai direto do segmento APP1; o resto vai num
+    ``exiftool -json -b`` por lote, que devolve os binários em base64 junto do
+    SourceFile. Arquivos sem a imagem vão para ``on_error(path, mensagem)``.
+    """
+    for chunk in _chunks(paths, batch_size):
+        found = {}
+        misses = []
+        for i, path in enumerate(chunk):
+            data = embedded_thumbnail(path) if tag == "ThumbnailImage" else None
+            if data:
+                found[i] = data
+            else:
+                misses.append(path)
+        if misses:
+            out, err = _run_raw([EXIFTOOL, "-json", "-b", f"-{tag}", *map(str, misses)], check=False)
+            text = out.decode("utf-8", "replace").strip()
+            rows = json.loads(text) if text else []
+            data = {_src_key(d.get("SourceFile")): d for d in rows}
+            errors = _file_errors(err, misses)
+        for i, path in enumerate(chunk):
+            if i in found:
+                yield path, found[i]
+                continue
+            key = _src_key(path)
+            d = data.get(key) or {}
+            value = d.get(tag)
+            if isinstance(value, str) and value.startswith("base64:"):
+                yield path, base64.b64decode(value[len("base64:"):])
+            else:
+                on_error(path, errors.get(key) or d.get("Error") or f"sem {tag} embutida")
+
+def save_thumbnails(items, outdir):
+    """Grava cada (path, bytes) de ``items`` em ``outdir`` como <nome>.jpg e gera (path, arquivo).
+
+    Nomes repetidos na mesma chamada (mesmo nome em pastas diferentes) ganham _1, _2...
+    """
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    taken = set()
+    for path, data in items:
+        stem = Path(path).stem
+        name = f"{stem}.jpg"
+        n = 0
+        while name in taken:
+            n += 1
+            name = f"{stem}_{n}.jpg"
+        taken.add(name)
+        out = outdir / name
+        tmp = outdir / f".{name}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, out)
+        yield path, out
+
+def extract_thumbnail(path: Path) -> bytes:
+    """Bytes da ThumbnailImage, em memória; exiftool só se a leitura direta falhar."""
+    def fail(p, msg):
         raise RuntimeError("Sem miniatura embutida (ThumbnailImage) ou erro ao extrair.")
-    with open(tmp, "wb") as f:
-        f.write(out.stdout)
-    return tmp
+    for _, data in extract_thumbnails_many([path], on_error=fail):
+        return data
+
+def extract_thumbnail_to_temp(path: Path) -> Path:
+    # a miniatura vai para <cache>/open/ com um nome fixo por arquivo: abrir de novo
+    # reaproveita o arquivo, e os esquecidos há mais de um dia são apagados aqui
+    data = extract_thumbnail(path)
+    tmpdir = default_index_path().parent / "open"
+    tmpdir.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    for f in tmpdir.iterdir():
+        try:
+            if now - f.stat().st_mtime > 86400:
+                f.unlink()
+        except OSError:
+            pass
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    out = tmpdir / f"{key}.jpg"
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=tmpdir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out)
+    return out
+
+def cmd_thumbs(args):
+    check_exiftool()
+    tag = "PreviewImage" if args.preview else "ThumbnailImage"
+    count = 0
+    progress = Progress(args.quiet or not sys.stdout.isatty())
+    items = run_parallel(lambda chunk: list(extract_thumbnails_many(chunk, tag)), _targets(args),
+                         args.jobs, ordered=not args.unordered, progress=progress)
+    for src, out in save_thumbnails(items, args.out):
+        if not args.quiet:
+            print(f"[thumb] {src} -> {out}")
+        count += 1
+    progress.done()
+    if not args.quiet:
+        print(f"Concluído: {count} imagem(ns) em {args.out}.")
 
 def cmd_show(args):
     check_exiftool()
@@ -227,9 +1939,9 @@ def cmd_show(args):
         print("Use exatamente um arquivo no comando 'show'.", file=sys.stderr)
         sys.exit(2)
 
-    f = next(iter_targets(args.paths, False, args.ext), None)
+    f = next(iter_targets(args.paths, False, args.ext, shard=args.shard), None)
     if not f:
-        print("Arquivo não encontrado ou extensão não permitida.", file=sys.stderr)
+        print("Arquivo não encontrado, extensão não permitida ou fora do --shard.", file=sys.stderr)
         sys.exit(2)
 
     meta = read_values(f)
@@ -237,13 +1949,7 @@ def cmd_show(args):
     if args.json:
         print(json.dumps(meta, ensure_ascii=False, indent=2))
     else:
-        print(meta["file"])
-        if meta["people"]:
-            print("  pessoas:", ", ".join(meta["people"]))
-        if meta["tags"]:
-            print("  tags   :", ", ".join(meta["tags"]))
-        if not meta["people"] and not meta["tags"]:
-            print("  (sem pessoas/tags)")
+        _print_meta(meta)
 
     if args.open:
         try:
@@ -256,6 +1962,12 @@ def cmd_show(args):
             print(f"Falha ao abrir: {e}", file=sys.stderr)
             sys.exit(3)
 
+def _shard_arg(text):
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 def build_parser():
     p = argparse.ArgumentParser(
         prog="imgmeta",
@@ -265,12 +1977,43 @@ def build_parser():
                    help="Extensões aceitáveis (sem ponto). Default: comuns de imagem.")
     p.add_argument("-r", "--recursive", action="store_true", help="Percorre diretórios recursivamente.")
     p.add_argument("-q", "--quiet", action="store_true", help="Menos saída.")
+    p.add_argument("--walk-threads", type=int, default=1, metavar="N",
+                   help="Threads para listar pastas com -r (ordem dos arquivos deixa de ser fixa).")
+    p.add_argument("--skip-hidden", action="store_true", help="Ignora arquivos e pastas ocultos.")
+    p.add_argument("--exclude", action="append", default=[], metavar="PADRÃO",
+                   help="Ignora pastas cujo nome casa com o padrão (ex.: '@eaDir'). Pode repetir.")
+    p.add_argument("--shard", type=_shard_arg, metavar="ÍNDICE/TOTAL",
+                   help="Processa só a fatia ÍNDICE (de 0 a TOTAL-1) dos arquivos, por hash do caminho relativo.")
+    p.add_argument("--index", metavar="PATH",
+                   help=f"Cache de metadados (SQLite). Default: {default_index_path()}")
+    p.add_argument("--no-index", action="store_true", help="Não usa o cache de metadados.")
+    p.add_argument("--no-sidecar", action="store_true",
+                   help="Ignora os sidecars XMP (foto.jpg.xmp) na leitura; só vale o que está no arquivo.")
+    p.add_argument("--stats", action="store_true",
+                   help="Ao final, mostra em stderr tempo por fase, processos, bytes lidos, cache e arquivos mais lentos.")
+    p.add_argument("--stats-json", metavar="ARQ", help="Grava as mesmas estatísticas em JSON.")
+    p.add_argument("--profile", metavar="ARQ",
+                   help="Grava um perfil do cProfile (só a thread principal; veja com python -m pstats ARQ).")
 
     sub = p.add_subparsers(dest="cmd", required=True)
 
     def add_common_targets(sp):
         sp.add_argument("paths", nargs="+", help="Arquivos, pastas ou padrões glob.")
 
+    def add_jobs(sp):
+        sp.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Processos exiftool em paralelo (default: 1).")
+        sp.add_argument("--unordered", action="store_true",
+                        help="Com --jobs, emite os resultados na ordem em que terminam.")
+
+    def add_force(sp):
+        sp.add_argument("--force", action="store_true",
+                        help="Grava mesmo arquivos que já têm os valores pedidos (não compara antes).")
+
+    def add_sidecar(sp):
+        sp.add_argument("--sidecar", action="store_true",
+                        help="Grava no sidecar XMP (foto.jpg.xmp) ao lado da imagem, sem reescrever o original.")
+
     def add_people_tags(sp, need_any=False):
         sp.add_argument("--people", "--pessoas", nargs="*", default=[],
                         help="Nomes de pessoas (use aspas p/ nomes com espaço).")
@@ -282,27 +2025,95 @@ def build_parser():
 
     sp_add = sub.add_parser("add", help="Adiciona pessoas/tags sem sobrescrever o que já existe.")
     add_common_targets(sp_add)
+    add_jobs(sp_add)
+    add_force(sp_add)
+    add_sidecar(sp_add)
     add_people_tags(sp_add)
 
     sp_remove = sub.add_parser("remove", help="Remove pessoas/tags específicas.")
     add_common_targets(sp_remove)
+    add_jobs(sp_remove)
+    add_force(sp_remove)
+    add_sidecar(sp_remove)
     add_people_tags(sp_remove)
 
+    sp_set = sub.add_parser("set", help="Substitui pessoas/tags pelos valores informados (uma gravação por arquivo).")
+    add_common_targets(sp_set)
+    add_jobs(sp_set)
+    add_force(sp_set)
+    add_sidecar(sp_set)
+    sp_set.add_argument("--people", "--pessoas", nargs="*",
+                        help="Novas pessoas; sem valores, apaga todas. Omitido: não mexe em pessoas.")
+    sp_set.add_argument("--tags", nargs="*",
+                        help="Novas tags; sem valores, apaga todas. Omitido: não mexe em tags.")
+
     sp_clear = sub.add_parser("clear", help="Apaga todos os valores de pessoas e/ou tags.")
     add_common_targets(sp_clear)
+    add_jobs(sp_clear)
+    add_force(sp_clear)
+    add_sidecar(sp_clear)
     sp_clear.add_argument("--people", action="store_true", help="Limpa somente pessoas.")
     sp_clear.add_argument("--tags", action="store_true", help="Limpa somente tags.")
     # se nenhum for passado, não faz nada (proteção)
 
     sp_list = sub.add_parser("list", help="Lista pessoas/tags dos arquivos.")
     add_common_targets(sp_list)
+    add_jobs(sp_list)
     sp_list.add_argument("--json", action="store_true", help="Saída em JSON.")
+    sp_list.add_argument("--ndjson", action="store_true", help="Saída em NDJSON (um objeto JSON por linha).")
 
     sp_search = sub.add_parser("search", help="Busca imagens por pessoas/tags.")
     add_common_targets(sp_search)
+    add_jobs(sp_search)
     add_people_tags(sp_search, need_any=True)
+    sp_search.add_argument("-e", "--query", metavar="EXPR",
+                           help='Expressão booleana, ex.: person:"Maria Silva" AND (tag:praia OR tag:viagem) AND NOT tag:rascunho')
     sp_search.add_argument("--show-meta", action="store_true", help="Exibe metadados nos resultados.")
     sp_search.add_argument("--json", action="store_true", help="Saída em JSON.")
+    sp_search.add_argument("--ndjson", action="store_true", help="Saída em NDJSON (um objeto JSON por linha).")
+
+    sp_stats = sub.add_parser("stats", help="Frequências de pessoas/tags e quais aparecem juntas nos mesmos arquivos.")
+    add_common_targets(sp_stats)
+    add_jobs(sp_stats)
+    sp_stats.add_argument("--top", type=int, default=20, metavar="N",
+                          help="Itens por seção (default: 20; 0 = todos).")
+    sp_stats.add_argument("--json", action="store_true", help="Saída em JSON.")
+    sp_stats.add_argument("--csv", action="store_true", help="Saída em CSV (section, a, b, files).")
+    sp_stats.add_argument("-o", "--out", metavar="ARQ", help="Arquivo de saída (default: stdout).")
+
+    sp_embed = sub.add_parser("embed", help="Incorpora os sidecars XMP nos arquivos originais (pessoas/tags).")
+    add_common_targets(sp_embed)
+    add_jobs(sp_embed)
+    add_force(sp_embed)
+    sp_embed.add_argument("--keep", action="store_true",
+                          help="Não mexe nos sidecars depois de incorporar (por padrão, pessoas/tags saem dele).")
+
+    sp_export = sub.add_parser("export", help="Exporta file/people/tags dos arquivos para um manifesto CSV ou NDJSON.")
+    add_common_targets(sp_export)
+    add_jobs(sp_export)
+    sp_export.add_argument("-o", "--out", metavar="ARQ", help="Arquivo de saída (default: stdout).")
+    sp_export.add_argument("--format", choices=["csv", "ndjson"],
+                           help="Formato (default: pela extensão de --out; ndjson se não for .csv).")
+    sp_export.add_argument("--sep", default=MANIFEST_SEP,
+                           help=f"No CSV, separa os valores numa célula (default: {MANIFEST_SEP!r}).")
+
+    sp_import = sub.add_parser("import", help="Aplica as pessoas/tags de um manifesto (CSV ou NDJSON), em lote.")
+    sp_import.add_argument("manifest", help="Manifesto com file, people, tags e (opcional) op; '-' lê de stdin.")
+    add_jobs(sp_import)
+    add_force(sp_import)
+    sp_import.add_argument("--op", choices=MANIFEST_OPS, default="add",
+                           help="Operação das linhas sem a coluna op (default: add).")
+    sp_import.add_argument("--format", choices=["csv", "ndjson"],
+                           help="Formato (default: pela extensão; ndjson se não for .csv).")
+    sp_import.add_argument("--sep", default=MANIFEST_SEP,
+                           help=f"No CSV, separa os valores numa célula (default: {MANIFEST_SEP!r}).")
+
+    sp_merge = sub.add_parser("merge", help="Junta as saídas JSON/NDJSON ou os caches SQLite de vários shards.")
+    sp_merge.add_argument("inputs", nargs="+", metavar="ARQ",
+                          help="Saídas de list/search/export (JSON ou NDJSON; '-' lê de stdin) ou caches SQLite.")
+    sp_merge.add_argument("-o", "--out", metavar="ARQ",
+                          help="Arquivo de saída (default: stdout); para caches, o cache SQLite de destino.")
+    sp_merge.add_argument("--json", action="store_true", help="Saída em JSON (array) em vez de NDJSON.")
 
     sp_show = sub.add_parser("show", help="Mostra metadados de um único arquivo e opcionalmente abre a imagem.")
     sp_show.add_argument("paths", nargs=1, help="Arquivo alvo (somente um).")
@@ -312,30 +2123,88 @@ def build_parser():
     sp_show.add_argument("--ext", nargs="*", default=["jpg","jpeg","png","heic","tif","tiff"],
                          help="Extensões aceitáveis (sem ponto).")
 
+    sp_thumbs = sub.add_parser("thumbs", help="Extrai as miniaturas embutidas de vários arquivos para uma pasta.")
+    add_common_targets(sp_thumbs)
+    add_jobs(sp_thumbs)
+    sp_thumbs.add_argument("-o", "--out", required=True, metavar="PASTA", help="Pasta de saída (criada se preciso).")
+    sp_thumbs.add_argument("--preview", action="store_true",
+                           help="Extrai a PreviewImage (maior) em vez da ThumbnailImage.")
+
     return p
 
 def main():
+    global SIDECAR_READ
     parser = build_parser()
     args = parser.parse_args()
+    if args.no_sidecar:
+        SIDECAR_READ = False
+
+    if not args.no_index:
+        try:
+            open_cache(args.index)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Aviso: cache de metadados indisponível ({e}).", file=sys.stderr)
+
+    if args.stats or args.stats_json:
+        enable_stats()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
 
     try:
         if args.cmd == "add":
             cmd_add(args)
         elif args.cmd == "remove":
             cmd_remove(args)
+        elif args.cmd == "set":
+            cmd_set(args)
         elif args.cmd == "clear":
             cmd_clear(args)
         elif args.cmd == "list":
             cmd_list(args)
         elif args.cmd == "search":
             cmd_search(args)
+        elif args.cmd == "stats":
+            cmd_stats(args)
+        elif args.cmd == "embed":
+            cmd_embed(args)
+        elif args.cmd == "export":
+            cmd_export(args)
+        elif args.cmd == "import":
+            cmd_import(args)
+        elif args.cmd == "merge":
+            cmd_merge(args)
         elif args.cmd == "show":
             cmd_show(args)
+        elif args.cmd == "thumbs":
+            cmd_thumbs(args)
         else:
             parser.print_help()
     except RuntimeError as e:
         print(f"Erro: {e}", file=sys.stderr)
         sys.exit(2)
+    except KeyboardInterrupt:
+        print("\nInterrompido.", file=sys.stderr)
+        sys.exit(130)
+    except BrokenPipeError:
+        # quem lia a saída fechou o pipe (ex.: "| head"): sai sem traceback; o stdout vai
+        # para o devnull para o flush na saída do interpretador não falhar de novo
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        close_exiftool()
+        sys.exit(141)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        stats = disable_stats()
+        if stats is not None:
+            if args.stats:
+                stats.report()
+            if args.stats_json:
+                stats.write_json(args.stats_json)
+        close_cache()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,383 @@
+"""API assíncrona (asyncio), para usar o imgmeta de dentro de serviços sem travar o event loop.
+
+Os comandos do exiftool vão por sessões ``-stay_open`` conduzidas pelo próprio
+loop (``asyncio.create_subprocess_exec``); cache, leitura direta do cabeçalho
+e escrita no lugar rodam em threads (``asyncio.to_thread``), com o mesmo
+código da versão síncrona. Um ``ExifToolPool`` limita quantos comandos rodam
+ao mesmo tempo (``concurrency``). Se um comando estoura o ``timeout`` ou a
+tarefa é cancelada, o processo em uso é morto e a sessão é reiniciada no
+próximo comando.
+
+Exemplo::
+
+    async with ExifToolPool(concurrency=4, timeout=60) as pool:
+        meta = await read_values("foto.jpg", pool=pool)
+        await add_values("foto.jpg", tags=["praia"], pool=pool)
+
+Sem ``pool``, cada event loop usa um pool padrão (``default_pool``), fechado
+com ``close_default_pool``. Os callbacks ``on_error``/``on_skip`` são
+chamados de threads de trabalho, como no ``--jobs`` da CLI.
+"""
+import asyncio
+import itertools
+import os
+import subprocess
+import time
+import weakref
+
+import imgmeta as core
+from imgmeta import BATCH_SIZE, report_error
+
+DEFAULT_CONCURRENCY = 4
+STREAM_LIMIT = 64 * 1024 * 1024  # maior resposta esperada do exiftool (miniaturas em base64)
+
+
+async def _read_until(stream, marker: bytes) -> bytes:
+    data = await stream.readuntil(marker)
+    await stream.readline()  # resto da linha do marcador (\n ou \r\n)
+    return data[:-len(marker)]
+
+
+class AsyncExifTool:
+    """Processo exiftool persistente (``-stay_open True -@ -``) conduzido pelo event loop.
+
+    Mesmo protocolo de ``imgmeta.ExifTool``; um comando por vez.
+    """
+
+    def __init__(self, executable=None, timeout=None):
+        self.executable = executable or core.EXIFTOOL
+        self.timeout = timeout or core.EXIFTOOL_TIMEOUT
+        self._proc = None
+        self._seq = itertools.count(1)
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self):
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self):
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            kwargs = {"start_new_session": True}
+        if core._stats is not None:
+            core._stats.count("subprocesses")
+        self._proc = await asyncio.create_subprocess_exec(
+            self.executable, "-stay_open", "True", "-@", "-",
+            "-common_args", "-charset", "filename=utf8",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, limit=STREAM_LIMIT, **kwargs,
+        )
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+
+    async def close(self):
+        async with self._lock:
+            proc = self._proc
+            if proc is None:
+                return
+            try:
+                proc.stdin.write(b"-stay_open\nFalse\n")
+                await proc.stdin.drain()
+                proc.stdin.close()
+                await asyncio.wait_for(proc.wait(), self.timeout)
+                self._proc = None
+            except asyncio.CancelledError:
+                self._kill()
+                raise
+            except Exception:
+                self._kill()
+
+    async def execute(self, args, timeout=None):
+        """Executa um comando (sem o nome do executável). Retorna (stdout bytes, stderr str)."""
+        n = next(self._seq)
+        marker = f"{{ready{n}}}".encode()
+        payload = "\n".join([*map(str, args), "-echo4", marker.decode(), f"-execute{n}"]) + "\n"
+        timeout = timeout or self.timeout
+        async with self._lock:
+            t0 = time.perf_counter()
+            started = False
+            try:
+                for attempt in (1, 2):
+                    if not self.running:
+                        self._kill()
+                        await self.start()
+                        started = True
+                    try:
+                        self._proc.stdin.write(payload.encode("utf-8"))
+                        await self._proc.stdin.drain()
+                        break
+                    except OSError:
+                        # o comando não chegou ao processo; reinicia e tenta de novo uma vez
+                        self._kill()
+                        if attempt == 2:
+                            raise RuntimeError("Falha ao comunicar com o exiftool.")
+                proc = self._proc
+                async with asyncio.timeout(timeout):
+                    out, err = await asyncio.gather(_read_until(proc.stdout, marker),
+                                                    _read_until(proc.stderr, marker))
+            except TimeoutError:
+                self._kill()
+                raise RuntimeError(f"exiftool não respondeu em {timeout}s (processo reiniciado).")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                self._kill()
+                raise RuntimeError("exiftool terminou inesperadamente (processo reiniciado).")
+            except asyncio.CancelledError:
+                # o comando ficaria pela metade no processo: mata e reinicia no próximo
+                self._kill()
+                raise
+            if started and core._stats is not None:
+                core._stats.add("exiftool_start", time.perf_counter() - t0)
+        return out, err.decode("utf-8", "replace")
+
+
+class ExifToolPool:
+    """Até ``concurrency`` sessões do exiftool, abertas sob demanda e reaproveitadas.
+
+    ``execute`` espera uma vaga (semáforo) e roda o comando numa sessão livre,
+    chamando os hooks de ``imgmeta.add_hook`` como o ``run`` síncrono.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=None, executable=None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.executable = executable
+        self._sem = asyncio.Semaphore(concurrency)
+        self._idle: list[AsyncExifTool] = []
+        self._sessions: list[AsyncExifTool] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        sessions, self._sessions, self._idle = self._sessions, [], []
+        for s in sessions:
+            await s.close()
+
+    async def execute(self, args, timeout=None):
+        """Roda ``exiftool args...`` e devolve (stdout bytes, stderr str), sem checar erros."""
+        cmd = [self.executable or core.EXIFTOOL, *args]
+        hooks = list(core._hooks)
+        for h in hooks:
+            h.before_run(cmd)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            async with self._sem:
+                out, err = await self._execute(args, timeout or self.timeout)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - t0
+            for h in hooks:
+                h.after_run(cmd, seconds, error)
+        if core._stats is not None:
+            core._stats.count("exiftool_output_bytes", len(out))
+        return out, err
+
+    async def _execute(self, args, timeout):
+        # argumentos com quebra de linha não cabem no protocolo -@ (um argumento por linha)
+        if any("\n" in str(a) for a in args):
+            return await self._oneshot(args, timeout)
+        if self._idle:
+            session = self._idle.pop()
+        else:
+            session = AsyncExifTool(self.executable, self.timeout)
+            self._sessions.append(session)
+        try:
+            return await session.execute(args, timeout)
+        finally:
+            if session in self._sessions:
+                self._idle.append(session)
+
+    async def _oneshot(self, args, timeout):
+        if core._stats is not None:
+            core._stats.count("subprocesses")
+        proc = await asyncio.create_subprocess_exec(
+            self.executable or core.EXIFTOOL, *map(str, args),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            async with asyncio.timeout(timeout or core.EXIFTOOL_TIMEOUT):
+                out, err = await proc.communicate()
+        except TimeoutError:
+            proc.kill()
+            raise RuntimeError(f"exiftool não respondeu em {timeout or core.EXIFTOOL_TIMEOUT}s.")
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+        return out, err.decode("utf-8", "replace")
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ExifToolPool]" = weakref.WeakKeyDictionary()
+
+def default_pool() -> ExifToolPool:
+    """Pool usado quando nenhum é passado; um por event loop, com ``DEFAULT_CONCURRENCY`` sessões."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = ExifToolPool()
+    return pool
+
+async def close_default_pool():
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.aclose()
+
+
+async def _gather(coros):
+    # como asyncio.gather, mas um erro cancela (e espera) os lotes que ainda estão rodando
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+
+async def iter_targets(paths, recursive=False, exts=None, threads=1, skip_hidden=False, exclude=(),
+                       shard=None, chunk_size=256):
+    """Versão assíncrona de ``imgmeta.iter_targets``; a listagem roda numa thread, ``chunk_size`` por vez."""
+    it = core._chunks(core.iter_targets(paths, recursive, exts, threads=threads, skip_hidden=skip_hidden,
+                                        exclude=exclude, shard=shard), chunk_size)
+    while chunk := await asyncio.to_thread(next, it, None):
+        for path in chunk:
+            yield path
+
+
+async def _read_chunk(pool, chunk, on_error, sidecar=None):
+    local = await asyncio.to_thread(core._read_local, chunk)
+    out, err = b"", ""
+    t0 = time.perf_counter()
+    if local[2]:
+        out, err = await pool.execute(core._read_args(local[2]))
+    return await asyncio.to_thread(core._read_merge, chunk, local, out, err, on_error, t0, sidecar)
+
+async def read_values_many(paths, batch_size=BATCH_SIZE, on_error=report_error, pool=None,
+                           sidecar=None) -> list[dict]:
+    """Como ``imgmeta.read_values_many``, com os lotes em paralelo (limitados pelo pool); devolve a lista."""
+    pool = pool or default_pool()
+    results = await _gather(_read_chunk(pool, chunk, on_error, sidecar)
+                            for chunk in core._chunks(paths, batch_size))
+    return [meta for r in results for meta in r]
+
+async def read_values(path, pool=None) -> dict:
+    def fail(p, msg):
+        raise RuntimeError(msg)
+    return (await read_values_many([path], on_error=fail, pool=pool))[0]
+
+
+async def _write_chunk(pool, args, chunk, apply, inplace, diff, on_skip, on_error, over_sidecar=True):
+    # como em imgmeta.write_many, mas toda consulta ao exiftool (inclusive as leituras do diff e
+    # do sidecar) passa pelo pool; nas threads fica só o que é nativo (cache, cabeçalho, sidecar)
+    written = []
+    if over_sidecar and apply and core.SIDECAR_READ:
+        shadowed = await asyncio.to_thread(core._shadowed, chunk, on_error)
+        if shadowed:
+            chunk = [p for p in chunk if p not in shadowed]
+            written = await _write_over_sidecar(pool, shadowed, apply, diff, on_skip, on_error)
+    if chunk and diff and apply:
+        t0 = time.perf_counter()
+        current = await _read_chunk(pool, chunk, lambda p, msg: None, sidecar=False)
+        chunk = await asyncio.to_thread(core._changed_from, chunk, current, apply, on_skip, t0)
+    if not chunk:
+        return written
+    prep = await asyncio.to_thread(core._write_prepare, chunk, apply, inplace, False, on_skip, on_error)
+    rest = prep[3]
+    out, err = b"", ""
+    t0 = time.perf_counter()
+    if rest:
+        try:
+            out, err = await pool.execute(core._write_args(args, rest))
+        except BaseException:
+            # exiftool morto no meio da escrita (timeout/cancelamento): apaga o temporário dele
+            core._remove_tmp(rest)
+            raise
+    return written + await asyncio.to_thread(core._write_finish, prep, out, err, apply, on_error, t0)
+
+async def _write_over_sidecar(pool, shadowed, apply, diff, on_skip, on_error):
+    # imgmeta._write_over_sidecar com a leitura e a escrita pelo pool
+    errors = {}
+    todo = [p for p, fields in shadowed.items() if fields is not None]
+    if not todo:
+        return []
+    current = await _read_chunk(pool, todo, lambda p, msg: errors.setdefault(str(p), msg), sidecar=True)
+    groups = await asyncio.to_thread(core._shadow_groups, shadowed, todo, current, errors, apply, diff,
+                                     on_skip, on_error)
+
+    async def write(people, tags, group):
+        args, set_apply, inplace = core._set_edit(people, tags)
+        done = await _write_chunk(pool, args, group, set_apply, inplace, False, None, on_error,
+                                  over_sidecar=False)
+        return await asyncio.to_thread(lambda: [p for p in done if core._clear_shadow(p, on_error)])
+
+    results = await _gather(write(*edit, group) for edit, group in groups.items())
+    return [path for r in results for path in r]
+
+async def _write_sidecar_chunk(pool, chunk, apply, fields, diff, on_skip, on_error):
+    errors = {}
+    current = await _read_chunk(pool, chunk, lambda p, msg: errors.setdefault(str(p), msg), sidecar=True)
+    return await asyncio.to_thread(lambda: list(core._write_sidecars_from(chunk, current, errors, apply,
+                                                                          on_error, diff, on_skip, fields)))
+
+async def _write_many(edit, paths, batch_size=BATCH_SIZE, on_error=report_error, diff=None, on_skip=None,
+                      sidecar=False, pool=None) -> list:
+    args, apply, inplace = edit
+    # os lotes rodam ao mesmo tempo: um arquivo repetido em dois deles seria gravado por dois
+    # exiftool juntos (e um apagaria o temporário do outro). A edição é idempotente, basta uma vez
+    paths = list({core._path_key(p): p for p in paths}.values())
+    if not args:
+        return paths
+    pool = pool or default_pool()
+    diff = core.DIFF_WRITE if diff is None else diff
+    if sidecar:
+        fields = core._edit_fields(args)
+        results = await _gather(_write_sidecar_chunk(pool, chunk, apply, fields, diff, on_skip, on_error)
+                                for chunk in core._chunks(paths, batch_size))
+    else:
+        results = await _gather(_write_chunk(pool, args, chunk, apply, inplace, diff, on_skip, on_error)
+                                for chunk in core._chunks(paths, batch_size))
+    return [path for r in results for path in r]
+
+async def set_values_many(paths, people=None, tags=None, **kw) -> list:
+    """Como ``imgmeta.set_values_many``; devolve os arquivos gravados. Aceita ``pool=``."""
+    return await _write_many(core._set_edit(people, tags), paths, **kw)
+
+async def add_values_many(paths, people=None, tags=None, **kw) -> list:
+    return await _write_many(core._add_edit(people, tags), paths, **kw)
+
+async def remove_values_many(paths, people=None, tags=None, **kw) -> list:
+    return await _write_many(core._remove_edit(people, tags), paths, **kw)
+
+async def clear_values_many(paths, clear_people=False, clear_tags=False, **kw) -> list:
+    return await _write_many(core._clear_edit(clear_people, clear_tags), paths, **kw)
+
+async def _write_one(path, edit, pool):
+    def fail(p, msg):
+        raise RuntimeError(msg)
+    await _write_many(edit, [path], on_error=fail, pool=pool)
+
+async def set_values(path, people=None, tags=None, pool=None):
+    await _write_one(path, core._set_edit(people, tags), pool)
+
+async def add_values(path, people=None, tags=None, pool=None):
+    await _write_one(path, core._add_edit(people, tags), pool)
+
+async def remove_values(path, people=None, tags=None, pool=None):
+    await _write_one(path, core._remove_edit(people, tags), pool)
+
+async def clear_values(path, clear_people=False, clear_tags=False, pool=None):
+    await _write_one(path, core._clear_edit(clear_people, clear_tags), pool)
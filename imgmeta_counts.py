@@ -0,0 +1,179 @@
+"""Frequências e coocorrências de pessoas/tags sobre muitos arquivos (comando ``stats``).
+
+Os registros ficam num ``MetaStore``; de lá sai, para cada campo, a matriz
+esparsa de incidência arquivo × termo em CSR (``indptr``/``indices``). Com
+NumPy as contagens e os pares são calculados em lote sobre esses arrays; sem
+ele o resultado é o mesmo, calculado num laço em Python (bem mais lento com
+milhões de arquivos).
+
+``summarize`` devolve um dict com as seções de ``SECTIONS``: valores mais
+frequentes, histogramas de valores por arquivo e pares que aparecem juntos no
+mesmo arquivo (``a``/``b``; em ``people_per_tag``, ``a`` é a tag e ``b`` a
+pessoa). As listas vêm em ordem decrescente de arquivos, com empate pela
+ordem alfabética.
+"""
+from collections import Counter
+from itertools import combinations, product
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from imgmeta_store import MetaStore
+
+TOP = 20  # itens por seção (0 = todos)
+PAIR_CHUNK = 1 << 22  # pares gerados de cada vez no NumPy (limita a memória)
+
+FIELDS = ("tags", "people")
+# seção de pares → (campo de a, campo de b); com o mesmo campo, cada par aparece uma vez
+PAIRS = {
+    "people_per_tag": ("tags", "people"),
+    "people_pairs": ("people", "people"),
+    "tag_pairs": ("tags", "tags"),
+}
+SECTIONS = {
+    "tags": "Tags mais frequentes",
+    "people": "Pessoas mais frequentes",
+    "tags_per_file": "Tags por arquivo",
+    "people_per_file": "Pessoas por arquivo",
+    "people_per_tag": "Pessoas por tag",
+    "people_pairs": "Pessoas que aparecem juntas",
+    "tag_pairs": "Tags que aparecem juntas",
+}
+
+
+def incidence(store: MetaStore, field: str):
+    """Matriz arquivo × termo de ``field`` em CSR: ``(indptr, indices)`` (NumPy).
+
+    Valores repetidos num arquivo contam uma vez; em cada linha os ids ficam
+    em ordem crescente.
+    """
+    off = np.frombuffer(store.offsets, dtype=np.uint64).astype(np.int64)
+    k = int(field == "people")
+    starts, lengths = off[k:-1:2], off[k + 1::2] - off[k:-1:2]
+    n, total = len(lengths), int(lengths.sum())
+    terms = np.frombuffer(store.terms, dtype=np.uint32)
+    pos = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    vocab = max(len(store.vocab), 1)
+    codes = np.sort(rows * vocab + terms[pos])
+    codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))] if total else codes
+    rows, indices = np.divmod(codes, vocab)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, indices
+
+
+def _pairs_np(a, b, same, vocab):
+    # para cada entrada de a, os parceiros são um intervalo contíguo de b.indices:
+    # as entradas seguintes da mesma linha (mesmo campo) ou a linha inteira de b
+    (ap, ai), (bp, bi) = a, b
+    rows = np.repeat(np.arange(len(ap) - 1), np.diff(ap))
+    if same:
+        first = np.arange(1, len(ai) + 1)
+        counts = ap[rows + 1] - first
+    else:
+        first = bp[rows]
+        counts = bp[rows + 1] - first
+    ends = np.cumsum(counts)
+    cuts = np.searchsorted(ends, np.arange(PAIR_CHUNK, int(ends[-1]) if len(ends) else 0, PAIR_CHUNK))
+    keys, sums = [], []
+    for s, e in zip([0, *cuts], [*cuts, len(ai)]):
+        c = counts[s:e]
+        if not c.sum():
+            continue
+        partner = np.repeat(first[s:e] - (np.cumsum(c) - c), c) + np.arange(int(c.sum()))
+        u, n = np.unique(np.repeat(ai[s:e], c) * vocab + bi[partner], return_counts=True)
+        keys.append(u)
+        sums.append(n)
+    if not keys:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    u, inv = np.unique(np.concatenate(keys), return_inverse=True)
+    n = np.bincount(inv, weights=np.concatenate(sums)).astype(np.int64)
+    return u // vocab, u % vocab, n
+
+
+def _count_np(store):
+    vocab = max(len(store.vocab), 1)
+    m = {f: incidence(store, f) for f in FIELDS}
+    freq, hist = {}, {}
+    for f, (indptr, indices) in m.items():
+        cnt = np.bincount(indices, minlength=vocab)
+        ids = np.flatnonzero(cnt)
+        freq[f] = (ids, cnt[ids])
+        hist[f] = np.bincount(np.diff(indptr)).tolist() if len(indptr) > 1 else []
+    pairs = {kind: _pairs_np(m[fa], m[fb], fa == fb, vocab) for kind, (fa, fb) in PAIRS.items()}
+    return freq, hist, pairs
+
+
+def _count_py(store):
+    freq = {f: Counter() for f in FIELDS}
+    hist = {f: Counter() for f in FIELDS}
+    pairs = {kind: Counter() for kind in PAIRS}
+    for i in range(len(store)):
+        ids = {f: sorted(set(store.term_ids(i, f))) for f in FIELDS}
+        for f in FIELDS:
+            freq[f].update(ids[f])
+            hist[f][len(ids[f])] += 1
+        for kind, (fa, fb) in PAIRS.items():
+            pairs[kind].update(combinations(ids[fa], 2) if fa == fb else product(ids[fa], ids[fb]))
+    freq = {f: (list(c), list(c.values())) for f, c in freq.items()}
+    hist = {f: [c[k] for k in range(max(c, default=-1) + 1)] for f, c in hist.items()}
+    pairs = {kind: ([a for a, _ in c], [b for _, b in c], list(c.values())) for kind, c in pairs.items()}
+    return freq, hist, pairs
+
+
+def _top(cols, counts, rank, top):
+    # índices das maiores contagens; empate pela ordem alfabética das colunas
+    if np is not None:
+        order = np.lexsort([rank[c] for c in reversed(cols)] + [-counts])
+    else:
+        order = sorted(range(len(counts)), key=lambda i: (-counts[i], *(rank[c[i]] for c in cols)))
+    return order[:top or None]
+
+
+def summarize(records, top=TOP) -> dict:
+    """Frequências, histogramas e coocorrências de ``records`` (``MetaStore`` ou registros)."""
+    store = records if isinstance(records, MetaStore) else MetaStore(records)
+    names = store.vocab.strings
+    order = sorted(range(len(names)), key=names.__getitem__)
+    rank = [0] * len(names)
+    for r, i in enumerate(order):
+        rank[i] = r
+    if np is not None:
+        rank = np.array(rank, dtype=np.int64)
+        freq, hist, pairs = _count_np(store)
+    else:
+        freq, hist, pairs = _count_py(store)
+
+    out = {"files": len(store)}
+    for f in FIELDS:
+        ids, cnt = freq[f]
+        out[f] = [{"value": names[ids[i]], "files": int(cnt[i])} for i in _top([ids], cnt, rank, top)]
+    for f in FIELDS:
+        out[f"{f}_per_file"] = [{"count": k, "files": int(c)} for k, c in enumerate(hist[f]) if c]
+    for kind, (fa, fb) in PAIRS.items():
+        a, b, cnt = pairs[kind]
+        if fa == fb and np is not None:
+            # os pares saem ordenados por id; a ordem alfabética põe o menor nome em a
+            swap = rank[a] > rank[b]
+            a, b = np.where(swap, b, a), np.where(swap, a, b)
+        elif fa == fb:
+            a, b = zip(*[(x, y) if rank[x] < rank[y] else (y, x) for x, y in zip(a, b)]) if a else ((), ())
+        out[kind] = [{"a": names[a[i]], "b": names[b[i]], "files": int(cnt[i])}
+                     for i in _top([a, b], cnt, rank, top)]
+    return out
+
+
+def rows(summary: dict):
+    """Linhas ``(section, a, b, files)`` para CSV; ``b`` fica vazio fora das seções de pares."""
+    for section in SECTIONS:
+        for item in summary[section]:
+            if section in PAIRS:
+                yield section, item["a"], item["b"], item["files"]
+            elif "value" in item:
+                yield section, item["value"], "", item["files"]
+            else:
+                yield section, item["count"], "", item["files"]
@@ -0,0 +1,640 @@
+"""Leitura de XMP/IPTC direto dos cabeçalhos de JPEG, PNG e TIFF, sem exiftool.
+
+Só os segmentos de metadados são lidos (APP1/APP13 no JPEG, ``iTXt`` no PNG,
+tags 700/33723/34377 no IFD0 do TIFF); os dados de pixel nunca são tocados.
+Qualquer caso que o exiftool possa interpretar de outro jeito (XMP estendido,
+blocos duplicados, formas de XMP pouco usuais, IPTC sem charset com bytes não
+ASCII...) levanta ``Unsupported`` e o chamador volta para o exiftool.
+
+``update_xmp_inplace`` faz o caminho inverso para edições pequenas: reescreve
+só o pacote XMP, no mesmo lugar, usando o padding do próprio pacote.
+``read_sidecar``/``write_sidecar``/``clear_sidecar`` cuidam de sidecars
+``.xmp`` soltos, mantendo o que não for pessoas/tags.
+"""
+import io
+import os
+import re
+import struct
+import zlib
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+XMP_JPEG_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_EXT_HEADER = b"http://ns.adobe.com/xmp/extension/\x00"
+PHOTOSHOP_HEADER = b"Photoshop 3.0\x00"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_XMP_KEYWORD = b"XML:com.adobe.xmp"
+
+NS_RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+NS_DC = "http://purl.org/dc/elements/1.1/"
+NS_IPTC_EXT = "http://iptc.org/std/Iptc4xmpExt/2008-02-29/"
+
+# campo do JSON do exiftool → elemento XMP
+XMP_FIELDS = {
+    "Subject": f"{{{NS_DC}}}subject",
+    "PersonInImage": f"{{{NS_IPTC_EXT}}}PersonInImage",
+}
+
+TIFF_XMP = 700
+TIFF_IPTC = 33723
+TIFF_PHOTOSHOP = 34377
+IRB_IPTC = 0x0404
+EXIF_HEADER = b"Exif\x00\x00"
+EXIF_THUMB_OFFSET = 0x0201  # JPEGInterchangeFormat
+EXIF_THUMB_LENGTH = 0x0202  # JPEGInterchangeFormatLength
+
+
+class Unsupported(Exception):
+    """O arquivo precisa ser lido pelo exiftool."""
+
+
+# Contêineres
+
+def _jpeg_segments(f):
+    """Gera (marcador, offset dos dados, dados) dos segmentos até o início da imagem (SOS)."""
+    if f.read(2) != b"\xff\xd8":
+        raise Unsupported("não é JPEG")
+    while True:
+        b = f.read(1)
+        while b == b"\xff":
+            b = f.read(1)
+        if not b:
+            raise Unsupported("JPEG truncado")
+        marker = b[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xDA, 0xD9):  # SOS / EOI: acabaram os cabeçalhos
+            return
+        raw = f.read(2)
+        if len(raw) < 2:
+            raise Unsupported("JPEG truncado")
+        size = struct.unpack(">H", raw)[0] - 2
+        offset = f.tell()
+        if marker in (0xE1, 0xED):
+            data = f.read(size)
+            if len(data) < size:
+                raise Unsupported("JPEG truncado")
+            yield marker, offset, data
+        else:
+            f.seek(size, 1)
+
+
+def jpeg_blocks(f):
+    """(xmp, offset do pacote, iptc) de um JPEG."""
+    xmp = xmp_offset = None
+    irb = b""
+    for marker, offset, data in _jpeg_segments(f):
+        if marker == 0xE1 and data.startswith(XMP_JPEG_HEADER):
+            if xmp is not None:
+                raise Unsupported("mais de um segmento XMP")
+            xmp = data[len(XMP_JPEG_HEADER):]
+            xmp_offset = offset + len(XMP_JPEG_HEADER)
+        elif marker == 0xE1 and data.startswith(XMP_EXT_HEADER):
+            raise Unsupported("XMP estendido")
+        elif marker == 0xED and data.startswith(PHOTOSHOP_HEADER):
+            # o bloco IRB pode continuar em vários APP13
+            irb += data[len(PHOTOSHOP_HEADER):]
+    return xmp, xmp_offset, _irb_iptc(irb) if irb else None
+
+
+def _png_chunks(f):
+    """Gera (tipo, offset dos dados, tamanho) dos chunks; pula os dados sem ler."""
+    if f.read(8) != PNG_SIGNATURE:
+        raise Unsupported("não é PNG")
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            raise Unsupported("PNG truncado")
+        size, ctype = struct.unpack(">I4s", head)
+        offset = f.tell()
+        yield ctype, offset, size
+        if ctype == b"IEND":
+            return
+        f.seek(offset + size + 4)  # dados + CRC
+
+
+def png_blocks(f):
+    """(xmp, offset do pacote, iptc) de um PNG; o offset é None se o texto estiver comprimido."""
+    xmp = xmp_offset = None
+    for ctype, offset, size in _png_chunks(f):
+        if ctype in (b"tEXt", b"zTXt", b"iTXt"):
+            f.seek(offset)
+            data = f.read(size)
+            keyword = data.split(b"\x00", 1)[0]
+            if keyword.startswith(b"Raw profile type"):
+                raise Unsupported("perfil bruto (IPTC/XMP legado) em PNG")
+            if keyword == PNG_XMP_KEYWORD and ctype != b"iTXt":
+                # fora do padrão, mas o exiftool também lê XMP de tEXt/zTXt
+                raise Unsupported(f"XMP em chunk {ctype.decode()}")
+            if ctype == b"iTXt" and keyword == PNG_XMP_KEYWORD:
+                if xmp is not None:
+                    raise Unsupported("mais de um chunk XMP")
+                xmp, xmp_offset = _itxt_text(data, offset)
+    return xmp, xmp_offset, None
+
+
+def _itxt_text(data, offset):
+    # keyword \0 flag método idioma \0 keyword traduzida \0 texto
+    kw_end = data.index(b"\x00")
+    compressed = data[kw_end + 1]
+    lang_end = data.index(b"\x00", kw_end + 3)
+    text_start = data.index(b"\x00", lang_end + 1) + 1
+    text = data[text_start:]
+    if compressed:
+        return zlib.decompress(text), None
+    return text, offset + text_start
+
+
+def _tiff_header(f):
+    """(endian, offset do IFD0) do cabeçalho TIFF no início de ``f``."""
+    head = f.read(8)
+    if head[:4] == b"II*\x00":
+        endian = "<"
+    elif head[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        raise Unsupported("não é TIFF clássico")
+    return endian, struct.unpack(endian + "I", head[4:])[0]
+
+
+def _tiff_ifd(f, endian, ifd):
+    """(entradas, offset do próximo IFD) do IFD em ``ifd``."""
+    f.seek(ifd)
+    raw = f.read(2)
+    if len(raw) < 2:
+        raise Unsupported("TIFF truncado")
+    count = struct.unpack(endian + "H", raw)[0]
+    entries = {}
+    for i in range(count):
+        raw = f.read(12)
+        if len(raw) < 12:
+            raise Unsupported("TIFF truncado")
+        tag, typ, n = struct.unpack(endian + "HHI", raw[:8])
+        entries[tag] = (typ, n, raw[8:], ifd + 2 + i * 12)
+    raw = f.read(4)
+    return entries, struct.unpack(endian + "I", raw)[0] if len(raw) == 4 else 0
+
+
+def _tiff_ifd0(f):
+    endian, ifd = _tiff_header(f)
+    entries, _ = _tiff_ifd(f, endian, ifd)
+    return endian, entries
+
+
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+
+
+def tiff_value(f, endian, entry):
+    """(bytes, offset) do valor de uma entrada do IFD."""
+    typ, n, inline, _ = entry
+    size = _TIFF_TYPE_SIZES.get(typ, 1) * n
+    if size <= 4:
+        return inline[:size], None
+    offset = struct.unpack(endian + "I", inline)[0]
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) < size:
+        raise Unsupported("TIFF truncado")
+    return data, offset
+
+
+def _tiff_int(f, endian, entry):
+    """Primeiro valor de uma entrada SHORT/LONG."""
+    fmt = {3: "H", 4: "I"}.get(entry[0])
+    if fmt is None or entry[1] < 1:
+        raise Unsupported("tipo inesperado no IFD")
+    data, _ = tiff_value(f, endian, entry)
+    return struct.unpack(endian + fmt, data[:struct.calcsize(fmt)])[0]
+
+
+def tiff_blocks(f):
+    """(xmp, offset do pacote, iptc) do IFD0 de um TIFF."""
+    endian, entries = _tiff_ifd0(f)
+    xmp = xmp_offset = iptc = None
+    if TIFF_XMP in entries:
+        xmp, xmp_offset = tiff_value(f, endian, entries[TIFF_XMP])
+    if TIFF_IPTC in entries:
+        iptc, _ = tiff_value(f, endian, entries[TIFF_IPTC])
+    if TIFF_PHOTOSHOP in entries:
+        irb, _ = tiff_value(f, endian, entries[TIFF_PHOTOSHOP])
+        if _irb_iptc(irb) is not None:
+            raise Unsupported("IPTC em mais de um lugar")
+    return xmp, xmp_offset, iptc
+
+
+def exif_thumbnail(path):
+    """Bytes do JPEG da miniatura embutida no EXIF (IFD1) de um JPEG, ou None.
+
+    Lê só o segmento APP1 "Exif"; a imagem principal nunca é decodificada.
+    """
+    try:
+        with open(path, "rb") as f:
+            for marker, _, data in _jpeg_segments(f):
+                if marker == 0xE1 and data.startswith(EXIF_HEADER):
+                    break
+            else:
+                return None
+        return _ifd1_jpeg(data)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        raise Unsupported(str(e))
+
+
+def _ifd1_jpeg(data):
+    tiff = io.BytesIO(data[len(EXIF_HEADER):])
+    endian, ifd0 = _tiff_header(tiff)
+    _, ifd1 = _tiff_ifd(tiff, endian, ifd0)
+    if not ifd1:
+        return None
+    entries, _ = _tiff_ifd(tiff, endian, ifd1)
+    if EXIF_THUMB_OFFSET not in entries or EXIF_THUMB_LENGTH not in entries:
+        return None
+    start = _tiff_int(tiff, endian, entries[EXIF_THUMB_OFFSET])
+    length = _tiff_int(tiff, endian, entries[EXIF_THUMB_LENGTH])
+    thumb = data[len(EXIF_HEADER) + start:len(EXIF_HEADER) + start + length]
+    if len(thumb) < length or not thumb.startswith(b"\xff\xd8"):
+        return None
+    return thumb
+
+
+def _irb_iptc(irb):
+    """Dados IPTC (recurso 0x0404) de um bloco Photoshop IRB, ou None."""
+    found = None
+    pos = 0
+    while pos + 12 <= len(irb):
+        if irb[pos:pos + 4] != b"8BIM":
+            raise Unsupported("IRB inválido")
+        rid = struct.unpack(">H", irb[pos + 4:pos + 6])[0]
+        name_len = irb[pos + 6]
+        pos += 6 + ((name_len + 2) & ~1)  # nome pascal com padding par
+        size = struct.unpack(">I", irb[pos:pos + 4])[0]
+        pos += 4
+        if rid == IRB_IPTC:
+            if found is not None:
+                raise Unsupported("mais de um bloco IPTC")
+            found = irb[pos:pos + size]
+        pos += size + (size & 1)
+    return found
+
+
+def read_blocks(f):
+    """(xmp, offset do pacote XMP no arquivo, iptc) conforme o formato do arquivo."""
+    magic = f.read(8)
+    f.seek(0)
+    if magic.startswith(b"\xff\xd8"):
+        return jpeg_blocks(f)
+    if magic.startswith(PNG_SIGNATURE):
+        return png_blocks(f)
+    if magic[:4] in (b"II*\x00", b"MM\x00*"):
+        return tiff_blocks(f)
+    raise Unsupported("formato não suportado")
+
+
+# Conteúdo
+
+def iptc_keywords(data):
+    """Valores de IPTC:Keywords (2:25), decodificados como o exiftool faria."""
+    keywords = []
+    utf8 = False
+    pos = 0
+    while pos < len(data):
+        if data[pos] != 0x1C:
+            if not data[pos:].strip(b"\x00"):
+                break  # padding no fim do bloco
+            raise Unsupported("IPTC inválido")
+        record, dataset = data[pos + 1], data[pos + 2]
+        size = struct.unpack(">H", data[pos + 3:pos + 5])[0]
+        if size & 0x8000:
+            raise Unsupported("IPTC com tamanho estendido")
+        value = data[pos + 5:pos + 5 + size]
+        pos += 5 + size
+        if (record, dataset) == (1, 90):
+            utf8 = value == b"\x1b%G"
+        elif (record, dataset) == (2, 25):
+            keywords.append(value)
+    out = []
+    for raw in keywords:
+        if b"\x00" in raw:
+            raise Unsupported("valor IPTC com NUL")
+        if utf8:
+            try:
+                v = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                raise Unsupported("IPTC UTF-8 inválido")
+        elif raw.isascii():
+            v = raw.decode("ascii")
+        else:
+            # sem CodedCharacterSet o resultado depende da opção -charset do exiftool
+            raise Unsupported("IPTC sem charset com bytes não ASCII")
+        if v != v.strip():
+            raise Unsupported("valor IPTC com espaços nas pontas")
+        out.append(v)
+    return out
+
+
+def xmp_values(packet):
+    """{"Subject": [...], "PersonInImage": [...]} presentes no pacote XMP."""
+    try:
+        root = ET.fromstring(packet)
+    except ET.ParseError:
+        raise Unsupported("XMP malformado")
+    out = {}
+    for desc in root.iter(f"{{{NS_RDF}}}Description"):
+        for field, tag in XMP_FIELDS.items():
+            if any(k == tag for k in desc.attrib):
+                raise Unsupported("propriedade XMP em forma de atributo")
+            for prop in desc.findall(tag):
+                if field in out:
+                    raise Unsupported("propriedade XMP repetida")
+                out[field] = _xmp_list(prop)
+    return out
+
+
+def _xmp_list(prop):
+    children = list(prop)
+    if prop.attrib or len(children) != 1 or children[0].tag not in (
+            f"{{{NS_RDF}}}Bag", f"{{{NS_RDF}}}Seq", f"{{{NS_RDF}}}Alt"):
+        raise Unsupported("forma de lista XMP não suportada")
+    values = []
+    for li in children[0]:
+        if li.tag != f"{{{NS_RDF}}}li" or len(li) or li.attrib:
+            raise Unsupported("item de lista XMP não suportado")
+        v = li.text or ""
+        if not v or v != v.strip():
+            raise Unsupported("item de lista XMP vazio ou com espaços nas pontas")
+        values.append(v)
+    return values
+
+
+def read_fields(path):
+    """Campos no formato do JSON do exiftool (``Subject``, ``Keywords``, ``PersonInImage``)."""
+    try:
+        with open(path, "rb") as f:
+            xmp, _, iptc = read_blocks(f)
+    except (OSError, ValueError, IndexError, struct.error, zlib.error) as e:
+        # arquivo ausente/corrompido: o exiftool dá a mensagem de erro adequada
+        raise Unsupported(str(e))
+    data = xmp_values(xmp) if xmp else {}
+    if iptc:
+        keywords = iptc_keywords(iptc)
+        if keywords:
+            data["Keywords"] = keywords
+    return data
+
+
+# Escrita no lugar
+
+JOURNAL_SUFFIX = ".imgmeta-journal"
+_JOURNAL_MAGIC = b"IMGMETAJ"
+_XPACKET_END = re.compile(rb"<\?xpacket\s+end\s*=\s*[\"']([rw])[\"']\s*\?>")
+
+# campo → (URI do namespace, nome local, prefixo usado se o namespace não existir no pacote)
+_XMP_PROPS = {
+    "Subject": (NS_DC, "subject", "dc"),
+    "PersonInImage": (NS_IPTC_EXT, "PersonInImage", "Iptc4xmpExt"),
+}
+
+
+def _prefixes(packet):
+    """{URI: prefixo} declarados no pacote (o primeiro encontrado para cada URI)."""
+    out = {}
+    for _, (prefix, uri) in ET.iterparse(io.BytesIO(packet), events=("start-ns",)):
+        out.setdefault(uri, prefix)
+    return out
+
+
+def _set_property(xml, prefixes, field, values, keep_empty=False):
+    # lista vazia remove a propriedade; com keep_empty, grava uma Bag vazia
+    uri, local, default_prefix = _XMP_PROPS[field]
+    rdf = prefixes.get(NS_RDF)
+    if rdf is None:
+        raise Unsupported("XMP sem namespace RDF")
+    prefix = prefixes.get(uri)
+    found = []
+    if prefix is not None:
+        pname = re.escape(f"{prefix}:{local}")
+        pattern = re.compile(rf"<{pname}[\s>].*?</{pname}\s*>", re.S)
+        found = pattern.findall(xml)
+        if len(found) > 1:
+            raise Unsupported("propriedade XMP repetida")
+    new = ""
+    if values or keep_empty:
+        items = "".join(f"<{rdf}:li>{escape(v)}</{rdf}:li>" for v in values)
+        name = f"{prefix or default_prefix}:{local}"
+        decl = ""
+        # namespace declarado no próprio elemento substituído (ou em nenhum lugar): declara de novo
+        if prefix is None or (found and re.search(rf"\sxmlns:{re.escape(prefix)}\s*=", found[0].split(">", 1)[0])):
+            decl = f' xmlns:{prefix or default_prefix}="{uri}"'
+        new = f"<{name}{decl}><{rdf}:Bag>{items}</{rdf}:Bag></{name}>"
+    if found:
+        return pattern.sub(lambda m: new, xml, count=1)
+    if not new:
+        return xml
+    # propriedade nova: entra antes do fim do primeiro rdf:Description
+    end = re.search(rf"</{re.escape(rdf)}:Description\s*>", xml)
+    if end is None:
+        raise Unsupported("rdf:Description sem tag de fechamento")
+    return xml[:end.start()] + new + xml[end.start():]
+
+
+def _pad(n):
+    # padding recomendado pelo XMP: linhas de espaços
+    line = " " * 99 + "\n"
+    return (line * (n // 100 + 1))[:n]
+
+
+def _rebuild_packet(packet, fields):
+    """Pacote com ``fields`` aplicados e exatamente o mesmo tamanho do original."""
+    m = _XPACKET_END.search(packet)
+    if m is None:
+        raise Unsupported("pacote XMP sem xpacket end")
+    if m.group(1) != b"w":
+        raise Unsupported("pacote XMP somente leitura")
+    body = packet[:m.start()]
+    stripped = body.rstrip(b" \t\r\n")
+    try:
+        xml = stripped.decode("utf-8")
+    except UnicodeDecodeError:
+        raise Unsupported("XMP que não está em UTF-8")
+    prefixes = _prefixes(packet)
+    for field, values in fields.items():
+        xml = _set_property(xml, prefixes, field, values)
+    new = xml.encode("utf-8")
+    room = len(body) - len(new)
+    if room < 1:
+        raise Unsupported("o pacote XMP não tem padding suficiente")
+    return new + _pad(room - 1).encode() + b"\n" + packet[m.start():]
+
+
+def _write_at(f, offset, data):
+    f.seek(offset)
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def recover_inplace(path):
+    """Desfaz uma escrita no lugar interrompida, usando o journal deixado ao lado do arquivo."""
+    journal = f"{path}{JOURNAL_SUFFIX}"
+    try:
+        with open(journal, "rb") as j:
+            raw = j.read()
+    except FileNotFoundError:
+        return False
+    head = len(_JOURNAL_MAGIC) + 16
+    if raw.startswith(_JOURNAL_MAGIC) and len(raw) >= head:
+        offset, size, crc = struct.unpack(">QII", raw[len(_JOURNAL_MAGIC):head])
+        old = raw[head:]
+        # journal incompleto: a escrita nem tinha começado, o arquivo está intacto
+        if len(old) == size and zlib.crc32(old) == crc:
+            with open(path, "r+b") as f:
+                _write_at(f, offset, old)
+    os.unlink(journal)
+    return True
+
+
+def update_xmp_inplace(path, change):
+    """Reescreve só o pacote XMP de ``path``, se a edição couber no padding.
+
+    ``change(campos atuais)`` recebe ``Subject``/``PersonInImage``/``Keywords`` e
+    devolve os novos valores de ``Subject``/``PersonInImage`` (ou levanta
+    ``Unsupported`` quando a edição também mexeria no IPTC). Devolve False se
+    não havia nada a mudar. O trecho original vai antes para um journal
+    (``recover_inplace``), e o resultado é relido e conferido antes de apagá-lo.
+    """
+    recover_inplace(path)
+    try:
+        with open(path, "r+b") as f:
+            magic = f.read(8)
+            f.seek(0)
+            xmp, offset, iptc = read_blocks(f)
+            if xmp is None or offset is None:
+                raise Unsupported("sem pacote XMP gravável no lugar")
+            current = xmp_values(xmp)
+            if iptc:
+                current["Keywords"] = iptc_keywords(iptc)
+            fields = change(dict(current))
+            fields = {k: v for k, v in fields.items() if current.get(k, []) != v}
+            if not fields:
+                return False
+            packet = _rebuild_packet(xmp, fields)
+            expected = {k: v for k, v in current.items() if k in XMP_FIELDS}
+            expected.update(fields)
+            got = xmp_values(packet)
+            if {k: v for k, v in got.items() if v} != {k: v for k, v in expected.items() if v}:
+                raise Unsupported("validação do novo pacote XMP falhou")
+
+            old, new = xmp, packet
+            if magic.startswith(PNG_SIGNATURE):
+                # o texto do iTXt vai até o fim do chunk: o CRC vem logo depois
+                f.seek(0)
+                start = next(o for t, o, n in _png_chunks(f) if t == b"iTXt" and o <= offset < o + n)
+                f.seek(start - 4)
+                chunk = f.read(offset - start + 4) + packet  # tipo + dados, base do CRC
+                f.seek(offset + len(xmp))
+                old_crc = f.read(4)
+                old = xmp + old_crc
+                new = packet + struct.pack(">I", zlib.crc32(chunk))
+
+            journal = f"{path}{JOURNAL_SUFFIX}"
+            with open(journal, "wb") as j:
+                j.write(_JOURNAL_MAGIC + struct.pack(">QII", offset, len(old), zlib.crc32(old)) + old)
+                j.flush()
+                os.fsync(j.fileno())
+            _write_at(f, offset, new)
+            f.seek(offset)
+            if f.read(len(new)) != new:
+                raise OSError("conteúdo relido difere do gravado")
+    except (ValueError, IndexError, struct.error, zlib.error, ET.ParseError) as e:
+        raise Unsupported(str(e))
+    except OSError:
+        recover_inplace(path)
+        raise
+    os.unlink(journal)
+    return True
+
+
+# Sidecars
+
+SIDECAR_TEMPLATE = (
+    '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+    ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+    '  <rdf:Description rdf:about=""></rdf:Description>\n'
+    ' </rdf:RDF>\n'
+    '</x:xmpmeta>\n'
+    '<?xpacket end="w"?>\n'
+)
+
+
+def read_sidecar(path):
+    """``Subject``/``PersonInImage`` presentes no sidecar ``path`` (None se ele não existe)."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        raise Unsupported(str(e))
+    return xmp_values(data)
+
+
+def _load_sidecar(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    xmp_values(data)  # recusa as mesmas formas que a leitura não entende
+    try:
+        return data, data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise Unsupported("sidecar que não está em UTF-8")
+
+
+def _save_sidecar(path, xml):
+    tmp = f"{path}.imgmeta-tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(xml.encode("utf-8"))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_sidecar(path, fields):
+    """Grava ``fields`` (``Subject``/``PersonInImage``) no sidecar ``path``, criando-o se preciso.
+
+    O resto do sidecar é mantido. Lista vazia vira uma Bag vazia, que na
+    leitura esconde os valores do próprio arquivo.
+    """
+    try:
+        data, xml = _load_sidecar(path)
+    except FileNotFoundError:
+        xml = SIDECAR_TEMPLATE
+        data = xml.encode("utf-8")
+    prefixes = _prefixes(data)
+    for field, values in fields.items():
+        xml = _set_property(xml, prefixes, field, values, keep_empty=True)
+    got = xmp_values(xml.encode("utf-8"))
+    if any(got.get(k) != list(v) for k, v in fields.items()):
+        raise Unsupported("validação do sidecar falhou")
+    _save_sidecar(path, xml)
+
+
+def clear_sidecar(path):
+    """Tira pessoas/tags do sidecar ``path``; apaga o arquivo se não sobrar nenhuma propriedade.
+
+    Devolve True se o sidecar foi apagado.
+    """
+    data, xml = _load_sidecar(path)
+    prefixes = _prefixes(data)
+    new = xml
+    for field in _XMP_PROPS:
+        new = _set_property(new, prefixes, field, [])
+    root = ET.fromstring(new.encode("utf-8"))
+    if all(len(d) == 0 and set(d.attrib) <= {f"{{{NS_RDF}}}about"}
+           for d in root.iter(f"{{{NS_RDF}}}Description")):
+        os.unlink(path)
+        return True
+    if new != xml:
+        _save_sidecar(path, new)
+    return False
@@ -0,0 +1,178 @@
+"""Consultas booleanas sobre pessoas/tags.
+
+Exemplo de expressão::
+
+    person:"Maria Silva" AND (tag:praia OR tag:viagem) AND NOT tag:rascunho
+
+Campos: ``person:``/``pessoa:`` e ``tag:``; um valor sem campo casa com
+qualquer um dos dois. Operadores (``AND``, ``OR``, ``NOT``) em maiúsculas;
+termos lado a lado sem operador são combinados com ``AND``. A comparação de
+valores ignora maiúsculas/minúsculas, como em ``matches_filters``.
+
+A expressão é compilada uma vez (``compile_query``) numa árvore de funções e
+avaliada registro a registro (``Query.matches``), à medida que os registros
+são lidos: o ``search`` não guarda os registros nem monta índice, então a
+memória não cresce com o número de arquivos.
+"""
+import re
+
+FIELDS = {
+    "person": "p", "people": "p", "pessoa": "p", "pessoas": "p",
+    "tag": "t", "tags": "t",
+}
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<lp>\() | (?P<rp>\)) |
+        (?P<field>[^\s()":]+):(?P<fval>"(?:[^"\\]|\\.)*"|[^\s()"]+) |
+        (?P<str>"(?:[^"\\]|\\.)*") |
+        (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _unquote(v: str) -> str:
+    if v.startswith('"'):
+        return re.sub(r'\\(.)', r'\1', v[1:-1])
+    return v
+
+
+def _tokenize(text: str) -> list[tuple]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise QueryError(f"expressão inválida perto de: {text[pos:]!r}")
+        pos = m.end()
+        if m.group("lp"):
+            tokens.append(("(",))
+        elif m.group("rp"):
+            tokens.append((")",))
+        elif m.group("field"):
+            field = FIELDS.get(m.group("field").lower())
+            if field is None:
+                raise QueryError(f"campo desconhecido: {m.group('field')!r} (use person: ou tag:)")
+            tokens.append(("term", field, _unquote(m.group("fval")).lower()))
+        elif m.group("str"):
+            tokens.append(("term", None, _unquote(m.group("str")).lower()))
+        else:
+            w = m.group("word")
+            if w in ("AND", "OR", "NOT"):
+                tokens.append((w,))
+            else:
+                tokens.append(("term", None, w.lower()))
+    return tokens
+
+
+class _Parser:
+    # expr := and ("OR" and)* ; and := not (["AND"] not)* ; not := "NOT" not | "(" expr ")" | termo
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i][0] if self.i < len(self.tokens) else None
+
+    def next(self):
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def parse(self):
+        if not self.tokens:
+            return ("all",)
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"token inesperado: {self.tokens[self.i]}")
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.peek() == "OR":
+            self.next()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else ("or", items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.peek() in ("AND", "NOT", "(", "term"):
+            if self.peek() == "AND":
+                self.next()
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else ("and", items)
+
+    def parse_not(self):
+        kind = self.peek()
+        if kind == "NOT":
+            self.next()
+            return ("not", self.parse_not())
+        if kind == "(":
+            self.next()
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise QueryError("parêntese não fechado")
+            self.next()
+            return node
+        if kind == "term":
+            return self.next()
+        raise QueryError("expressão incompleta" if kind is None else f"token inesperado: {kind}")
+
+
+def _compile_predicate(node):
+    kind = node[0]
+    if kind == "all":
+        return lambda ppl, tgs: True
+    if kind == "term":
+        _, field, value = node
+        if field == "p":
+            return lambda ppl, tgs: value in ppl
+        if field == "t":
+            return lambda ppl, tgs: value in tgs
+        return lambda ppl, tgs: value in ppl or value in tgs
+    if kind == "not":
+        inner = _compile_predicate(node[1])
+        return lambda ppl, tgs: not inner(ppl, tgs)
+    parts = [_compile_predicate(n) for n in node[1]]
+    if kind == "and":
+        return lambda ppl, tgs: all(f(ppl, tgs) for f in parts)
+    return lambda ppl, tgs: any(f(ppl, tgs) for f in parts)
+
+
+class Query:
+    """Expressão compilada; ``matches`` diz se um registro a satisfaz."""
+
+    def __init__(self, ast):
+        self.ast = ast
+        self._pred = _compile_predicate(ast)
+
+    def matches(self, meta) -> bool:
+        return self._pred({x.lower() for x in meta["people"]}, {x.lower() for x in meta["tags"]})
+
+    def __and__(self, other: "Query") -> "Query":
+        if self.ast == ("all",):
+            return other
+        if other.ast == ("all",):
+            return self
+        return Query(("and", [self.ast, other.ast]))
+
+
+def compile_query(text: str) -> Query:
+    return Query(_Parser(_tokenize(text)).parse())
+
+
+def filters_query(people=None, tags=None, mode="any") -> Query:
+    """Equivalente de ``matches_filters`` para as opções ``--people``/``--tags``/``--mode``."""
+    groups = []
+    for field, values in (("p", people), ("t", tags)):
+        terms = [("term", field, v.lower()) for v in values or []]
+        if terms:
+            groups.append(terms[0] if len(terms) == 1 else ("or" if mode == "any" else "and", terms))
+    if not groups:
+        return Query(("all",))
+    return Query(groups[0] if len(groups) == 1 else ("and", groups))
+
@@ -0,0 +1,181 @@
+"""Instrumentação: tempo por fase, processos, bytes lidos, cache e arquivos mais lentos.
+
+``Hooks`` é a base dos callbacks para quem usa o imgmeta como biblioteca
+(``imgmeta.add_hook``): ``before_run``/``after_run`` em volta de cada comando
+do exiftool e ``file_done`` a cada arquivo lido ou gravado. Os callbacks podem
+ser chamados de várias threads ao mesmo tempo (``--jobs``).
+
+``Stats`` é o que ``--stats``/``--stats-json`` usam: um ``Hooks`` que também
+acumula o tempo das fases internas (``phase``) e contadores (``count``).
+Com várias threads, o tempo das fases é somado entre elas e pode passar do
+tempo total.
+"""
+import heapq
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+SLOWEST = 10  # arquivos mais lentos guardados
+
+# fase → descrição no relatório, na ordem em que aparecem
+PHASES = {
+    "walk": "listagem de pastas",
+    "cache": "cache de metadados",
+    "native": "leitura/escrita direta",
+    "exiftool": "comandos do exiftool",
+    "exiftool_start": "  1º comando de cada processo (inclui a inicialização)",
+    "json": "parse do JSON do exiftool",
+    "diff": "comparação antes de gravar (inclui as leituras)",
+    "filter": "filtro da busca",
+    "counts": "frequências e coocorrências (comando stats)",
+}
+
+
+def _proc_read_bytes():
+    # bytes lidos pelo processo (arquivos, pipes do exiftool, SQLite); só no Linux
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class Hooks:
+    """Callbacks de instrumentação; sobrescreva só os que interessam."""
+
+    def before_run(self, cmd):
+        """Antes de cada comando do exiftool (``cmd`` inclui o executável)."""
+
+    def after_run(self, cmd, seconds, error):
+        """Depois do comando; ``error`` é a exceção, se ele falhou."""
+
+    def file_done(self, op, path, seconds, source):
+        """Um arquivo processado: ``op`` é "read" ou "write"; ``source`` diz por onde.
+
+        Leitura: "cache", "native" ou "exiftool"; escrita: "inplace", "exiftool"
+        ou "unchanged" (pulada por já ter os valores). Arquivos resolvidos num
+        lote do exiftool recebem o tempo do lote dividido entre eles.
+        """
+
+
+class Stats(Hooks):
+    def __init__(self, slowest=SLOWEST):
+        self.phases = defaultdict(float)
+        self.counts = Counter()
+        self.slowest = []  # heap de (segundos, path, op/source)
+        self.n_slowest = slowest
+        self.wall = None
+        self.cache = None
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._rchar0 = _proc_read_bytes()
+        self._rchar = None
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def after_run(self, cmd, seconds, error):
+        with self._lock:
+            self.phases["exiftool"] += seconds
+            self.counts["exiftool_commands"] += 1
+            if error is not None:
+                self.counts["exiftool_failures"] += 1
+
+    def file_done(self, op, path, seconds, source):
+        item = (seconds, str(path), f"{op}/{source}")
+        with self._lock:
+            self.counts[f"{op}_{source}"] += 1
+            if len(self.slowest) < self.n_slowest:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def finish(self, cache=None):
+        """Fecha a medição; ``cache`` é o ``MetaCache`` usado, para a taxa de acerto."""
+        self.wall = time.perf_counter() - self._t0
+        end = _proc_read_bytes()
+        self._rchar = None if end is None or self._rchar0 is None else end - self._rchar0
+        if cache is not None:
+            self.cache = {"hits": cache.hits, "misses": cache.misses}
+
+    def as_dict(self) -> dict:
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._t0
+        files = self.counts["files"]
+        cache = dict(self.cache) if self.cache else None
+        if cache:
+            total = cache["hits"] + cache["misses"]
+            cache["hit_rate"] = cache["hits"] / total if total else None
+        return {
+            "wall_seconds": wall,
+            "files": files,
+            "files_per_second": files / wall if wall > 0 else None,
+            "phases": dict(self.phases),
+            "subprocesses": self.counts["subprocesses"],
+            "exiftool_commands": self.counts["exiftool_commands"],
+            "exiftool_output_bytes": self.counts["exiftool_output_bytes"],
+            "read_bytes": self._rchar,
+            "counts": {k: v for k, v in sorted(self.counts.items())
+                       if k not in ("files", "subprocesses", "exiftool_commands", "exiftool_output_bytes")},
+            "cache": cache,
+            "slowest": [{"file": p, "op": op, "seconds": s} for s, p, op in sorted(self.slowest, reverse=True)],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    def report(self, out=None):
+        out = out or sys.stderr
+        d = self.as_dict()
+        rate = f", {d['files_per_second']:.1f} arq/s" if d["files"] else ""
+        print(f"\nEstatísticas: {d['wall_seconds']:.2f}s, {d['files']} arquivo(s){rate}", file=out)
+        if d["phases"]:
+            print("  fases (somadas entre threads):", file=out)
+            names = [n for n in PHASES if n in d["phases"]] + sorted(set(d["phases"]) - set(PHASES))
+            for name in names:
+                print(f"    {name:<15}{d['phases'][name]:9.3f}s  {PHASES.get(name, '')}".rstrip(), file=out)
+        print(f"  exiftool: {d['subprocesses']} processo(s) iniciado(s), {d['exiftool_commands']} comando(s), "
+              f"{_human(d['exiftool_output_bytes'])} de saída", file=out)
+        if d["read_bytes"] is not None:
+            print(f"  bytes lidos: {_human(d['read_bytes'])}", file=out)
+        c = d["counts"]
+        reads = [(k, c.get(f"read_{k}", 0)) for k in ("cache", "native", "exiftool")]
+        if any(n for _, n in reads):
+            print("  leituras: " + ", ".join(f"{k} {n}" for k, n in reads), file=out)
+        writes = [(k, c.get(f"write_{k}", 0)) for k in ("inplace", "exiftool", "sidecar", "unchanged")]
+        if any(n for _, n in writes):
+            print("  escritas: " + ", ".join(f"{k} {n}" for k, n in writes), file=out)
+        if d["cache"] and d["cache"]["hit_rate"] is not None:
+            print(f"  cache: {d['cache']['hits']} acerto(s), {d['cache']['misses']} falta(s) "
+                  f"({d['cache']['hit_rate']:.1%})", file=out)
+        if d["slowest"]:
+            print("  mais lentos:", file=out)
+            for s in d["slowest"]:
+                print(f"    {s['seconds']:8.3f}s  {s['op']:<15} {s['file']}", file=out)
+
+
+def _human(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
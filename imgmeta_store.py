@@ -0,0 +1,142 @@
+"""Armazenamento compacto de muitos registros ``{file, tags, people}``.
+
+Com milhões de arquivos, guardar o dict de ``read_values`` de cada um repete
+as mesmas strings de pessoas/tags milhões de vezes. ``MetaStore`` guarda cada
+valor distinto uma vez só num ``Vocabulary`` e, por arquivo, apenas os ids
+(num único ``array('I')`` com offsets). O caminho é dividido em pasta (também
+internada) e nome (bytes num buffer contínuo).
+
+``store[i]`` devolve um ``Record``: uma vista com ``__slots__`` que monta
+``file``/``tags``/``people`` sob demanda e aceita ``rec["tags"]``, como o
+dict original; ``Record.as_dict()`` devolve o dict de verdade. Os arrays
+expõem o protocolo de buffer, então ``numpy.frombuffer(store.terms, "u4")``
+os enxerga sem cópia.
+"""
+import os
+from array import array
+
+_SEPS = {"/", os.sep, os.altsep} - {None}
+
+
+class Vocabulary:
+    """Tabela de strings internadas: ``id(s)`` devolve (e cria) o id; ``strings[i]`` é o texto."""
+
+    __slots__ = ("strings", "_ids")
+
+    def __init__(self):
+        self.strings: list[str] = []
+        self._ids: dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def id(self, s: str) -> int:
+        i = self._ids.get(s)
+        if i is None:
+            i = self._ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def get(self, s: str):
+        """O id de ``s``, ou None se ele nunca foi visto."""
+        return self._ids.get(s)
+
+
+class Record:
+    """Vista de um arquivo do ``MetaStore``; nada é copiado até ser pedido."""
+
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: "MetaStore", id: int):
+        self.store = store
+        self.id = id
+
+    @property
+    def file(self) -> str:
+        return self.store.file(self.id)
+
+    @property
+    def tags(self) -> list[str]:
+        return self.store.values(self.id, "tags")
+
+    @property
+    def people(self) -> list[str]:
+        return self.store.values(self.id, "people")
+
+    def __getitem__(self, key):
+        if key == "file":
+            return self.file
+        if key in ("tags", "people"):
+            return self.store.values(self.id, key)
+        raise KeyError(key)
+
+    def keys(self):
+        return ("file", "tags", "people")
+
+    def as_dict(self) -> dict:
+        return {"file": self.file, "tags": self.tags, "people": self.people}
+
+    def __repr__(self):
+        return f"Record({self.as_dict()!r})"
+
+
+class MetaStore:
+    """Registros ``{file, tags, people}`` em arrays; ``add`` devolve o id do arquivo.
+
+    Os ids de termos de todos os arquivos ficam em ``terms``; ``offsets`` tem
+    dois inícios por arquivo (tags, depois pessoas) e o fim do último, de modo
+    que as tags do arquivo ``i`` são ``terms[offsets[2*i]:offsets[2*i+1]]`` e as
+    pessoas ``terms[offsets[2*i+1]:offsets[2*i+2]]``. Pessoas e tags dividem o
+    mesmo vocabulário.
+    """
+
+    def __init__(self, records=()):
+        self.vocab = Vocabulary()
+        self.dirs = Vocabulary()
+        self.terms = array("I")
+        self.offsets = array("Q", [0])
+        self._dir = array("I")
+        self._names = bytearray()
+        self._name_offsets = array("Q", [0])
+        for meta in records:
+            self.add(meta)
+
+    def __len__(self):
+        return len(self._dir)
+
+    def __getitem__(self, i: int) -> Record:
+        return Record(self, range(len(self))[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Record(self, i)
+
+    def add(self, meta) -> int:
+        file = str(meta["file"])
+        cut = max(file.rfind(s) for s in _SEPS) + 1
+        self._dir.append(self.dirs.id(file[:cut]))
+        self._names += file[cut:].encode("utf-8", "surrogateescape")
+        self._name_offsets.append(len(self._names))
+        intern = self.vocab.id
+        for field in ("tags", "people"):
+            self.terms.extend(intern(v) for v in meta[field])
+            self.offsets.append(len(self.terms))
+        return len(self._dir) - 1
+
+    def file(self, i: int) -> str:
+        name = self._names[self._name_offsets[i]:self._name_offsets[i + 1]]
+        return self.dirs.strings[self._dir[i]] + name.decode("utf-8", "surrogateescape")
+
+    def term_ids(self, i: int, field: str) -> array:
+        k = 2 * i + (field == "people")
+        return self.terms[self.offsets[k]:self.offsets[k + 1]]
+
+    def values(self, i: int, field: str) -> list[str]:
+        strings = self.vocab.strings
+        return [strings[t] for t in self.term_ids(i, field)]
+
+    def nbytes(self) -> int:
+        """Tamanho aproximado dos arrays (sem contar as strings do vocabulário)."""
+        return (self.terms.itemsize * len(self.terms) + self.offsets.itemsize * len(self.offsets)
+                + self._dir.itemsize * len(self._dir) + len(self._names)
+                + self._name_offsets.itemsize * len(self._name_offsets))
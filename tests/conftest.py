@@ -0,0 +1,53 @@
+"""Fixtures comuns: imagens com XMP/IPTC (``benchmarks/corpus.py``) e o exiftool falso."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+import corpus  # noqa: E402
+import imgmeta  # noqa: E402
+
+OLD = 1_000_000_000  # mtime bem no passado (fora da janela de RACY_NS)
+
+
+@pytest.fixture(scope="session")
+def bases():
+    return corpus.base_images(("jpg", "png", "tif"), (32, 24), count=1)
+
+
+@pytest.fixture
+def make_image(tmp_path, bases):
+    """``make_image("a.jpg", tags, people)`` cria a imagem em ``tmp_path`` e devolve o caminho."""
+    def make(name, tags=(), people=(), keywords=None, folder=None):
+        path = (folder or tmp_path) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = bases[name.rsplit(".", 1)[1]][0]
+        path.write_bytes(corpus.embed(data, list(tags), list(people), keywords))
+        return path
+    return make
+
+
+def age(path):
+    """Põe o mtime de ``path`` no passado, para o cache aceitar a entrada."""
+    os.utime(path, ns=(OLD, OLD))
+
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    """``imgmeta`` com o exiftool falso, sem cache e com os defaults do módulo."""
+    if os.name == "nt":
+        pytest.skip("o exiftool falso é chamado por um script sh")
+    launcher = tmp_path / "bin" / "exiftool"
+    launcher.parent.mkdir()
+    launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{ROOT / "benchmarks" / "fake_exiftool.py"}" "$@"\n')
+    launcher.chmod(0o755)
+    monkeypatch.setattr(imgmeta, "EXIFTOOL", str(launcher))
+    monkeypatch.setattr(imgmeta, "_cache", None)
+    imgmeta._sidecar_dirs.clear()
+    yield imgmeta
+    imgmeta.close_exiftool()
+    imgmeta.close_cache()
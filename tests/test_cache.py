@@ -0,0 +1,84 @@
+import os
+
+from conftest import OLD, age
+from imgmeta import MetaCache
+
+
+def meta(path, tags=(), people=()):
+    return {"file": str(path), "tags": list(tags), "people": list(people)}
+
+
+def test_hit_while_file_unchanged(tmp_path):
+    cache = MetaCache(tmp_path / "index.db")
+    f = tmp_path / "a.jpg"
+    f.write_bytes(b"x" * 10)
+    age(f)
+    cache.put_many([meta(f, ["praia"], ["Ana"])])
+    assert cache.get(f) == meta(f, ["praia"], ["Ana"])
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_changed_size_or_mtime_invalidates(tmp_path):
+    cache = MetaCache(tmp_path / "index.db")
+    a, b = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    for f in (a, b):
+        f.write_bytes(b"x" * 10)
+        age(f)
+    cache.put_many([meta(a, ["praia"]), meta(b, ["praia"])])
+    a.write_bytes(b"x" * 11)
+    age(a)
+    os.utime(b, ns=(OLD, OLD + 1))
+    assert cache.get_many([a, b]) == {}
+    assert cache.misses == 2
+
+
+def test_recently_modified_file_is_not_cached(tmp_path):
+    # mtime dentro da janela de RACY_NS: uma regravação do mesmo tamanho no mesmo
+    # instante não mudaria a assinatura, então a entrada não é guardada
+    cache = MetaCache(tmp_path / "index.db")
+    f = tmp_path / "a.jpg"
+    f.write_bytes(b"x" * 10)
+    age(f)
+    cache.put_many([meta(f, ["velha"])])
+    os.utime(f)  # agora
+    cache.put_many([meta(f, ["nova"])])
+    age(f)  # mesma assinatura da primeira entrada: ela também tem de ter saído
+    assert cache.get(f) is None
+
+
+def test_forget_and_missing_file(tmp_path):
+    cache = MetaCache(tmp_path / "index.db")
+    f = tmp_path / "a.jpg"
+    f.write_bytes(b"x")
+    age(f)
+    cache.put_many([meta(f, ["praia"]), meta(tmp_path / "sumiu.jpg", ["praia"])])
+    cache.forget_many([f])
+    assert cache.get(f) is None
+    assert cache.get(tmp_path / "sumiu.jpg") is None
+
+
+def test_merge_from(tmp_path):
+    a, b = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    for f in (a, b):
+        f.write_bytes(b"x")
+        age(f)
+    mine, other = MetaCache(tmp_path / "mine.db"), MetaCache(tmp_path / "other.db")
+    mine.put_many([meta(a, ["antiga"])])
+    other.put_many([meta(a, ["nova"]), meta(b, ["b"])])
+    other.close()
+    assert mine.merge_from(tmp_path / "other.db") == 2
+    assert mine.get(a)["tags"] == ["nova"]
+    assert mine.get(b)["tags"] == ["b"]
+
+
+def test_reads_and_writes_go_through_cache(core, make_image, tmp_path):
+    cache = core.open_cache(tmp_path / "index.db")
+    f = make_image("a.jpg", ["praia"], ["Ana"])
+    age(f)
+    assert next(core.read_values_many([f]))["tags"] == ["praia"]
+    assert next(core.read_values_many([f]))["tags"] == ["praia"]
+    assert cache.hits == 1
+    # a escrita deixa o arquivo com mtime recente: a entrada sai e a próxima leitura vai ao arquivo
+    assert list(core.add_values_many([f], tags=["sol"])) == [f]
+    assert cache.get(f) is None
+    assert next(core.read_values_many([f]))["tags"] == ["praia", "sol"]
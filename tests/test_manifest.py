@@ -0,0 +1,99 @@
+import io
+import json
+
+from imgmeta import _keyed_chunks, _path_key, read_manifest
+
+
+def read(core, path):
+    return next(core.read_values_many([path], on_error=lambda p, m: None))
+
+
+def csv_rows(text, **kw):
+    return list(read_manifest(io.StringIO(text), "csv", **kw))
+
+
+def test_csv_lists_and_default_op():
+    rows = csv_rows("file,op,people,tags\n"
+                    "a.jpg,,Ana; Bruno ,praia\n"
+                    "b.jpg,SET,,\n")
+    assert rows == [
+        {"line": 2, "file": "a.jpg", "op": "add", "people": ["Ana", "Bruno"], "tags": ["praia"]},
+        {"line": 3, "file": "b.jpg", "op": "set", "people": [], "tags": []},
+    ]
+    assert csv_rows("file,tags\na.jpg,praia|sol\n", sep="|", op="remove")[0]["tags"] == ["praia", "sol"]
+
+
+def test_csv_missing_column_keeps_field():
+    # sem a coluna people, o set não mexe nas pessoas
+    assert csv_rows("file,tags\na.jpg,praia\n", op="set")[0]["people"] is None
+
+
+def test_invalid_rows():
+    rows = csv_rows("file,op,tags\n,add,praia\na.jpg,troca,praia\n")
+    assert [(r["line"], r["file"], "error" in r) for r in rows] == [(2, None, True), (3, "a.jpg", True)]
+
+
+def test_ndjson():
+    text = "\n".join([
+        json.dumps({"file": "a.jpg", "people": ["Ana; Bruno"], "tags": "praia"}),
+        "",
+        "{quebrado",
+        "[1, 2]",
+    ])
+    rows = list(read_manifest(io.StringIO(text)))
+    # no NDJSON a lista já vem separada; ";" faz parte do nome
+    assert rows[0] == {"line": 1, "file": "a.jpg", "op": "add", "people": ["Ana; Bruno"], "tags": ["praia"]}
+    assert [(r["line"], "error" in r) for r in rows[1:]] == [(3, True), (4, True)]
+
+
+def test_keyed_chunks_keep_key_in_one_partition():
+    items = [f"{i % 7}.jpg" for i in range(100)]
+    parts = {}
+    for part, chunk in _keyed_chunks(items, 5, 4, _path_key):
+        assert len(chunk) <= 5
+        for item in chunk:
+            assert parts.setdefault(item, part) == part
+    assert sorted(parts) == sorted(set(items))
+
+
+def row(line, file, op="add", people=None, tags=None):
+    return {"line": line, "file": str(file), "op": op, "people": people, "tags": tags}
+
+
+def test_same_edit_is_one_write(core, make_image, monkeypatch):
+    files = [make_image(f"{n}.jpg", ["praia"]) for n in "abc"]
+    calls = []
+    write_many = core.write_many
+    monkeypatch.setattr(core, "write_many", lambda args, paths, **kw: calls.append(list(paths))
+                        or write_many(args, paths, **kw))
+    rows = [row(1, files[0], tags=["sol"]), row(2, files[1], tags=["sol"]), row(3, files[2], people=["Ana"])]
+    assert [s for _, s in core.apply_manifest(rows)] == ["ok", "ok", "ok"]
+    assert calls == [[str(files[0]), str(files[1])], [str(files[2])]]
+    assert read(core, files[1])["tags"] == ["praia", "sol"]
+    assert read(core, files[2])["people"] == ["Ana"]
+
+
+def test_repeated_file_is_applied_in_row_order(core, make_image, tmp_path, monkeypatch):
+    f = make_image("a.jpg", ["praia"])
+    monkeypatch.chdir(tmp_path)
+    # o mesmo arquivo escrito de dois jeitos ainda é o mesmo arquivo
+    rows = [row(1, f, tags=["sol"]), row(2, "./a.jpg", "remove", tags=["praia"]),
+            row(3, f, "set", people=["Ana"])]
+    assert [s for _, s in core.apply_manifest(rows)] == ["ok", "ok", "ok"]
+    assert read(core, f) == {"file": str(f), "tags": ["sol"], "people": ["Ana"]}
+
+
+def test_unchanged_and_error_rows(core, make_image, tmp_path):
+    f = make_image("a.jpg", ["praia"])
+    errors = []
+    rows = [row(1, f, tags=["praia"]), row(2, tmp_path / "sumiu.jpg", tags=["sol"]),
+            {"line": 3, "file": None, "error": "sem a coluna file"}]
+    result = core.apply_manifest(rows, on_error=lambda r, msg: errors.append(r["line"]))
+    assert [(r["line"], s) for r, s in result] == [(1, "unchanged"), (2, "error"), (3, "error")]
+    assert sorted(errors) == [2, 3]
+
+
+def test_rows_keep_input_order(core, make_image):
+    f, g = make_image("a.jpg"), make_image("b.jpg")
+    rows = [row(1, f, tags=["x"]), row(2, g, people=["Ana"]), row(3, f, tags=["y"])]
+    assert [r["line"] for r, _ in core.apply_manifest(rows)] == [1, 2, 3]
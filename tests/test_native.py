@@ -0,0 +1,126 @@
+import struct
+import zlib
+
+import pytest
+
+import corpus
+import imgmeta_native as native
+from imgmeta_native import JOURNAL_SUFFIX, Unsupported
+
+
+@pytest.mark.parametrize("name", ["a.jpg", "a.png", "a.tif"])
+def test_read_fields(make_image, name):
+    path = make_image(name, ["praia", "férias"], ["Maria Silva"])
+    fields = native.read_fields(path)
+    assert fields["Subject"] == ["praia", "férias"]
+    assert fields["PersonInImage"] == ["Maria Silva"]
+    # PNG não tem IPTC
+    assert fields.get("Keywords") == (None if name.endswith(".png") else ["praia", "férias"])
+
+
+def test_read_fields_without_metadata(make_image):
+    assert native.read_fields(make_image("a.jpg")) == {}
+
+
+def test_png_xmp_outside_itxt_is_unsupported(bases, tmp_path):
+    # o exiftool lê XMP em tEXt/zTXt; a leitura direta recusa e o chamador volta para ele
+    data = bases["png"][0]
+    xmp = corpus.xmp_packet(["praia"], [])
+    for ctype, body in ((b"tEXt", xmp), (b"zTXt", b"\x00" + zlib.compress(xmp))):
+        chunk = corpus._png_chunk(ctype, corpus.PNG_XMP_KEYWORD + b"\x00" + body)
+        path = tmp_path / f"{ctype.decode()}.png"
+        path.write_bytes(data[:33] + chunk + data[33:])  # logo depois do IHDR
+        with pytest.raises(Unsupported):
+            native.read_fields(path)
+
+
+def test_malformed_xmp_is_unsupported():
+    with pytest.raises(Unsupported):
+        native.xmp_values(b"<x:xmpmeta")
+
+
+def test_iptc_without_charset_non_ascii_is_unsupported():
+    raw = "ção".encode("latin-1")
+    with pytest.raises(Unsupported):
+        native.iptc_keywords(b"\x1c\x02\x19" + struct.pack(">H", len(raw)) + raw)
+
+
+def add_people(*people):
+    def change(cur):
+        return {"PersonInImage": cur.get("PersonInImage", []) + list(people)}
+    return change
+
+
+@pytest.mark.parametrize("name", ["a.jpg", "a.png", "a.tif"])
+def test_update_xmp_inplace(make_image, name):
+    path = make_image(name, ["praia"], ["Ana"])
+    size = path.stat().st_size
+    assert native.update_xmp_inplace(path, add_people("Bruno")) is True
+    assert native.read_fields(path)["PersonInImage"] == ["Ana", "Bruno"]
+    assert native.read_fields(path)["Subject"] == ["praia"]
+    assert path.stat().st_size == size
+    assert not path.with_name(path.name + JOURNAL_SUFFIX).exists()
+
+
+def test_update_xmp_inplace_without_change(make_image):
+    path = make_image("a.jpg", ["praia"], ["Ana"])
+    before = path.read_bytes()
+    assert native.update_xmp_inplace(path, lambda cur: {"PersonInImage": ["Ana"]}) is False
+    assert path.read_bytes() == before
+
+
+def test_update_xmp_inplace_too_big_for_padding(make_image):
+    path = make_image("a.jpg", ["praia"], ["Ana"])
+    before = path.read_bytes()
+    with pytest.raises(Unsupported):
+        native.update_xmp_inplace(path, add_people(*(f"Pessoa {i:04d}" for i in range(500))))
+    assert path.read_bytes() == before
+
+
+def crash_midway(monkeypatch):
+    # a escrita do pacote para no meio, como num kill: o journal fica para trás
+    write_at = native._write_at
+
+    def crash(f, offset, data):
+        write_at(f, offset, data[:len(data) // 2])
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(native, "_write_at", crash)
+
+
+def test_interrupted_write_is_recovered(make_image, monkeypatch):
+    path = make_image("a.jpg", ["praia"], ["Ana"])
+    before = path.read_bytes()
+    crash_midway(monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        native.update_xmp_inplace(path, add_people("Bruno"))
+    monkeypatch.undo()
+    journal = path.with_name(path.name + JOURNAL_SUFFIX)
+    assert journal.exists()
+    assert path.read_bytes() != before
+
+    assert native.recover_inplace(path) is True
+    assert path.read_bytes() == before
+    assert not journal.exists()
+    assert native.recover_inplace(path) is False
+
+
+def test_incomplete_journal_leaves_file_alone(make_image):
+    # journal cortado no meio: a escrita nem tinha começado
+    path = make_image("a.jpg", ["praia"], ["Ana"])
+    before = path.read_bytes()
+    journal = path.with_name(path.name + JOURNAL_SUFFIX)
+    journal.write_bytes(native._JOURNAL_MAGIC + struct.pack(">QII", 10, 100, 0) + b"x" * 10)
+    assert native.recover_inplace(path) is True
+    assert path.read_bytes() == before
+    assert not journal.exists()
+
+
+def test_update_recovers_pending_journal_first(make_image, monkeypatch):
+    path = make_image("a.jpg", ["praia"], ["Ana"])
+    crash_midway(monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        native.update_xmp_inplace(path, add_people("Bruno"))
+    monkeypatch.undo()
+    assert native.update_xmp_inplace(path, add_people("Carla")) is True
+    assert native.read_fields(path)["PersonInImage"] == ["Ana", "Carla"]
@@ -0,0 +1,72 @@
+import itertools
+
+import pytest
+
+from imgmeta import matches_filters
+from imgmeta_query import QueryError, compile_query, filters_query
+from imgmeta_store import MetaStore
+
+MARIA = {"file": "a.jpg", "tags": ["Praia", "viagem"], "people": ["Maria Silva"]}
+JOAO = {"file": "b.jpg", "tags": ["praia", "rascunho"], "people": ["João"]}
+NADA = {"file": "c.jpg", "tags": [], "people": []}
+
+
+def hits(text, records=(MARIA, JOAO, NADA)):
+    q = compile_query(text)
+    return [m["file"] for m in records if q.matches(m)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", ["a.jpg", "b.jpg", "c.jpg"]),
+    ("tag:praia", ["a.jpg", "b.jpg"]),
+    ('person:"maria silva"', ["a.jpg"]),
+    ('pessoa:"Maria Silva"', ["a.jpg"]),
+    ("praia", ["a.jpg", "b.jpg"]),  # sem campo: pessoas ou tags
+    ('"joão"', ["b.jpg"]),
+    ("tag:praia tag:viagem", ["a.jpg"]),  # lado a lado = AND
+    ("tag:praia AND NOT tag:rascunho", ["a.jpg"]),
+    ("tag:viagem OR tag:rascunho", ["a.jpg", "b.jpg"]),
+    ("NOT (tag:viagem OR tag:rascunho)", ["c.jpg"]),
+    ('person:"Maria Silva" AND (tag:praia OR tag:viagem) AND NOT tag:rascunho', ["a.jpg"]),
+    ("tag:viagem OR tag:rascunho tag:praia", ["a.jpg", "b.jpg"]),  # AND antes de OR
+    ("NOT NOT tag:viagem", ["a.jpg"]),
+])
+def test_matches(text, expected):
+    assert hits(text) == expected
+
+
+def test_quoted_value_with_escapes():
+    meta = {"file": "x", "tags": ['diz "oi"'], "people": []}
+    assert compile_query(r'tag:"diz \"oi\""').matches(meta)
+
+
+@pytest.mark.parametrize("text", [
+    "local:praia", "(tag:praia", "tag:praia)", "tag:praia AND", "NOT", "OR tag:praia", '"aberto',
+])
+def test_invalid(text):
+    with pytest.raises(QueryError):
+        compile_query(text)
+
+
+def test_matches_store_records():
+    store = MetaStore([MARIA, JOAO, NADA])
+    assert hits("tag:praia", store) == ["a.jpg", "b.jpg"]
+
+
+@pytest.mark.parametrize("mode", ["any", "all"])
+def test_filters_query_agrees_with_matches_filters(mode):
+    for people, tags in itertools.product([[], ["maria silva"], ["Maria Silva", "joão"]],
+                                          [[], ["praia"], ["praia", "viagem"]]):
+        q = filters_query(people, tags, mode)
+        for meta in (MARIA, JOAO, NADA):
+            if mode == "any":
+                expected = matches_filters(meta, people, [], tags, [])
+            else:
+                expected = matches_filters(meta, [], people, [], tags)
+            assert q.matches(meta) == expected, (people, tags, meta["file"])
+
+
+def test_and_combines_queries():
+    q = compile_query("tag:praia") & filters_query(["joão"])
+    assert [m["file"] for m in (MARIA, JOAO) if q.matches(m)] == ["b.jpg"]
+    assert (compile_query("") & compile_query("tag:praia")).ast == compile_query("tag:praia").ast
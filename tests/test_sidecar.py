@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+import imgmeta
+import imgmeta_native as native
+from conftest import age
+
+
+def read(core, path, **kw):
+    return next(core.read_values_many([path], on_error=fail, **kw))
+
+
+def fail(path, msg):
+    raise AssertionError(f"{path}: {msg}")
+
+
+def test_sidecar_path_keeps_extension(tmp_path):
+    assert imgmeta.sidecar_path(tmp_path / "foto.jpg") == tmp_path / "foto.jpg.xmp"
+    assert imgmeta.sidecar_path(tmp_path / "foto.jpg") != imgmeta.sidecar_path(tmp_path / "foto.tif")
+
+
+def test_sidecar_wins_per_field(core, make_image):
+    f = make_image("a.jpg", ["arquivo"], ["Ana"])
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["sidecar"]})
+    assert read(core, f) == {"file": str(f), "tags": ["sidecar"], "people": ["Ana"]}
+    assert read(core, f, sidecar=False)["tags"] == ["arquivo"]
+
+
+def test_empty_sidecar_field_hides_file_values(core, make_image):
+    f = make_image("a.png", ["arquivo"], ["Ana"])
+    native.write_sidecar(core.sidecar_path(f), {"PersonInImage": []})
+    assert read(core, f) == {"file": str(f), "tags": ["arquivo"], "people": []}
+
+
+def test_sidecar_of_other_extension_is_ignored(core, make_image):
+    jpg = make_image("a.jpg", ["jpg"])
+    tif = make_image("a.tif", ["tif"])
+    native.write_sidecar(core.sidecar_path(jpg), {"Subject": ["sidecar"]})
+    assert read(core, tif)["tags"] == ["tif"]
+
+
+def test_directory_listing_is_reused(core, make_image, tmp_path, monkeypatch):
+    f = make_image("a.jpg")
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["s"]})
+    age(tmp_path)
+    assert core._has_sidecar(f)
+    calls = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda p: calls.append(p) or scandir(p))
+    assert core._has_sidecar(f)
+    assert not core._has_sidecar(tmp_path / "b.jpg")
+    assert calls == []
+    # um sidecar novo muda o mtime da pasta e força uma nova listagem
+    native.write_sidecar(core.sidecar_path(tmp_path / "b.jpg"), {"Subject": ["s"]})
+    assert core._has_sidecar(tmp_path / "b.jpg")
+    assert calls == [str(tmp_path)]
+
+
+def test_sidecar_write_leaves_file_untouched(core, make_image):
+    f = make_image("a.jpg", ["praia"], ["Ana"])
+    before = f.read_bytes()
+    assert list(core.add_values_many([f], tags=["sol"], sidecar=True)) == [f]
+    assert f.read_bytes() == before
+    assert native.read_sidecar(core.sidecar_path(f)) == {"Subject": ["praia", "sol"]}
+    assert read(core, f)["tags"] == ["praia", "sol"]
+
+
+def test_forced_sidecar_write_only_touches_addressed_fields(core, make_image):
+    f = make_image("a.jpg", ["praia"], ["Ana"])
+    g = make_image("b.jpg", ["praia"], ["Ana"])
+    assert list(core.clear_values_many([f], diff=False, sidecar=True)) == [f]
+    assert not core.sidecar_path(f).exists()
+    list(core.set_values_many([g], tags=["praia"], diff=False, sidecar=True))
+    assert native.read_sidecar(core.sidecar_path(g)) == {"Subject": ["praia"]}
+
+
+def test_file_write_goes_over_sidecar(core, make_image):
+    f = make_image("a.jpg", ["arquivo"], ["Ana"])
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["sidecar"]})
+    assert list(core.add_values_many([f], tags=["nova"])) == [f]
+    # a edição vale sobre o que a leitura mostrava; o sidecar, sem mais nada, é apagado
+    assert not core.sidecar_path(f).exists()
+    assert read(core, f) == {"file": str(f), "tags": ["nova", "sidecar"], "people": ["Ana"]}
+
+
+def test_file_write_over_sidecar_without_change_is_skipped(core, make_image):
+    f = make_image("a.jpg", ["arquivo"], ["Ana"])
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["sidecar"]})
+    skipped = []
+    assert list(core.set_values_many([f], tags=["sidecar"], on_skip=skipped.append)) == []
+    assert skipped == [f]
+    assert core.sidecar_path(f).exists()
+
+
+def test_unreadable_sidecar_refuses_file_write(core, make_image):
+    f = make_image("a.jpg", ["arquivo"])
+    core.sidecar_path(f).write_text("<x:xmpmeta")
+    before = f.read_bytes()
+    errors = []
+    assert list(core.add_values_many([f], tags=["nova"], on_error=lambda p, m: errors.append(p))) == []
+    assert errors == [f]
+    assert f.read_bytes() == before
+
+
+def test_no_sidecar_writes_file_only(core, make_image, monkeypatch):
+    f = make_image("a.jpg", ["arquivo"])
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["sidecar"]})
+    monkeypatch.setattr(core, "SIDECAR_READ", False)
+    assert list(core.add_values_many([f], tags=["nova"])) == [f]
+    assert native.read_sidecar(core.sidecar_path(f)) == {"Subject": ["sidecar"]}
+    assert read(core, f)["tags"] == ["arquivo", "nova"]
+
+
+@pytest.mark.parametrize("keep", [False, True])
+def test_embed(core, make_image, keep):
+    f = make_image("a.jpg", ["arquivo"], ["Ana"])
+    g = make_image("b.jpg", ["arquivo"])
+    native.write_sidecar(core.sidecar_path(f), {"Subject": ["sidecar"]})
+    assert list(core.embed_sidecars([f, g], keep=keep, on_error=fail)) == [(str(f), "ok")]
+    assert read(core, f, sidecar=False)["tags"] == ["sidecar"]
+    assert core.sidecar_path(f).exists() == keep
+    if keep:
+        assert list(core.embed_sidecars([f], keep=True, on_error=fail)) == [(str(f), "unchanged")]